@@ -0,0 +1,60 @@
+import hashlib
+import hmac
+import json
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.core.config import settings
+from app.services.deploy import get_live_deploy
+from app.services.deploy_queue import deploy_queue
+
+router = APIRouter()
+
+
+def _check_signature(body: bytes, signature: str | None) -> None:
+    secret = settings.github_webhook_secret
+    if not secret:
+        # без секрета деплой мог бы запустить кто угодно — только при явном разрешении
+        if settings.github_webhook_allow_unsigned:
+            return
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    if not signature or not hmac.compare_digest(expected, signature):
+        raise HTTPException(status_code=401, detail="Bad signature")
+
+
+@router.post("/webhook", status_code=202)
+async def deploy_webhook(request: Request):
+    """
+    GitHub push webhook. Деплой не ждём: ставим в очередь и сразу отвечаем.
+    Пуши во время идущего деплоя схлопываются в один следующий.
+    """
+    body = await request.body()
+    _check_signature(body, request.headers.get("x-hub-signature-256"))
+
+    if request.headers.get("x-github-event") == "ping":
+        return {"status": "pong"}
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    if payload.get("ref") != settings.deploy_branch:
+        return {"status": "ignored", "ref": payload.get("ref")}
+
+    return {"status": "queued", **await deploy_queue.submit(payload)}
+
+
+@router.get("/queue")
+async def deploy_queue_state():
+    return await deploy_queue.state()
+
+
+@router.get("/live")
+def deploy_live(tail: int = 50):
+    """
+    Этапы и последние строки вывода идущего деплоя — видно, где он застрял.
+    Отвечает тот uvicorn-воркер, что держит деплой (см. /deploy/queue).
+    """
+    return get_live_deploy(tail)
@@ -0,0 +1,66 @@
+import datetime as dt
+from typing import AsyncIterator, Iterator, Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.services.events_export import export_events
+
+router = APIRouter()
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def _stream(parts: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Синхронный генератор выгрузки — по порции в threadpool.
+    Клиент отключился — генератор закрываем сразу (курсор и соединение
+    освобождаются), а не когда его найдёт сборщик мусора.
+    """
+    try:
+        while True:
+            part = await run_in_threadpool(next, parts, None)
+            if part is None:
+                break
+            yield part
+    finally:
+        parts.close()
+
+
+def _utc(ts: dt.datetime) -> dt.datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=dt.timezone.utc)
+
+
+@router.get("/{table}")
+def export_table(
+    table: Literal["transcribe_events", "video_job_events"],
+    start: dt.datetime,
+    end: dt.datetime,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    env: str | None = None,
+):
+    """
+    Выгрузка событий за [start, end) потоком — память не зависит от размера диапазона.
+    Наивные даты считаем UTC.
+    """
+    start, end = _utc(start), _utc(end)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    filename = f"{table}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{format}"
+    media_type = _MEDIA_TYPES[format]
+    if gzip:
+        # файл .gz как есть: с Content-Encoding клиенты распакуют его сами
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _stream(export_events(table, start, end, fmt=format, gzip=gzip, env=env)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
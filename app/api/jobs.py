@@ -0,0 +1,42 @@
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.schemas.video_jobs import VideoJobPage, VideoJobStatus, VideoJobTimeline
+from app.services.video_job.video_jobs_store import get_video_job_timeline, list_video_jobs
+
+router = APIRouter()
+
+
+@router.get("", response_model=VideoJobPage)
+def list_jobs(
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    status: VideoJobStatus | None = None,
+    env: str | None = None,
+    gpu_host: str | None = None,
+    model_name: str | None = None,
+    user_id: int | None = None,
+):
+    """Джобы, новые сверху. Следующая страница — ?cursor=<next_cursor>."""
+    try:
+        items, next_cursor = list_video_jobs(
+            limit=limit,
+            cursor=cursor,
+            status=status.value if status else None,
+            env=env,
+            gpu_host=gpu_host,
+            model_name=model_name,
+            user_id=user_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/{job_id}/timeline", response_model=VideoJobTimeline)
+def job_timeline(job_id: UUID, with_messages: bool = False):
+    timeline = get_video_job_timeline(job_id, with_messages=with_messages)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return timeline
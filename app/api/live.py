@@ -0,0 +1,65 @@
+import asyncio
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.services.video_job.live_feed import live_feed
+
+router = APIRouter()
+
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # nginx: не буферизовать поток
+    "X-Accel-Buffering": "no",
+}
+
+
+async def _sse_stream(request: Request, kind: str, value) -> AsyncIterator[str]:
+    """
+    SSE-поток событий подписки. Событие в очереди появляется из общего
+    LISTEN-подключения — сам клиент БД не трогает.
+    """
+    sub = live_feed.subscribe(kind, value)
+    try:
+        yield ": subscribed\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=settings.live_feed_keepalive_sec)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            lines = []
+            if event.get("id") is not None:
+                lines.append(f"id: {event['id']}")
+            lines.append("event: video_job_event")
+            lines.append(f"data: {json.dumps(event, ensure_ascii=False)}")
+            yield "\n".join(lines) + "\n\n"
+    finally:
+        live_feed.unsubscribe(sub)
+
+
+def _sse_response(request: Request, kind: str, value) -> StreamingResponse:
+    return StreamingResponse(
+        _sse_stream(request, kind, value),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def live_job(job_id: UUID, request: Request):
+    """События одной джобы по мере записи (text/event-stream)."""
+    return _sse_response(request, "job", job_id)
+
+
+@router.get("/users/{user_id}")
+async def live_user(user_id: int, request: Request):
+    """События всех джоб пользователя (по video_jobs.user_id)."""
+    return _sse_response(request, "user", user_id)
@@ -0,0 +1,63 @@
+from fastapi import APIRouter
+from app.services.db.db import get_pool_stats
+from app.services.transcribe_buffer import get_transcribe_buffer_stats
+from app.services.video_job.partitions import get_partition_stats
+from app.services.video_job.live_feed import get_live_feed_stats
+from app.services.video_job.live_message import get_live_message_stats
+from app.services.cache import get_cache_stats
+from app.services.telegram.client import get_telegram_stats
+from app.services.telegram.outbox import get_telegram_outbox_stats
+from app.services.notifier.notification_outbox import get_notification_outbox_stats
+from app.services.notifier.transcribe_digest import get_transcribe_digest_stats
+
+router = APIRouter()
+
+
+@router.get("/db")
+def db_metrics():
+    return get_pool_stats()
+
+
+@router.get("/transcribe-buffer")
+def transcribe_buffer_metrics():
+    return get_transcribe_buffer_stats()
+
+
+@router.get("/video-job-partitions")
+def video_job_partitions_metrics():
+    return get_partition_stats()
+
+
+@router.get("/live-feed")
+def live_feed_metrics():
+    return get_live_feed_stats()
+
+
+@router.get("/video-job-messages")
+def video_job_messages_metrics():
+    return get_live_message_stats()
+
+
+@router.get("/cache")
+def cache_metrics():
+    return get_cache_stats()
+
+
+@router.get("/telegram")
+def telegram_metrics():
+    return get_telegram_stats()
+
+
+@router.get("/telegram-outbox")
+def telegram_outbox_metrics():
+    return get_telegram_outbox_stats()
+
+
+@router.get("/notification-outbox")
+async def notification_outbox_metrics():
+    return await get_notification_outbox_stats()
+
+
+@router.get("/transcribe-digest")
+def transcribe_digest_metrics():
+    return get_transcribe_digest_stats()
@@ -6,7 +6,13 @@ from app.api import (
     video_jobs,
     model_stat,
     users, 
-    channels
+    channels,
+    metrics,
+    stats,
+    jobs,
+    export,
+    live,
+    deploy,
 )
 
 
@@ -46,3 +52,39 @@ api_router.include_router(
     prefix="/channels",
     tags=["channels"]
 )
+
+api_router.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+api_router.include_router(
+    stats.router,
+    prefix="/stats",
+    tags=["stats"]
+)
+
+api_router.include_router(
+    jobs.router,
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+api_router.include_router(
+    export.router,
+    prefix="/export",
+    tags=["export"]
+)
+
+api_router.include_router(
+    live.router,
+    prefix="/live",
+    tags=["live"]
+)
+
+api_router.include_router(
+    deploy.router,
+    prefix="/deploy",
+    tags=["deploy"]
+)
@@ -0,0 +1,90 @@
+import datetime as dt
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.schemas.stats import TranscribeDimension, TranscribeStatsOut
+from app.services.stats.transcribe_stats import get_transcribe_stats
+
+router = APIRouter()
+
+# не больше стольких точек во временном ряду
+MAX_SERIES_POINTS = 2000
+
+
+def _window(start: dt.datetime | None, end: dt.datetime | None) -> tuple[dt.datetime, dt.datetime]:
+    """По умолчанию — последний час. Наивные даты считаем UTC."""
+    end = end or dt.datetime.now(dt.timezone.utc)
+    start = start or end - dt.timedelta(hours=1)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=dt.timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=dt.timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+
+@router.get("/transcribe", response_model=TranscribeStatsOut)
+def transcribe_stats(
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    group_by: list[TranscribeDimension] = Query(default=[]),
+    env: str | None = None,
+    model_name: str | None = None,
+    model_device: str | None = None,
+    language_detected: str | None = None,
+    client: str | None = None,
+    success: bool | None = None,
+):
+    """
+    Throughput, success rate, перцентили latency/transcribe/ffmpeg и RTF
+    за окно, с группировкой по любым измерениям (?group_by=model_name&group_by=model_device).
+    """
+    start, end = _window(start, end)
+    group = [d.value for d in group_by]
+    rows = get_transcribe_stats(
+        start,
+        end,
+        group_by=group,
+        env=env,
+        model_name=model_name,
+        model_device=model_device,
+        language_detected=language_detected,
+        client=client,
+        success=success,
+    )
+    return {"start": start, "end": end, "group_by": group_by, "rows": rows}
+
+
+@router.get("/transcribe/timeseries", response_model=TranscribeStatsOut)
+def transcribe_stats_timeseries(
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    bucket_sec: int = Query(300, ge=60),
+    group_by: list[TranscribeDimension] = Query(default=[]),
+    env: str | None = None,
+    model_name: str | None = None,
+    model_device: str | None = None,
+    language_detected: str | None = None,
+    client: str | None = None,
+    success: bool | None = None,
+):
+    """То же, что /transcribe, но окно нарезано на интервалы по bucket_sec."""
+    start, end = _window(start, end)
+    if (end - start).total_seconds() / bucket_sec > MAX_SERIES_POINTS:
+        raise HTTPException(status_code=400, detail="too many points: increase bucket_sec")
+
+    group = [d.value for d in group_by]
+    rows = get_transcribe_stats(
+        start,
+        end,
+        group_by=group,
+        bucket_sec=bucket_sec,
+        env=env,
+        model_name=model_name,
+        model_device=model_device,
+        language_detected=language_detected,
+        client=client,
+        success=success,
+    )
+    return {"start": start, "end": end, "group_by": group_by, "bucket_sec": bucket_sec, "rows": rows}
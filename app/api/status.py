@@ -1,11 +1,51 @@
-from fastapi import APIRouter, HTTPException
-from app.services.log_store import get_latest_event
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from app.services.log_store import get_deploy_event, get_deploy_history, get_latest_event_with_etag
 
 router = APIRouter()
 
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: список тегов через запятую или "*"; сравнение слабое (W/ не учитываем)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
 @router.get("/latest")
-def latest_deploy():
-    event = get_latest_event()
+def latest_deploy(request: Request):
+    event, etag = get_latest_event_with_etag()
     if not event:
         raise HTTPException(status_code=404, detail="No deploy logs yet")
+    # поллеры шлют If-None-Match — пока новый деплой не появился, отвечаем 304 без тела
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(event, headers={"ETag": etag})
+
+
+@router.get("/history")
+def deploy_history(
+    limit: int = Query(20, ge=1, le=200),
+    before: int | None = Query(None, ge=0, description="next_before из предыдущей страницы"),
+    result: Literal["success", "failed"] | None = None,
+    branch: str | None = None,
+    actor: str | None = None,
+):
+    """История деплоев, новые сверху."""
+    items, next_before = get_deploy_history(
+        limit=limit, before=before, result=result, branch=branch, actor=actor
+    )
+    return {"items": items, "next_before": next_before}
+
+
+@router.get("/history/{deploy_id}")
+def deploy_by_id(deploy_id: str):
+    event = get_deploy_event(deploy_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Deploy not found")
     return event
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, BackgroundTasks
 from app.schemas.transcribe import TranscribeEventIn
-from app.services.transcribe_store import save_transcribe_event
+from app.services.transcribe_buffer import write_transcribe_event
 from app.services.notifier.transcribe_notifier import send_transcribe_notification
+from app.services.notifier.notification_outbox import outbox_enabled
 
 router = APIRouter()
 
 
 @router.post("")
 async def collect_transcribe_event(ev: TranscribeEventIn, background_tasks: BackgroundTasks):
-
-    def task():
-        save_transcribe_event(ev)
-        send_transcribe_notification(ev)
-
-    background_tasks.add_task(task)
+    # запись — в write-behind буфер (или сразу INSERT в режиме sync);
+    # уведомление пишется вместе с событием в notification_outbox,
+    # в режиме direct — отправка из threadpool
+    await write_transcribe_event(ev)
+    if not outbox_enabled():
+        background_tasks.add_task(send_transcribe_notification, ev)
     return {"status": "ok"}
@@ -1,17 +1,162 @@
-from fastapi import APIRouter, BackgroundTasks
+import codecs
+import json
+from typing import Any, Callable
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from pydantic import ValidationError
+
+from app.core.config import settings
 from app.schemas.video_jobs import VideoJobEventIn
-from app.services.video_job.video_jobs_store import save_video_job_event
+from app.services.video_job.video_jobs_store import (
+    save_video_job_event_async,
+    save_video_job_events_batch_async,
+)
 from app.services.video_job.video_job_notifier import send_video_job_notification
+from app.services.notifier.notification_outbox import outbox_enabled
 
 router = APIRouter()
 
 
 @router.post("")
 async def push_video_job_event(ev: VideoJobEventIn, background_tasks: BackgroundTasks):
+    # запись в БД (вместе с уведомлением в notification_outbox) — async-таска в event loop;
+    # в режиме direct уведомление шлётся из threadpool
+    background_tasks.add_task(save_video_job_event_async, ev)
+    if not outbox_enabled():
+        background_tasks.add_task(send_video_job_notification, ev)
+    return {"status": "ok"}
 
-    def task():
-        save_video_job_event(ev)
-        send_video_job_notification(ev)
 
-    background_tasks.add_task(task)
-    return {"status": "ok"}
+class _BatchParser:
+    """
+    Разбор пачки по мере чтения тела: JSON-массив или NDJSON (одно событие на строку).
+    Элементы считаются сразу, поэтому лимит video_job_batch_max_items срабатывает,
+    не дочитывая и не разбирая всё тело. Невалидные элементы не роняют пачку —
+    их ошибки копятся по индексу.
+    """
+
+    def __init__(self, content_type: str) -> None:
+        self.ndjson: bool | None = True if "ndjson" in content_type else None
+        self.events: list[VideoJobEventIn] = []
+        self.errors: list[dict[str, Any]] = []
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._opened = False  # '[' массива прочитан
+        self._closed = False  # ']' массива прочитан
+        self._want = "value|]"  # что допустимо следующим в массиве
+
+    @property
+    def total(self) -> int:
+        return len(self.events) + len(self.errors)
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        try:
+            self._buf += self._decoder.decode(chunk, final=final)
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"body is not valid UTF-8: {e}")
+        if self.ndjson is None:
+            head = self._buf.lstrip()
+            if not head and not final:
+                return
+            self.ndjson = not head.startswith("[")
+        if self.ndjson:
+            self._feed_lines(final)
+        else:
+            self._feed_array(final)
+
+    def _item(self, validate: Callable[[], VideoJobEventIn]) -> None:
+        index = self.total
+        if index >= settings.video_job_batch_max_items:
+            raise HTTPException(
+                status_code=413,
+                detail=f"batch too large: more than {settings.video_job_batch_max_items} items",
+            )
+        try:
+            self.events.append(validate())
+        except ValidationError as e:
+            self.errors.append({"index": index, "errors": json.loads(e.json(include_url=False))})
+
+    def _feed_lines(self, final: bool) -> None:
+        *lines, self._buf = self._buf.split("\n")
+        if final:
+            lines.append(self._buf)
+            self._buf = ""
+        for line in lines:
+            if line.strip():
+                self._item(lambda line=line: VideoJobEventIn.model_validate_json(line))
+
+    def _feed_array(self, final: bool) -> None:
+        buf, pos = self._buf, 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buf):
+                break
+            if self._closed:
+                raise HTTPException(status_code=400, detail="invalid JSON: extra data after array")
+            if not self._opened:
+                self._opened = True
+                pos += 1  # '['
+                continue
+            if buf[pos] == "]" and self._want != "value":
+                self._closed = True
+                pos += 1
+                continue
+            if buf[pos] == "," and self._want == ",|]":
+                self._want = "value"
+                pos += 1
+                continue
+            if self._want == ",|]":
+                raise HTTPException(status_code=400, detail="invalid JSON: expected ',' or ']'")
+            try:
+                item, end = self._json.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if final:
+                    raise HTTPException(status_code=400, detail=f"invalid JSON: {e}")
+                break  # элемент ещё не дочитан
+            if end == len(buf) and not final:
+                break  # число на границе чанка могло не закончиться
+            pos = end
+            self._want = ",|]"
+            self._item(lambda item=item: VideoJobEventIn.model_validate(item))
+        self._buf = buf[pos:]
+        if final and not self._closed:
+            raise HTTPException(status_code=400, detail="expected a JSON array of events")
+
+
+@router.post("/batch")
+async def push_video_job_events_batch(request: Request, background_tasks: BackgroundTasks):
+    """
+    Пачка событий видео-джоб: JSON-массив или NDJSON
+    (Content-Type: application/x-ndjson). Валидные события пишутся
+    одной транзакцией, ошибки валидации возвращаются поштучно.
+    """
+    parser = _BatchParser(request.headers.get("content-type", ""))
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.video_job_batch_max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"batch too large: more than {settings.video_job_batch_max_bytes} bytes",
+            )
+        parser.feed(chunk)
+    parser.feed(b"", final=True)
+    events, errors = parser.events, parser.errors
+
+    if events:
+        def notify():
+            for ev in events:
+                send_video_job_notification(ev)
+
+        background_tasks.add_task(save_video_job_events_batch_async, events)
+        if not outbox_enabled():
+            background_tasks.add_task(notify)
+
+    return {
+        "status": "ok",
+        "accepted": len(events),
+        "rejected": len(errors),
+        "errors": errors,
+    }
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,6 +11,115 @@ class Settings(BaseSettings):
     # --- общие ---
     env_name: str = Field("gpu-prod", alias="ENV_NAME")
     vds_hostname: str = Field("vds", alias="VDS_HOSTNAME")
+
+    # --- журнал деплоев (JSON Lines) ---
+    deploy_log_path: str = Field("logs/deploy.log", alias="DEPLOY_LOG_PATH")
+    # при превышении активный сегмент закрывается (deploy.log -> deploy.log.<номер>)
+    deploy_log_segment_max_bytes: int = Field(8 * 1024 * 1024, alias="DEPLOY_LOG_SEGMENT_MAX_BYTES")
+
+    # --- деплой на домашний ПК ---
+    home_ssh_host: str = Field("10.0.0.2", alias="HOME_SSH_HOST")
+    home_ssh_user: str = Field("deploy", alias="HOME_SSH_USER")
+    home_ssh_key_path: str = Field("/root/.ssh/id_ed25519", alias="HOME_SSH_KEY_PATH")
+    healthcheck_url: str = Field("http://10.0.0.2:8000/health", alias="HEALTHCHECK_URL")
+    # доп. URL через запятую — опрашиваются параллельно с основным, готовы должны быть все
+    healthcheck_extra_urls: str = Field("", alias="HEALTHCHECK_EXTRA_URLS")
+    # readiness-проба: опрос с экспоненциальной паузой, пока не истечёт дедлайн
+    # (контейнер с моделью может грузить веса минутами)
+    healthcheck_deadline_sec: float = Field(300.0, alias="HEALTHCHECK_DEADLINE_SEC")
+    healthcheck_attempt_timeout_sec: float = Field(5.0, alias="HEALTHCHECK_ATTEMPT_TIMEOUT_SEC")
+    healthcheck_backoff_initial_sec: float = Field(1.0, alias="HEALTHCHECK_BACKOFF_INITIAL_SEC")
+    healthcheck_backoff_max_sec: float = Field(15.0, alias="HEALTHCHECK_BACKOFF_MAX_SEC")
+    # сколько 2xx подряд считаем «готов» (одиночный 200 во время старта — ещё не готовность)
+    healthcheck_success_threshold: int = Field(2, alias="HEALTHCHECK_SUCCESS_THRESHOLD")
+    # секрет GitHub webhook (X-Hub-Signature-256); без него webhook отвечает 503,
+    # если явно не разрешены неподписанные запросы (только для локальной отладки)
+    github_webhook_secret: str | None = Field(None, alias="GITHUB_WEBHOOK_SECRET")
+    github_webhook_allow_unsigned: bool = Field(False, alias="GITHUB_WEBHOOK_ALLOW_UNSIGNED")
+    # деплоим только пуши в эту ветку
+    deploy_branch: str = Field("refs/heads/main", alias="DEPLOY_BRANCH")
+    # имя цели в очереди деплоев (один деплой одновременно на цель)
+    deploy_target: str = Field("home_pc", alias="DEPLOY_TARGET")
+    # как часто воркер проверяет очередь (если пуш пришёл в другой uvicorn-воркер)
+    deploy_queue_poll_sec: float = Field(5.0, alias="DEPLOY_QUEUE_POLL_SEC")
+    deploy_ssh_timeout_sec: int = Field(1800, alias="DEPLOY_SSH_TIMEOUT_SEC")
+    # swap — сборка рядом с работающим стеком, потом подмена контейнеров;
+    # recreate — старый путь: down, полная чистка docker, сборка с нуля
+    deploy_mode: Literal["swap", "recreate"] = Field("swap", alias="DEPLOY_MODE")
+    # полный вывод SSH-деплоя — в файлы <deploy_id>.log здесь; в памяти — только хвост
+    deploy_output_dir: str = Field("logs/deploy-output", alias="DEPLOY_OUTPUT_DIR")
+    deploy_output_tail_lines: int = Field(200, alias="DEPLOY_OUTPUT_TAIL_LINES")
+    # базовая линия длительностей этапов — медиана последних N успешных деплоев
+    deploy_baseline_window: int = Field(10, alias="DEPLOY_BASELINE_WINDOW")
+    deploy_baseline_min_samples: int = Field(3, alias="DEPLOY_BASELINE_MIN_SAMPLES")
+    # регрессия этапа: дольше медианы в ratio раз и не меньше чем на min_delta
+    deploy_regression_ratio: float = Field(1.5, alias="DEPLOY_REGRESSION_RATIO")
+    deploy_regression_min_delta_ms: int = Field(2000, alias="DEPLOY_REGRESSION_MIN_DELTA_MS")
+    # --- Telegram: общий клиент Bot API (keep-alive) ---
+    telegram_timeout_sec: float = Field(10.0, alias="TELEGRAM_TIMEOUT_SEC")
+    # отправка файлов (sendDocument)
+    telegram_upload_timeout_sec: float = Field(30.0, alias="TELEGRAM_UPLOAD_TIMEOUT_SEC")
+    # соединений к api.telegram.org в пуле на процесс
+    telegram_pool_size: int = Field(10, alias="TELEGRAM_POOL_SIZE")
+
+    # --- Telegram: очередь исходящих (лимиты Bot API) ---
+    # на чат: в группы Telegram пускает ~20 сообщений в минуту
+    telegram_chat_rate_per_min: float = Field(20.0, alias="TELEGRAM_CHAT_RATE_PER_MIN")
+    telegram_chat_burst: int = Field(3, alias="TELEGRAM_CHAT_BURST")
+    # на бота по всем чатам (лимит API — 30/с)
+    telegram_bot_rate_per_sec: float = Field(25.0, alias="TELEGRAM_BOT_RATE_PER_SEC")
+    telegram_outbox_max_pending: int = Field(1000, alias="TELEGRAM_OUTBOX_MAX_PENDING")
+    # drop_oldest — при переполнении выкидываем самое старое; drop_new — не берём новое
+    telegram_outbox_drop_policy: Literal["drop_oldest", "drop_new"] = Field(
+        "drop_oldest", alias="TELEGRAM_OUTBOX_DROP_POLICY"
+    )
+    # повторы при сетевых ошибках/5xx (429 попыткой не считается)
+    telegram_outbox_max_attempts: int = Field(5, alias="TELEGRAM_OUTBOX_MAX_ATTEMPTS")
+    telegram_outbox_backoff_base_sec: float = Field(1.0, alias="TELEGRAM_OUTBOX_BACKOFF_BASE_SEC")
+    telegram_outbox_backoff_max_sec: float = Field(60.0, alias="TELEGRAM_OUTBOX_BACKOFF_MAX_SEC")
+    # сколько при остановке ждём, пока очередь дошлёт накопленное
+    telegram_outbox_drain_sec: float = Field(5.0, alias="TELEGRAM_OUTBOX_DRAIN_SEC")
+
+    # --- уведомления о событиях (transcribe / video jobs) ---
+    # outbox — строка в notification_outbox в транзакции события, доставка диспетчером
+    # (переживает рестарт); direct — как раньше, BackgroundTasks в памяти процесса
+    notification_delivery: Literal["outbox", "direct"] = Field("outbox", alias="NOTIFICATION_DELIVERY")
+    notification_outbox_batch_size: int = Field(20, alias="NOTIFICATION_OUTBOX_BATCH_SIZE")
+    # аренда пачки: дольше, чем пачка может ждать лимитов Telegram
+    notification_outbox_lease_sec: float = Field(300.0, alias="NOTIFICATION_OUTBOX_LEASE_SEC")
+    notification_outbox_poll_sec: float = Field(5.0, alias="NOTIFICATION_OUTBOX_POLL_SEC")
+    notification_outbox_max_attempts: int = Field(10, alias="NOTIFICATION_OUTBOX_MAX_ATTEMPTS")
+    notification_outbox_retry_base_sec: float = Field(5.0, alias="NOTIFICATION_OUTBOX_RETRY_BASE_SEC")
+    notification_outbox_retry_max_sec: float = Field(600.0, alias="NOTIFICATION_OUTBOX_RETRY_MAX_SEC")
+    # компакция: доставленные храним час, упавшие — неделю (для разбора)
+    notification_outbox_compact_interval_sec: float = Field(300.0, alias="NOTIFICATION_OUTBOX_COMPACT_INTERVAL_SEC")
+    notification_outbox_sent_retention_sec: float = Field(3600.0, alias="NOTIFICATION_OUTBOX_SENT_RETENTION_SEC")
+    notification_outbox_failed_retention_sec: float = Field(
+        7 * 24 * 3600.0, alias="NOTIFICATION_OUTBOX_FAILED_RETENTION_SEC"
+    )
+
+    # --- уведомления о видео-джобах ---
+    # live — одно сообщение на джобу, шаги дописываются правкой (editMessageText),
+    # отдельное уведомление — только на DONE / FAIL / TIMEOUT; per_event — сообщение на каждое событие.
+    # live работает через notification_outbox: без него промежуточные шаги не шлются вовсе
+    video_job_notify_mode: Literal["live", "per_event"] = Field("per_event", alias="VIDEO_JOB_NOTIFY_MODE")
+    # правим сообщение джобы не чаще раза в N секунд: события между правками сливаются в одну
+    video_job_edit_debounce_sec: float = Field(3.0, alias="VIDEO_JOB_EDIT_DEBOUNCE_SEC")
+    # сколько последних шагов показывать (у Telegram лимит 4096 символов на сообщение)
+    video_job_message_max_steps: int = Field(30, alias="VIDEO_JOB_MESSAGE_MAX_STEPS")
+
+    # --- уведомления о транскрибациях ---
+    # digest — успешные не шлём поштучно, а сводкой раз в transcribe_digest_interval_sec;
+    # ошибки — сразу, но повторы того же error_code в окне transcribe_error_window_sec
+    # схлопываются в одно сообщение со счётчиком; per_event — сообщение на каждое событие
+    transcribe_notify_mode: Literal["digest", "per_event"] = Field("digest", alias="TRANSCRIBE_NOTIFY_MODE")
+    # сводка строится по минутным агрегатам — интервал кратен минуте
+    transcribe_digest_interval_sec: int = Field(900, alias="TRANSCRIBE_DIGEST_INTERVAL_SEC")
+    transcribe_digest_top_n: int = Field(3, alias="TRANSCRIBE_DIGEST_TOP_N")
+    # как часто проверять, не пора ли сводке / не закрылось ли окно повторов ошибок
+    transcribe_digest_check_interval_sec: float = Field(30.0, alias="TRANSCRIBE_DIGEST_CHECK_INTERVAL_SEC")
+    transcribe_error_window_sec: float = Field(600.0, alias="TRANSCRIBE_ERROR_WINDOW_SEC")
+
     # --- Telegram (деплой) ---
     telegram_bot_token: str | None = Field(None, alias="TELEGRAM_BOT_TOKEN")
     telegram_chat_id: int | None = Field(None, alias="TELEGRAM_CHAT_ID")
@@ -31,6 +142,65 @@ class Settings(BaseSettings):
         alias="DATABASE_URL",
     )
 
+    # --- Postgres: пул подключений ---
+    db_pool_min_size: int = Field(2, alias="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(10, alias="DB_POOL_MAX_SIZE")
+    # сколько ждём свободное подключение, прежде чем упасть
+    db_pool_timeout_sec: float = Field(10.0, alias="DB_POOL_TIMEOUT_SEC")
+    # простаивающие сверх min_size закрываются через max_idle
+    db_pool_max_idle_sec: float = Field(300.0, alias="DB_POOL_MAX_IDLE_SEC")
+    # любое подключение пересоздаётся не реже, чем раз в max_lifetime
+    db_pool_max_lifetime_sec: float = Field(3600.0, alias="DB_POOL_MAX_LIFETIME_SEC")
+
+    # --- transcribe_events: write-behind буфер ---
+    # buffered — копим события и льём пачкой через COPY; sync — INSERT на каждое событие
+    transcribe_write_mode: Literal["buffered", "sync"] = Field("buffered", alias="TRANSCRIBE_WRITE_MODE")
+    transcribe_buffer_max_rows: int = Field(200, alias="TRANSCRIBE_BUFFER_MAX_ROWS")
+    transcribe_buffer_flush_interval_sec: float = Field(
+        1.0, alias="TRANSCRIBE_BUFFER_FLUSH_INTERVAL_SEC"
+    )
+    # жёсткий потолок буфера: дальше — ждём flush прямо в запросе
+    transcribe_buffer_max_pending: int = Field(5000, alias="TRANSCRIBE_BUFFER_MAX_PENDING")
+    # строки, которые БД не принимает (ошибка данных/ограничения), — сюда JSON Lines, а не обратно в буфер
+    transcribe_dead_letter_path: str = Field(
+        "logs/transcribe-dead-letter.jsonl", alias="TRANSCRIBE_DEAD_LETTER_PATH"
+    )
+
+    # --- video_job_events: batch-ingest ---
+    video_job_batch_max_items: int = Field(1000, alias="VIDEO_JOB_BATCH_MAX_ITEMS")
+    # тело читается потоком: за этим пределом — 413, не дочитывая
+    video_job_batch_max_bytes: int = Field(16 * 1024 * 1024, alias="VIDEO_JOB_BATCH_MAX_BYTES")
+
+    # --- video_job_events: суточные партиции ---
+    video_job_events_partition_days_ahead: int = Field(
+        7, alias="VIDEO_JOB_EVENTS_PARTITION_DAYS_AHEAD"
+    )
+    # 0 — хранить всё; иначе партиции старше N суток удаляются целиком
+    video_job_events_retention_days: int = Field(0, alias="VIDEO_JOB_EVENTS_RETENTION_DAYS")
+    video_job_events_partition_check_interval_sec: float = Field(
+        3600.0, alias="VIDEO_JOB_EVENTS_PARTITION_CHECK_INTERVAL_SEC"
+    )
+
+    # --- выгрузка событий (/export) ---
+    # строк на одну выборку из серверного курсора (= порция ответа)
+    export_chunk_rows: int = Field(5000, alias="EXPORT_CHUNK_ROWS")
+
+    # --- live-лента событий джоб (SSE /live) ---
+    # очередь на одного подписчика: при переполнении выкидываются самые старые
+    live_feed_queue_size: int = Field(100, alias="LIVE_FEED_QUEUE_SIZE")
+    # комментарий-пинг в SSE, чтобы прокси не рвали простаивающее соединение
+    live_feed_keepalive_sec: float = Field(15.0, alias="LIVE_FEED_KEEPALIVE_SEC")
+
+    # --- кэш users / channels (сброс через NOTIFY во всех воркерах) ---
+    users_cache_ttl_sec: float = Field(300.0, alias="USERS_CACHE_TTL_SEC")
+    channels_cache_ttl_sec: float = Field(300.0, alias="CHANNELS_CACHE_TTL_SEC")
+    cache_max_items: int = Field(10000, alias="CACHE_MAX_ITEMS")
+
+    @property
+    def healthcheck_urls(self) -> list[str]:
+        extra = [u.strip() for u in self.healthcheck_extra_urls.split(",") if u.strip()]
+        return [self.healthcheck_url, *extra]
+
     @property
     def telegram_enabled(self) -> bool:
         return bool(self.telegram_bot_token and self.telegram_chat_id)
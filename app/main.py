@@ -1,5 +1,14 @@
 from fastapi import FastAPI
 from app.api.router import api_router
+from app.services.db.db import init_pool, close_pool, init_async_pool, close_async_pool
+from app.services.transcribe_buffer import start_transcribe_buffer, stop_transcribe_buffer
+from app.services.video_job.partitions import start_partition_maintainer, stop_partition_maintainer
+from app.services.db.listener import start_pg_listener, stop_pg_listener
+from app.services.deploy_queue import start_deploy_queue, stop_deploy_queue
+from app.services.telegram.client import close_telegram_client
+from app.services.telegram.outbox import start_telegram_outbox, stop_telegram_outbox
+from app.services.notifier.notification_outbox import start_notification_dispatcher, stop_notification_dispatcher
+from app.services.notifier.transcribe_digest import start_transcribe_digest, stop_transcribe_digest
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,7 +16,30 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="Deploy Orchestrator")
 
 @app.on_event("startup")
-def on_startup():
-    pass
+async def on_startup():
+    init_pool()
+    await init_async_pool()
+    await start_telegram_outbox()
+    await start_transcribe_buffer()
+    await start_partition_maintainer()
+    await start_notification_dispatcher()
+    await start_transcribe_digest()
+    await start_pg_listener()
+    await start_deploy_queue()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # сначала сливаем буфер, потом закрываем пулы
+    await stop_deploy_queue()
+    await stop_pg_listener()
+    await stop_transcribe_digest()
+    await stop_notification_dispatcher()
+    await stop_partition_maintainer()
+    await stop_transcribe_buffer()
+    await stop_telegram_outbox()
+    await close_telegram_client()
+    await close_async_pool()
+    close_pool()
 
 app.include_router(api_router)
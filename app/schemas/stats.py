@@ -0,0 +1,63 @@
+# app/schemas/stats.py
+from __future__ import annotations
+
+from datetime import datetime
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class TranscribeDimension(str, Enum):
+    env = "env"
+    model_name = "model_name"
+    model_device = "model_device"
+    language_detected = "language_detected"
+    client = "client"
+    success = "success"
+
+
+class MetricStats(BaseModel):
+    count: int
+    avg: float | None = None
+    min: float | None = None
+    max: float | None = None
+    p50: float | None = None
+    p90: float | None = None
+    p95: float | None = None
+    p99: float | None = None
+
+
+class TranscribeStatsRow(BaseModel):
+    model_config = {
+        "protected_namespaces": ()
+    }
+    # начало интервала (только для timeseries)
+    bucket: datetime | None = None
+
+    # измерения — заполнены те, по которым группировали
+    env: str | None = None
+    model_name: str | None = None
+    model_device: str | None = None
+    language_detected: str | None = None
+    client: str | None = None
+    success: bool | None = None
+
+    events: int
+    success_events: int
+    success_rate: float | None = None
+    throughput_per_min: float
+    audio_sec: float
+    audio_sec_per_min: float
+
+    latency_ms: MetricStats
+    transcribe_ms: MetricStats
+    ffmpeg_ms: MetricStats
+    rtf: MetricStats          # transcribe_ms / duration_sec
+
+
+class TranscribeStatsOut(BaseModel):
+    start: datetime
+    end: datetime
+    group_by: list[TranscribeDimension]
+    bucket_sec: int | None = None
+    rows: list[TranscribeStatsRow]
@@ -1,7 +1,8 @@
 # app/schemas/transcribe.py
 from __future__ import annotations
 
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -37,3 +38,25 @@ class TranscribeEventIn(BaseModel):
     success: bool
     error_code: Optional[str] = None
     error_message: Optional[str] = None
+
+
+class TranscribeDigest(BaseModel):
+    """Сводка успешных транскрибаций за окно (payload уведомления transcribe_digest)."""
+    period_start: datetime
+    period_end: datetime
+    events: int
+    failed_events: int = 0
+    audio_sec: float = 0.0
+    latency_ms: Dict[str, Any] = {}
+    rtf: Dict[str, Any] = {}
+    top_models: List[Dict[str, Any]] = []
+    top_devices: List[Dict[str, Any]] = []
+
+
+class TranscribeErrorRepeats(BaseModel):
+    """Сколько раз error_code повторился после уже отправленной ошибки (payload transcribe_errors)."""
+    error_code: str
+    repeats: int
+    window_sec: float
+    last_at: Optional[datetime] = None
+    last_message: Optional[str] = None
@@ -5,7 +5,7 @@ from enum import Enum
 from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class VideoJobStatus(str, Enum):
@@ -26,11 +26,12 @@ class VideoJobEventIn(BaseModel):
         }
     # обязательное
     job_id: UUID
-    step_code: str             # REQUEST_RECEIVED / FFMPEG_CONVERT / MODEL_INFERENCE / ...
+    # длина ограничена: поля уходят в NOTIFY, а payload у Postgres < 8000 байт
+    step_code: str = Field(max_length=128)  # REQUEST_RECEIVED / FFMPEG_CONVERT / MODEL_INFERENCE / ...
     status: VideoJobStatus     # STARTED / IN_PROGRESS / DONE / FAIL / TIMEOUT
 
     # кто шлёт
-    origin: str = "gpu"        # gpu / orchestrator / ...
+    origin: str = Field("gpu", max_length=64)  # gpu / orchestrator / ...
 
     # инфа про gpu/модель (на будущее — кладём в video_jobs)
     gpu_host: str | None = None
@@ -46,3 +47,50 @@ class VideoJobEventIn(BaseModel):
     # человекочитаемый текст + произвольные метрики
     message: str | None = None
     data: dict[str, Any] | None = None
+
+
+class VideoJobOut(BaseModel):
+    """Строка списка джоб (/jobs) — только то, что нужно дашборду."""
+    model_config = {
+            "protected_namespaces": ()
+        }
+    job_id: UUID
+    created_at_utc: datetime
+    env: str
+    status: VideoJobStatus
+    user_id: int | None = None
+    gpu_host: str | None = None
+    model_name: str | None = None
+    started_at_utc: datetime | None = None
+    finished_at_utc: datetime | None = None
+    duration_total_ms: int | None = None
+    error_code: str | None = None
+
+
+class VideoJobPage(BaseModel):
+    items: list[VideoJobOut]
+    # передать в ?cursor= для следующей страницы; None — дальше пусто
+    next_cursor: str | None = None
+
+
+class VideoJobTimelineStep(BaseModel):
+    id: int
+    created_at_utc: datetime
+    step_code: str
+    status: VideoJobStatus
+    origin: str
+    step_started_at_utc: datetime | None = None
+    step_finished_at_utc: datetime | None = None
+
+    # длительность шага: как прислали, либо finished - started
+    step_duration_ms: int | None = None
+    # от первого события job и от предыдущего события (по времени приёма)
+    since_start_ms: int
+    since_prev_ms: int | None = None
+
+    message: str | None = None
+
+
+class VideoJobTimeline(BaseModel):
+    job: VideoJobOut
+    steps: list[VideoJobTimelineStep]
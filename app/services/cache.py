@@ -0,0 +1,156 @@
+# app/services/cache.py
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from app.services.db.listener import pg_listener
+
+logger = logging.getLogger(__name__)
+
+# канал NOTIFY: {"cache": "<имя>", "key": "<ключ>", "pid": <backend pid>} —
+# сбросить ключ во всех воркерах; pid — соединение, отправившее NOTIFY
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+# SQL-фрагмент для LATERAL / SELECT: pg_notify об инвалидации ключа.
+# Параметры: %(cache)s и выражение ключа подставляются вызывающим.
+NOTIFY_INVALIDATION_SQL = (
+    "pg_notify('" + CACHE_INVALIDATION_CHANNEL + "', "
+    "json_build_object('cache', %(cache)s::text, 'key', {key}::text, 'pid', pg_backend_pid())::text)"
+)
+
+
+class TTLCache:
+    """
+    In-process read-through кэш: LRU с ограничением по размеру + TTL.
+    Потокобезопасный (sync-endpoint-ы крутятся в threadpool).
+
+    Значения отдаются как есть, без копирования — не мутируйте их.
+    """
+
+    def __init__(self, name: str, ttl_sec: float, max_items: int) -> None:
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.max_items = max_items
+
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # растёт на каждую инвалидацию: значение, прочитанное из БД до неё,
+        # в кэш уже не кладём (иначе можно закэшировать устаревшее)
+        self._generation = 0
+        # (ключ, backend pid) наших собственных NOTIFY: своё же уведомление
+        # не должно сбрасывать значение, положенное put после записи
+        self._own: OrderedDict[tuple[str, int], None] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        key = str(key)
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        self._set(key, value, generation)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        """Положить свежее значение (например, только что записанную строку)."""
+        with self._lock:
+            generation = self._generation
+        self._set(str(key), value, generation)
+
+    def expect_own_invalidation(self, key: Any, pid: int) -> None:
+        """
+        Соединение pid сейчас пришлёт NOTIFY по key: эту инвалидацию пропустим.
+        Вызывать до запроса — уведомление может прийти раньше, чем put.
+        """
+        with self._lock:
+            self._own[(str(key), pid)] = None
+            while len(self._own) > self.max_items:
+                self._own.popitem(last=False)
+
+    def _set(self, key: str, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Any, pid: int | None = None) -> None:
+        with self._lock:
+            if pid is not None and self._own.pop((str(key), pid), False) is None:
+                return  # своё же уведомление — значение уже свежее
+            self._generation += 1
+            self.invalidations += 1
+            self._data.pop(str(key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+            self._own.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_items": self.max_items,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches: Dict[str, TTLCache] = {}
+
+
+def register_cache(name: str, ttl_sec: float, max_items: int) -> TTLCache:
+    cache = TTLCache(name, ttl_sec, max_items)
+    _caches[name] = cache
+    return cache
+
+
+def _on_invalidation(payload: str) -> None:
+    try:
+        msg = json.loads(payload)
+        cache = _caches.get(msg["cache"])
+    except (ValueError, KeyError, TypeError):
+        logger.warning("cache: bad invalidation payload %r", payload[:200])
+        return
+    if cache is not None:
+        cache.invalidate(msg["key"], msg.get("pid"))
+
+
+def _on_reconnect() -> None:
+    # пока LISTEN не работал, инвалидации могли потеряться
+    for cache in _caches.values():
+        cache.clear()
+
+
+pg_listener.subscribe(CACHE_INVALIDATION_CHANNEL, _on_invalidation)
+pg_listener.on_connect(_on_reconnect)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -1,38 +1,85 @@
 from uuid import uuid4
+from app.core.config import settings
+from app.services.cache import NOTIFY_INVALIDATION_SQL, register_cache
 from app.services.db.db import get_conn
 
+CHANNELS_CACHE = "channels_by_user"
+
+# каналы пользователя по user_id; сбрасывается при создании/деактивации канала
+channels_cache = register_cache(
+    CHANNELS_CACHE, settings.channels_cache_ttl_sec, settings.cache_max_items
+)
+
+
+_INSERT_CHANNEL_SQL = """
+    WITH c AS (
+        INSERT INTO channels (id, user_id, channel)
+        VALUES (%(id)s, %(user_id)s, %(channel)s)
+        ON CONFLICT (user_id, channel) WHERE is_active DO NOTHING
+        RETURNING id, user_id
+    )
+    SELECT c.id::text AS id
+    FROM c, LATERAL (SELECT """ + NOTIFY_INVALIDATION_SQL.format(key="c.user_id") + """) n;
+    """
+
+_GET_ACTIVE_CHANNEL_SQL = """
+    SELECT id::text AS id
+    FROM channels
+    WHERE user_id = %(user_id)s AND channel = %(channel)s AND is_active;
+    """
+
 
 def ensure_channel_exists(user_id: int, channel: str) -> str:
+    """
+    Идемпотентно: id активного канала (user_id, channel), создаёт при отсутствии.
+    Гонку разруливает uq_channels_user_channel_active: DO NOTHING не пишет
+    новую версию строки на каждый повторный вызов, а существующий канал
+    берём отдельным SELECT (из того же снимка конкурентную вставку не видно).
+    Канал могли деактивировать между запросами — тогда пробуем снова.
+    NOTIFY об инвалидации кэша — только если канал реально создан.
+    """
+    params = {"id": uuid4(), "user_id": user_id, "channel": channel, "cache": CHANNELS_CACHE}
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT id FROM channels
-            WHERE user_id = %s AND channel = %s AND is_active = TRUE;
-        """, (user_id, channel))
-        row = cur.fetchone()
-        if row:
-            return row["id"]
+        while True:
+            cur.execute(_INSERT_CHANNEL_SQL, params)
+            row = cur.fetchone()
+            if row is not None:
+                break
+            cur.execute(_GET_ACTIVE_CHANNEL_SQL, params)
+            existing = cur.fetchone()
+            if existing is not None:
+                return existing["id"]
 
-        new_id = str(uuid4())
-        cur.execute("""
-            INSERT INTO channels (id, user_id, channel)
-            VALUES (%s, %s, %s);
-        """, (new_id, user_id, channel))
+    channels_cache.invalidate(user_id)
+    return row["id"]
 
-        return new_id
 
-
-def get_channels_by_user(user_id: int):
+def _load_channels(user_id: int):
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("""
-            SELECT * FROM channels
+            SELECT id::text AS id, user_id, channel, is_active, created_at
+            FROM channels
             WHERE user_id = %s
             ORDER BY created_at DESC;
         """, (user_id,))
         return cur.fetchall()
 
 
+def get_channels_by_user(user_id: int):
+    return channels_cache.get_or_load(user_id, lambda: _load_channels(user_id))
+
+
 def deactivate_channel(channel_id: str):
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("""
-            UPDATE channels SET is_active = FALSE WHERE id = %s;
-        """, (channel_id,))
+            WITH c AS (
+                UPDATE channels SET is_active = FALSE WHERE id = %(channel_id)s
+                RETURNING user_id
+            )
+            SELECT c.user_id
+            FROM c, LATERAL (SELECT """ + NOTIFY_INVALIDATION_SQL.format(key="c.user_id") + """) n;
+        """, {"channel_id": channel_id, "cache": CHANNELS_CACHE})
+        row = cur.fetchone()
+
+    if row:
+        channels_cache.invalidate(row["user_id"])
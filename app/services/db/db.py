@@ -1,19 +1,185 @@
 # app/services/db.py
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator
+
 import psycopg
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
-def get_conn():
-    """
-    Открываем новое подключение к Postgres
-    через единый URL (DATABASE_URL).
-    """
-    conn = psycopg.connect(
+_pool: ConnectionPool | None = None
+_async_pool: AsyncConnectionPool | None = None
+
+# статистика ожидания подключения из пула (в мс)
+_wait_lock = threading.Lock()
+_wait_stats: Dict[str, float] = {
+    "acquired": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+    "wait_ms_last": 0.0,
+}
+
+
+def _connect() -> psycopg.Connection:
+    return psycopg.connect(
         settings.database_url,
         autocommit=True,
         row_factory=dict_row,
     )
-    return conn
+
+
+def init_pool() -> None:
+    """
+    Открываем пул подключений (вызывается на старте FastAPI).
+    Подключения поднимаются в фоне — приложение стартует,
+    даже если Postgres пока недоступен.
+    """
+    global _pool
+    if _pool is not None:
+        return
+
+    _pool = ConnectionPool(
+        settings.database_url,
+        kwargs={"autocommit": True, "row_factory": dict_row},
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        timeout=settings.db_pool_timeout_sec,
+        max_idle=settings.db_pool_max_idle_sec,
+        max_lifetime=settings.db_pool_max_lifetime_sec,
+        check=ConnectionPool.check_connection,
+        name="orchestrator",
+        open=False,
+    )
+    _pool.open(wait=False)
+    logger.info(
+        "db pool opened: min=%s max=%s",
+        settings.db_pool_min_size,
+        settings.db_pool_max_size,
+    )
+
+
+def close_pool() -> None:
+    """Закрываем пул (вызывается на shutdown FastAPI)."""
+    global _pool
+    if _pool is None:
+        return
+    _pool.close()
+    _pool = None
+    logger.info("db pool closed")
+
+
+async def init_async_pool() -> None:
+    """
+    Открываем async-пул для endpoint-ов, которые пишут в БД
+    прямо из event loop (без threadpool). Настройки — те же, что у sync-пула.
+    """
+    global _async_pool
+    if _async_pool is not None:
+        return
+
+    _async_pool = AsyncConnectionPool(
+        settings.database_url,
+        kwargs={"autocommit": True, "row_factory": dict_row},
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        timeout=settings.db_pool_timeout_sec,
+        max_idle=settings.db_pool_max_idle_sec,
+        max_lifetime=settings.db_pool_max_lifetime_sec,
+        check=AsyncConnectionPool.check_connection,
+        name="orchestrator-async",
+        open=False,
+    )
+    await _async_pool.open(wait=False)
+    logger.info("async db pool opened")
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    if _async_pool is None:
+        return
+    await _async_pool.close()
+    _async_pool = None
+    logger.info("async db pool closed")
+
+
+def _record_wait(wait_ms: float) -> None:
+    with _wait_lock:
+        _wait_stats["acquired"] += 1
+        _wait_stats["wait_ms_total"] += wait_ms
+        _wait_stats["wait_ms_last"] = wait_ms
+        if wait_ms > _wait_stats["wait_ms_max"]:
+            _wait_stats["wait_ms_max"] = wait_ms
+
+
+@contextmanager
+def get_conn() -> Iterator[psycopg.Connection]:
+    """
+    Берём подключение к Postgres из пула.
+    Используется как раньше: `with get_conn() as conn, conn.cursor() as cur`.
+
+    Если пул не открыт (alembic, скрипты, тесты) — открываем
+    отдельное подключение через единый URL (DATABASE_URL), как раньше.
+    """
+    if _pool is None:
+        with _connect() as conn:
+            yield conn
+        return
+
+    start = time.perf_counter()
+    with _pool.connection() as conn:
+        _record_wait((time.perf_counter() - start) * 1000)
+        yield conn
+
+
+@asynccontextmanager
+async def get_async_conn() -> AsyncIterator[psycopg.AsyncConnection]:
+    """
+    Async-аналог get_conn(): `async with get_async_conn() as conn`.
+    Без открытого пула — отдельное подключение.
+    """
+    if _async_pool is None:
+        conn = await psycopg.AsyncConnection.connect(
+            settings.database_url,
+            autocommit=True,
+            row_factory=dict_row,
+        )
+        async with conn:
+            yield conn
+        return
+
+    start = time.perf_counter()
+    async with _async_pool.connection() as conn:
+        _record_wait((time.perf_counter() - start) * 1000)
+        yield conn
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Метрики пула: размер, очередь ожидания и время ожидания подключения."""
+    with _wait_lock:
+        acquired = int(_wait_stats["acquired"])
+        wait = {
+            "acquired": acquired,
+            "wait_ms_avg": round(_wait_stats["wait_ms_total"] / acquired, 3) if acquired else 0.0,
+            "wait_ms_max": round(_wait_stats["wait_ms_max"], 3),
+            "wait_ms_last": round(_wait_stats["wait_ms_last"], 3),
+        }
+
+    if _pool is None:
+        return {"enabled": False, "wait": wait}
+
+    return {
+        "enabled": True,
+        "min_size": _pool.min_size,
+        "max_size": _pool.max_size,
+        "wait": wait,
+        "pool": _pool.get_stats(),
+        "async_pool": _async_pool.get_stats() if _async_pool is not None else None,
+    }
@@ -0,0 +1,144 @@
+# app/services/db/listener.py
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NotifyCallback = Callable[[str], None]
+
+
+class PgListener:
+    """
+    Одно общее LISTEN-подключение на процесс.
+    Модули подписываются на канал колбэком (subscribe), а listener
+    раздаёт им payload из NOTIFY — без опроса БД.
+
+    Колбэки вызываются прямо в event loop: должны быть быстрыми
+    и не блокирующими (положить в очередь и выйти).
+    При обрыве подключения переподключаемся с backoff и заново делаем LISTEN.
+    """
+
+    def __init__(self, reconnect_min_sec: float = 0.5, reconnect_max_sec: float = 30.0) -> None:
+        self.reconnect_min_sec = reconnect_min_sec
+        self.reconnect_max_sec = reconnect_max_sec
+
+        self._callbacks: Dict[str, list[NotifyCallback]] = {}
+        self._connect_callbacks: list[Callable[[], None]] = []
+        self._conn: psycopg.AsyncConnection | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+        self.connected = False
+        self.notifications = 0
+        self.callback_errors = 0
+        self.reconnects = 0
+
+    def subscribe(self, channel: str, callback: NotifyCallback) -> None:
+        """
+        Регистрирует колбэк на канал. Вызывать до start(): новый канал
+        на живом подключении подхватится только после переподключения.
+        """
+        self._callbacks.setdefault(channel, []).append(callback)
+
+    def on_connect(self, callback: Callable[[], None]) -> None:
+        """
+        Колбэк после каждого (пере)подключения: NOTIFY, пришедшие,
+        пока LISTEN не работал, потеряны — подписчик может сбросить состояние.
+        """
+        self._connect_callbacks.append(callback)
+
+    async def _listen(self) -> None:
+        conn = await psycopg.AsyncConnection.connect(settings.database_url, autocommit=True)
+        self._conn = conn
+        try:
+            for channel in self._callbacks:
+                await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            self.connected = True
+            logger.info("pg listener: LISTEN %s", ", ".join(self._callbacks))
+            for callback in self._connect_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    self.callback_errors += 1
+                    logger.exception("pg listener: on_connect callback failed")
+
+            async for notify in conn.notifies():
+                self.notifications += 1
+                for callback in self._callbacks.get(notify.channel, ()):
+                    try:
+                        callback(notify.payload)
+                    except Exception:
+                        self.callback_errors += 1
+                        logger.exception("pg listener: callback failed (%s)", notify.channel)
+        finally:
+            self.connected = False
+            self._conn = None
+            await conn.close()
+
+    async def _run(self) -> None:
+        delay = self.reconnect_min_sec
+        while not self._stopping:
+            try:
+                await self._listen()
+                delay = self.reconnect_min_sec
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._stopping:
+                    break
+                logger.warning("pg listener: connection lost (%s), retry in %.1fs", e, delay)
+            if self._stopping:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_sec)
+
+    async def start(self) -> None:
+        if self._task is not None or not self._callbacks:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="pg-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "connected": self.connected,
+            "channels": sorted(self._callbacks),
+            "notifications": self.notifications,
+            "callback_errors": self.callback_errors,
+            "reconnects": self.reconnects,
+        }
+
+
+pg_listener = PgListener()
+
+
+async def start_pg_listener() -> None:
+    await pg_listener.start()
+
+
+async def stop_pg_listener() -> None:
+    await pg_listener.stop()
+
+
+def get_pg_listener_stats() -> Dict[str, Any]:
+    return pg_listener.stats()
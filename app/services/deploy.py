@@ -3,14 +3,19 @@ from __future__ import annotations
 
 import datetime as dt
 import subprocess
+import threading
 import time
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Any, Dict, Optional
 import os
 
 import requests
 
 from app.core.config import settings
+from app.services.deploy_output import DeployOutput
+from app.services.deploy_timing import MONO_KEY, build_timings, close_stage, public_stages
+from app.services.readiness import wait_all_ready
 from app.services.notifier.telegram_notifier import send_deploy_start_notification
 
 
@@ -32,36 +37,70 @@ import os
 
 import requests
 ...
-def run_ssh_deploy() -> Dict[str, Any]:
-    """
-    Запуск деплоя на домашний ПК через SSH.
-    ВО ВСЕХ ВЕТКАХ возвращает словарь с ключами:
-    returncode, stdout, stderr, duration_ms
-    """
-
-    if os.getenv("DRY_RUN_DEPLOY") == "1":
-        time.sleep(0.3)
-        return {
-            "returncode": 0,
-            "stdout": "[DRY_RUN] ssh deploy skipped, pretending success",
-            "stderr": "",
-            "duration_ms": 600,
-        }
-
+_REMOTE_DIR = "/home/getyrno/ml-service-voice-trans"
+
+# Команды удалённого скрипта по режимам (settings.deploy_mode):
+# - recreate — как раньше: стек гасится до сборки, кэш сборки вычищается;
+# - swap — собираем/тянем образы, пока старый стек работает, затем
+#   `up -d` пересоздаёт только изменившиеся контейнеры; чистка висячих
+#   образов — отдельным шагом после успешного healthcheck (run_ssh_prune).
+_REMOTE_STEPS = {
+    "recreate": [
+        "echo DEPLOY_START",
+        f"cd {_REMOTE_DIR}",
+        "git fetch origin main",
+        "git reset --hard origin/main",
+        "(docker compose down --remove-orphans || true)",
+        "docker system prune -af --volumes",
+        "docker compose up -d --build",
+        "echo DEPLOY_END",
+    ],
+    "swap": [
+        "echo DEPLOY_START",
+        f"cd {_REMOTE_DIR}",
+        "git fetch origin main",
+        "git reset --hard origin/main",
+        # plain-вывод BuildKit: по нему считаем шаги и попадания в кэш
+        "export BUILDKIT_PROGRESS=plain",
+        "docker compose pull --ignore-buildable",
+        "docker compose build --pull",
+        "docker compose up -d --remove-orphans",
+        "echo DEPLOY_END",
+    ],
+}
+
+_PRUNE_STEPS = [
+    f"cd {_REMOTE_DIR}",
+    "docker image prune -f",
+]
+
+# с какого этапа старый стек перестаёт обслуживать запросы
+_DOWNTIME_STAGE = {"recreate": "compose_down", "swap": "compose_up"}
+
+
+def _remote_cmd(steps: list[str]) -> str:
     # Заворачиваем скрипт в одну безопасную строку для bash -lc '...'
-    remote_cmd = (
+    return (
         'wsl.exe -d Ubuntu -- /usr/bin/env bash -lc '
-        '"set -xe; '
-        'echo DEPLOY_START; '
-        'cd /home/getyrno/ml-service-voice-trans; '
-        'git fetch origin main; '
-        'git reset --hard origin/main; '
-        '(docker compose down --remove-orphans || true); '
-        'docker system prune -af --volumes; '
-        'docker compose up -d --build; '
-        'echo DEPLOY_END"'
+        '"set -xe; ' + "; ".join(steps) + '"'
     )
 
+
+def _run_ssh(
+    deploy_id: str,
+    stages: list[dict],
+    steps: list[str],
+    spill_name: str,
+    live_key: str = "output",
+) -> tuple[Dict[str, Any], DeployOutput]:
+    """
+    Выполняет удалённый скрипт, читая вывод построчно по мере выполнения:
+    целиком — в spill-файл (settings.deploy_output_dir/<spill_name>.log),
+    в памяти — только хвост; маркеры и шаги сборки сразу попадают в stages
+    (см. deploy_output.py). live_key — под каким полем вывод виден в /deploy/live.
+    stderr сливаем в stdout: `set -x` пишет команды в stderr, и только в одном
+    потоке они идут в том же порядке, что и вывод сборки.
+    """
     ssh_cmd = [
         "ssh",
         "-i",
@@ -69,64 +108,182 @@ def run_ssh_deploy() -> Dict[str, Any]:
         "-o",
         "StrictHostKeyChecking=no",
         f"{settings.home_ssh_user}@{settings.home_ssh_host}",
-        remote_cmd,
+        _remote_cmd(steps),
     ]
 
+    output = DeployOutput(
+        os.path.join(settings.deploy_output_dir, f"{spill_name}.log"),
+        tail_lines=settings.deploy_output_tail_lines,
+        push_stage=lambda name, status, info: push_stage(stages, name, status, info),
+    )
+    _set_live(deploy_id, stages, output, live_key)
+
     start = time.time()
+    returncode = -1
+    error = None
     try:
-        proc = subprocess.run(
+        proc = subprocess.Popen(
             ssh_cmd,
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            timeout=1800,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
         )
-        duration = int((time.time() - start) * 1000)
+        reader = threading.Thread(target=output.pump, args=(proc.stdout,), daemon=True)
+        reader.start()
+        try:
+            returncode = proc.wait(timeout=settings.deploy_ssh_timeout_sec)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            error = f"ssh deploy timed out after {settings.deploy_ssh_timeout_sec}s"
+        # процесс завершён (или убит) — stdout дойдёт до EOF; без таймаута,
+        # иначе finish() закроет spill-файл, пока pump ещё пишет
+        reader.join()
+    except Exception as e:
+        error = str(e)
+
+    ok = returncode == 0 and error is None
+    output.finish(ok)
+    duration = int((time.time() - start) * 1000)
+
+    stdout = output.text()
+    stderr = "" if ok else stdout
+    if error:
+        stderr = f"{stderr}\n{error}".strip()
+    return {
+        "returncode": returncode if error is None else -1,
+        "stdout": stdout,
+        "stderr": stderr,
+        "duration_ms": duration,
+        "output_path": output.spill_path,
+    }, output
+
+
+def run_ssh_deploy(deploy_id: str = "manual", stages: list[dict] | None = None) -> Dict[str, Any]:
+    """
+    Запуск деплоя на домашний ПК через SSH.
+    ВО ВСЕХ ВЕТКАХ возвращает словарь с ключами:
+    returncode, stdout, stderr, duration_ms, output_path,
+    mode, build (шаги/кэш сборки), downtime_started (time.monotonic()
+    момента, когда старый стек перестал обслуживать, или None)
 
-        # 👇 можно оставить, если хочешь видеть этот лог в консоли сервера
-        # print("SSH CMD:", " ".join(ssh_cmd))
-        # print("SSH RC:", proc.returncode)
-        # print("SSH STDOUT:\n", proc.stdout)
-        # print("SSH STDERR:\n", proc.stderr)
+    stdout в результате — последние строки вывода, stderr — они же при ошибке.
+    """
+    if stages is None:
+        stages = []
+    mode = settings.deploy_mode
 
+    if os.getenv("DRY_RUN_DEPLOY") == "1":
+        time.sleep(0.3)
         return {
-            "returncode": proc.returncode,
-            "stdout": proc.stdout,
-            "stderr": proc.stderr,
-            "duration_ms": duration,
+            "returncode": 0,
+            "stdout": "[DRY_RUN] ssh deploy skipped, pretending success",
+            "stderr": "",
+            "duration_ms": 600,
+            "output_path": None,
+            "mode": mode,
+            "build": None,
+            "downtime_started": time.monotonic(),
         }
-    except Exception as e:
-        duration = int((time.time() - start) * 1000)
+
+    info, output = _run_ssh(deploy_id, stages, _REMOTE_STEPS[mode], deploy_id)
+    info["mode"] = mode
+    info["build"] = output.build_stats()
+    info["downtime_started"] = output.stage_started.get(_DOWNTIME_STAGE[mode])
+    return info
+
+
+def run_ssh_prune(deploy_id: str, stages: list[dict]) -> Dict[str, Any]:
+    """Чистка висячих образов (swap-режим, только после успешного healthcheck)."""
+    if os.getenv("DRY_RUN_DEPLOY") == "1":
+        return {"returncode": 0, "stdout": "", "stderr": "", "duration_ms": 0, "output_path": None}
+    # отдельным полем: хвост сборки/переключения в /deploy/live не затираем
+    info, _ = _run_ssh(deploy_id, stages, _PRUNE_STEPS, f"{deploy_id}.prune", live_key="prune_output")
+    return info
+
+
+# --- живое состояние текущего деплоя (этого процесса) для /deploy/live ---
+
+_live_lock = threading.Lock()
+_live: Dict[str, Any] = {"deploy_id": None, "active": False, "stages": [], "output": None, "prune_output": None}
+
+
+def _set_live(deploy_id: str, stages: list[dict], output: DeployOutput | None = None, key: str = "output") -> None:
+    with _live_lock:
+        if _live["deploy_id"] != deploy_id:
+            _live["prune_output"] = None  # чистка прошлого деплоя к новому не относится
+        _live.update(deploy_id=deploy_id, active=True, stages=stages)
+        if output is not None:
+            _live[key] = output
+
+
+def _finish_live() -> None:
+    with _live_lock:
+        _live["active"] = False
+
+
+def get_live_deploy(tail: int = 50) -> Dict[str, Any]:
+    """Этапы и хвост вывода текущего (или последнего) деплоя в этом процессе."""
+    with _live_lock:
+        output: DeployOutput | None = _live["output"]
+        prune: DeployOutput | None = _live["prune_output"]
         return {
-            "returncode": -1,
-            "stdout": "",
-            "stderr": str(e),
-            "duration_ms": duration,
+            "deploy_id": _live["deploy_id"],
+            "active": _live["active"],
+            "stages": public_stages(list(_live["stages"])),
+            "output": output.snapshot(tail) if output is not None else None,
+            "prune_output": prune.snapshot(tail) if prune is not None else None,
         }
 
 def run_healthcheck() -> Dict[str, Any]:
     """
-    Healthcheck приложения.
+    Readiness-проба приложения (см. readiness.py): опрашиваем все
+    settings.healthcheck_urls параллельно с backoff до общего дедлайна.
     В DRY-RUN режиме тоже всегда успешный.
     Возвращает словарь с ключами:
-    status_code, duration_ms, error
+    ready, status_code, duration_ms, time_to_ready_ms, ready_at, error,
+    probes (по каждому URL: попытки с dns/connect/tls/ttfb)
     """
 
     # В dev-режиме можно не долбить реальный сервис
     if os.getenv("DRY_RUN_DEPLOY") == "1":
         return {
+            "ready": True,
             "status_code": 200,
             "duration_ms": 0,
+            "time_to_ready_ms": 0,
+            "ready_at": time.monotonic(),
             "error": None,
+            "probes": [],
         }
 
-    start = time.time()
-    try:
-        r = requests.get(settings.healthcheck_url, timeout=5)
-        duration = int((time.time() - start) * 1000)
-        return {"status_code": r.status_code, "duration_ms": duration, "error": None}
-    except Exception as e:
-        duration = int((time.time() - start) * 1000)
-        return {"status_code": 0, "duration_ms": duration, "error": str(e)}
+    start = time.monotonic()
+    probes = wait_all_ready(
+        settings.healthcheck_urls,
+        deadline_sec=settings.healthcheck_deadline_sec,
+        attempt_timeout_sec=settings.healthcheck_attempt_timeout_sec,
+        backoff_initial_sec=settings.healthcheck_backoff_initial_sec,
+        backoff_max_sec=settings.healthcheck_backoff_max_sec,
+        success_threshold=settings.healthcheck_success_threshold,
+    )
+    duration = int((time.monotonic() - start) * 1000)
+
+    ready = all(p["ready"] for p in probes)
+    failed = [p for p in probes if not p["ready"]]
+    # готовы тогда, когда готов последний из URL
+    ready_at = max(p["ready_at"] for p in probes) if ready else None
+    return {
+        "ready": ready,
+        "status_code": probes[0]["status_code"] if ready else failed[0]["status_code"],
+        "duration_ms": duration,
+        "time_to_ready_ms": int((ready_at - start) * 1000) if ready else None,
+        "ready_at": ready_at,
+        "error": "; ".join(f"{p['url']}: {p['error']}" for p in failed) or None,
+        "probes": [{k: v for k, v in p.items() if k != "ready_at"} for p in probes],
+    }
 
 
 def build_deploy_event(
@@ -165,14 +322,21 @@ def build_deploy_event(
             },
         },
         "deploy": {
+            "mode": ssh_info.get("mode"),
             "ssh_returncode": ssh_info.get("returncode"),
             "ssh_duration_ms": ssh_info.get("duration_ms"),
+            # None — простой не измерен (деплой не дошёл до успешного healthcheck)
+            "downtime_ms": ssh_info.get("downtime_ms"),
+            "build": ssh_info.get("build"),
         },
         "healthcheck": {
             "url": settings.healthcheck_url,
+            "ready": hc_info.get("ready"),
             "status_code": hc_info.get("status_code"),
             "duration_ms": hc_info.get("duration_ms"),
+            "time_to_ready_ms": hc_info.get("time_to_ready_ms"),
             "error": hc_info.get("error"),
+            "probes": hc_info.get("probes"),
         },
         "status": {
             "result": result,          # success | failed
@@ -182,27 +346,46 @@ def build_deploy_event(
     }
 
 
-def do_deploy(payload: Dict[str, Any]) -> Dict[str, Any]:
-    deploy_id = str(uuid.uuid4())
+def do_deploy(payload: Dict[str, Any], deploy_id: str | None = None) -> Dict[str, Any]:
+    deploy_id = deploy_id or str(uuid.uuid4())
     stages = []
+    _set_live(deploy_id, stages)
+    try:
+        return _do_deploy(payload, deploy_id, stages)
+    finally:
+        # и при исключении — иначе /deploy/live навсегда active
+        _finish_live()
+
 
+def _do_deploy(payload: Dict[str, Any], deploy_id: str, stages: list[dict]) -> Dict[str, Any]:
     # 1) START
     push_stage(stages, "deploy_start")
+    push_stage(stages, "telegram_start")
     try:
-        send_deploy_start_notification(payload)
-        push_stage(stages, "telegram_start", "ok")
+        # очередь outbox не бросает — ошибка отправки приходит в результате future;
+        # ждём его недолго (critical — вне очереди), дольше деплой не держим
+        future = send_deploy_start_notification(payload)
+        res = future.result(timeout=settings.telegram_timeout_sec) if future is not None else None
+        if res is None:
+            push_stage(stages, "telegram_start", "ok", "telegram disabled or deploy bot not configured")
+        elif res["ok"]:
+            push_stage(stages, "telegram_start", "ok")
+        else:
+            push_stage(stages, "telegram_start", "failed", res.get("error"))
+    except FutureTimeoutError:
+        push_stage(stages, "telegram_start", "failed", f"no result in {settings.telegram_timeout_sec}s")
     except Exception as e:
         push_stage(stages, "telegram_start", "failed", str(e))
 
     # 2) SSH deploy
     push_stage(stages, "ssh_deploy")
-    ssh_info = run_ssh_deploy()
+    ssh_info = run_ssh_deploy(deploy_id, stages)
     if ssh_info.get("returncode") != 0:
         push_stage(stages, "ssh_deploy", "failed", ssh_info.get("stderr"))
         result = "failed"
         stage = "ssh"
         error_message = ssh_info.get("stderr")
-        hc_info = {"status_code": 0, "duration_ms": 0, "error": None}
+        hc_info = {"ready": False, "status_code": 0, "duration_ms": 0, "error": None}
     else:
         push_stage(stages, "ssh_deploy", "ok")
 
@@ -210,11 +393,26 @@ def do_deploy(payload: Dict[str, Any]) -> Dict[str, Any]:
         push_stage(stages, "healthcheck")
         hc_info = run_healthcheck()
 
-        if hc_info.get("status_code") == 200:
+        if hc_info.get("ready"):
             push_stage(stages, "healthcheck", "ok")
             result = "success"
             stage = None
             error_message = None
+
+            # простой: от остановки старых контейнеров до готовности сервиса
+            if ssh_info.get("downtime_started") is not None:
+                ssh_info["downtime_ms"] = int((hc_info["ready_at"] - ssh_info["downtime_started"]) * 1000)
+
+            # старые образы больше не нужны для отката — чистим висячие
+            if ssh_info.get("mode") == "swap":
+                push_stage(stages, "image_prune")
+                prune_info = run_ssh_prune(deploy_id, stages)
+                push_stage(
+                    stages,
+                    "image_prune",
+                    "ok" if prune_info.get("returncode") == 0 else "failed",
+                    prune_info.get("stderr") or None,
+                )
         else:
             push_stage(stages, "healthcheck", "failed", hc_info.get("error"))
             result = "failed"
@@ -235,8 +433,10 @@ def do_deploy(payload: Dict[str, Any]) -> Dict[str, Any]:
         hc_info=hc_info,
     )
 
-    # 👇 добавляем этапы в event
-    event["stages"] = stages
+    # 👇 добавляем этапы в event (+ длительности и сравнение с прошлыми деплоями)
+    event["stages"] = public_stages(stages)
+    event["timings"] = build_timings(stages)
+    event["deploy"]["output_path"] = ssh_info.get("output_path")
 
     return event
 
@@ -245,10 +445,14 @@ def push_stage(stages: list[dict], name: str, status: str = "start", info: str =
     utc = dt.datetime.now(dt.timezone.utc)
     msk = utc + dt.timedelta(hours=3)
 
-    stages.append({
+    entry = {
         "stage": name,
         "status": status,   # start | ok | failed
         "info": info,
         "utc": utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
         "msk": msk.strftime("%Y-%m-%d %H:%M:%S"),
-    })
+        MONO_KEY: time.monotonic(),
+    }
+    if status != "start":
+        close_stage(stages, entry)
+    stages.append(entry)
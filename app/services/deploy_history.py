@@ -0,0 +1,368 @@
+# app/services/deploy_history.py
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from typing import Any, BinaryIO, Dict, Iterator, List
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Журнал деплоев = сегменты JSON Lines:
+#   deploy.log                 — активный (в него дописываем; /status/latest читает его хвост)
+#   deploy.log.<first_no>      — закрытые по размеру, first_no — сквозной номер первой записи
+# У каждого сегмента — sidecar <сегмент>.idx: записи фиксированного размера
+#   deploy_id(16) | ts_ms(8) | result(1) | offset(8) | length(4) | crc32(branch)(4) | crc32(actor)(4)
+# По индексу фильтруем и находим смещение, саму запись читаем из mmap сегмента.
+_INDEX_RECORD = struct.Struct("<16sqBQIII")
+
+_RESULT_CODES = {"success": 1, "failed": 2}
+
+
+def _id_key(deploy_id: Any) -> bytes:
+    try:
+        return uuid.UUID(str(deploy_id)).bytes
+    except ValueError:
+        return hashlib.md5(str(deploy_id).encode()).digest()
+
+
+def _crc(value: str | None) -> int:
+    return zlib.crc32(value.encode()) if value else 0
+
+
+def _ts_ms(event: Dict[str, Any]) -> int:
+    utc = (event.get("timestamps") or {}).get("utc")
+    try:
+        ts = dt.datetime.strptime(utc, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=dt.timezone.utc)
+    except (TypeError, ValueError):
+        ts = dt.datetime.now(dt.timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+
+def _index_record(event: Dict[str, Any], offset: int, length: int) -> tuple:
+    git = event.get("git") or {}
+    result = (event.get("status") or {}).get("result")
+    return (
+        _id_key(event.get("deploy_id")),
+        _ts_ms(event),
+        _RESULT_CODES.get(result, 0),
+        offset,
+        length,
+        _crc(git.get("branch")),
+        _crc(git.get("actor")),
+    )
+
+
+class _Segment:
+    """Один файл журнала + его индекс (в памяти — распакованные записи)."""
+
+    def __init__(self, path: str, first_no: int) -> None:
+        self.path = path
+        self.first_no = first_no
+        self.records: List[tuple] = []
+        self.end = 0  # байт журнала, покрытых индексом
+        self._mm: mmap.mmap | None = None
+        self._mm_size = 0
+
+    @property
+    def idx_path(self) -> str:
+        return self.path + ".idx"
+
+    @contextlib.contextmanager
+    def _index_lock(self) -> Iterator[BinaryIO]:
+        """
+        .idx, открытый на дозапись под эксклюзивным flock: индекс общий для всех
+        воркеров, дописывать его можно только после сверки с тем, что уже на диске.
+        """
+        with open(self.idx_path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync_index(self, f: BinaryIO) -> None:
+        """Догружает из .idx записи, дописанные другими (под _index_lock)."""
+        size = _INDEX_RECORD.size
+        known = len(self.records) * size
+        total = f.seek(0, os.SEEK_END)
+        whole = total - total % size
+        if whole > known:
+            f.seek(known)
+            raw = f.read(whole - known)
+            for pos in range(0, len(raw), size):
+                self.records.append(_INDEX_RECORD.unpack_from(raw, pos))
+            last = self.records[-1]
+            self.end = last[3] + last[4] + 1
+        if whole != total:
+            f.truncate(whole)  # недописанная запись индекса (упали посреди write)
+
+    def _index_tail(self, f: BinaryIO) -> None:
+        """
+        Индексирует строки журнала за self.end, которых нет в .idx
+        (упали между записью строки и записью индекса, или .idx потерян).
+        Только под _index_lock и после _sync_index — иначе задвоим записи.
+        """
+        try:
+            log_size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if log_size <= self.end:
+            return
+
+        added = []
+        with open(self.path, "rb") as log:
+            log.seek(self.end)
+            offset = self.end
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break  # недописанная строка
+                body = line.rstrip(b"\r\n")
+                if body.strip():
+                    try:
+                        added.append(_index_record(json.loads(body), offset, len(body)))
+                    except ValueError:
+                        logger.warning("deploy history: bad line at %s:%s", self.path, offset)
+                offset += len(line)
+        if added:
+            f.write(b"".join(_INDEX_RECORD.pack(*r) for r in added))
+            f.flush()
+            self.records.extend(added)
+        self.end = offset
+
+    def load_index(self) -> None:
+        self.records = []
+        self.end = 0
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Сверяется с .idx на диске и доиндексирует хвост журнала, если он не покрыт."""
+        if not os.path.exists(self.path) and not os.path.exists(self.idx_path):
+            return
+        with self._index_lock() as f:
+            self._sync_index(f)
+            self._index_tail(f)
+
+    def append(self, line: bytes, event: Dict[str, Any]) -> tuple:
+        with self._index_lock() as idx:
+            self._sync_index(idx)
+            self._index_tail(idx)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line + b"\n")
+                f.flush()
+                st = os.fstat(f.fileno())
+            record = _index_record(event, offset, len(line))
+            idx.write(_INDEX_RECORD.pack(*record))
+            idx.flush()
+        self.records.append(record)
+        self.end = offset + len(line) + 1
+        return record, st
+
+    def read(self, record: tuple) -> Dict[str, Any]:
+        offset, length = record[3], record[4]
+        mm = self._mmap(offset + length)
+        return json.loads(mm[offset:offset + length])
+
+    def _mmap(self, need: int) -> mmap.mmap:
+        # закрытые сегменты неизменны — mmap держим открытым;
+        # активный перемапливаем, когда он вырос
+        if self._mm is None or self._mm_size < need:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mm_size = len(self._mm)
+        return self._mm
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._mm_size = 0
+
+
+class DeployHistory:
+    """
+    Сегментированный журнал деплоев с индексом.
+    Пишет один процесс (деплой), читать могут все воркеры: перед чтением
+    догружаем новые записи индекса, при ротации — перечитываем список сегментов.
+    .idx дописывается только под flock и после сверки с диском, поэтому
+    читатель, доиндексировавший хвост, не задвоит записи писателя.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._by_id: Dict[bytes, tuple[_Segment, int]] = {}
+        self._active_ino: int | None = None
+        self._loaded = False
+
+    @property
+    def _base(self) -> str:
+        return settings.deploy_log_path
+
+    def _reload(self) -> None:
+        for seg in self._segments:
+            seg.close()
+        self._segments = []
+        self._by_id = {}
+
+        closed = []
+        for path in glob.glob(glob.escape(self._base) + ".*"):
+            suffix = path[len(self._base) + 1:]
+            if suffix.isdigit():
+                closed.append((int(suffix), path))
+        for first_no, path in sorted(closed):
+            self._add_segment(_Segment(path, first_no))
+
+        next_no = self._next_no()
+        self._add_segment(_Segment(self._base, next_no))
+        try:
+            self._active_ino = os.stat(self._base).st_ino
+        except FileNotFoundError:
+            self._active_ino = None
+        self._loaded = True
+
+    def _add_segment(self, seg: _Segment) -> None:
+        seg.load_index()
+        self._segments.append(seg)
+        for recno, record in enumerate(seg.records):
+            self._by_id[record[0]] = (seg, recno)
+
+    def _next_no(self) -> int:
+        if not self._segments:
+            return 0
+        last = self._segments[-1]
+        return last.first_no + len(last.records)
+
+    def _refresh(self) -> None:
+        """Подхватить записи/ротации, сделанные другим процессом."""
+        if not self._loaded:
+            self._reload()
+            return
+        try:
+            st = os.stat(self._base)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._active_ino:
+            self._reload()
+            return
+        active = self._segments[-1]
+        if st.st_size > active.end:
+            before = len(active.records)
+            active._catch_up()
+            for recno in range(before, len(active.records)):
+                self._by_id[active.records[recno][0]] = (active, recno)
+
+    def _rotate(self) -> None:
+        active = self._segments[-1]
+        closed_path = f"{self._base}.{active.first_no:010d}"
+        os.replace(active.idx_path, closed_path + ".idx")
+        os.replace(active.path, closed_path)
+        active.close()
+        active.path = closed_path
+
+        new_active = _Segment(self._base, active.first_no + len(active.records))
+        self._segments.append(new_active)
+        self._active_ino = None
+        logger.info("deploy history: rotated segment -> %s", closed_path)
+
+    def append(self, event: Dict[str, Any]) -> tuple[bytes, os.stat_result]:
+        """Дописывает событие (с ротацией по размеру). Возвращает строку и stat активного файла."""
+        line = json.dumps(event, ensure_ascii=False).encode("utf-8")
+        os.makedirs(os.path.dirname(self._base) or ".", exist_ok=True)
+
+        with self._lock:
+            self._refresh()
+            active = self._segments[-1]
+            max_bytes = settings.deploy_log_segment_max_bytes
+            if max_bytes and active.records and active.end + len(line) + 1 > max_bytes:
+                self._rotate()
+                active = self._segments[-1]
+
+            before = len(active.records)
+            _, st = active.append(line, event)
+            # вместе со своей — записи, дописанные другими после _refresh
+            for recno in range(before, len(active.records)):
+                self._by_id[active.records[recno][0]] = (active, recno)
+            self._active_ino = st.st_ino
+        return line, st
+
+    def get(self, deploy_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            self._refresh()
+            hit = self._by_id.get(_id_key(deploy_id))
+            if hit is None:
+                return None
+            seg, recno = hit
+            return seg.read(seg.records[recno])
+
+    def _iter_newest(self, before: int | None) -> Iterator[tuple[int, _Segment, tuple]]:
+        for seg in reversed(self._segments):
+            if before is not None and seg.first_no >= before:
+                continue
+            for recno in range(len(seg.records) - 1, -1, -1):
+                no = seg.first_no + recno
+                if before is not None and no >= before:
+                    continue
+                yield no, seg, seg.records[recno]
+
+    def query(
+        self,
+        limit: int = 20,
+        before: int | None = None,
+        result: str | None = None,
+        branch: str | None = None,
+        actor: str | None = None,
+    ) -> tuple[List[Dict[str, Any]], int | None]:
+        """
+        Деплои, новые сверху. before — сквозной номер записи (курсор),
+        возвращаем (события, курсор следующей страницы или None).
+        Фильтры сначала проверяются по индексу (код результата, crc32),
+        сегмент читается только для кандидатов.
+        """
+        result_code = _RESULT_CODES.get(result, -1) if result else None
+        branch_crc = _crc(branch) if branch else None
+        actor_crc = _crc(actor) if actor else None
+
+        items: List[Dict[str, Any]] = []
+        next_before = None
+        with self._lock:
+            self._refresh()
+            for no, seg, record in self._iter_newest(before):
+                if result_code is not None and record[2] != result_code:
+                    continue
+                if branch_crc is not None and record[5] != branch_crc:
+                    continue
+                if actor_crc is not None and record[6] != actor_crc:
+                    continue
+
+                event = seg.read(record)
+                git = event.get("git") or {}
+                # crc32 может совпасть случайно — сверяем по самой записи
+                if branch is not None and git.get("branch") != branch:
+                    continue
+                if actor is not None and git.get("actor") != actor:
+                    continue
+
+                if len(items) == limit:
+                    next_before = items[-1]["seq"]
+                    break
+                items.append({"seq": no, **event})
+
+        return items, next_before
+
+
+deploy_history = DeployHistory()
@@ -0,0 +1,160 @@
+# app/services/deploy_output.py
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Callable, Dict
+
+# строки из `set -x` (bash печатает "+ <команда>") -> этап деплоя
+_COMMAND_STAGES = (
+    ("+ git fetch", "git_fetch"),
+    ("+ git reset", "git_reset"),
+    ("+ docker compose down", "compose_down"),
+    ("+ docker system prune", "docker_prune"),
+    ("+ docker compose pull", "compose_pull"),
+    ("+ docker compose build", "compose_build"),
+    ("+ docker compose up", "compose_up"),
+)
+
+# шаги сборки compose: BuildKit ("#7 [app 3/5] RUN ...") и старый builder ("Step 3/5 : RUN ...")
+_BUILDKIT_STEP_RE = re.compile(r"^#(?P<id>\d+) \[(?:(?P<svc>[\w.-]+) )?(?P<n>\d+)/(?P<total>\d+)\] (?P<cmd>.+)$")
+_LEGACY_STEP_RE = re.compile(r"^Step (?P<n>\d+)/(?P<total>\d+) : (?P<cmd>.+)$")
+# попадание шага в кэш: BuildKit "#7 CACHED", старый builder " ---> Using cache"
+_BUILDKIT_CACHED_RE = re.compile(r"^#(?P<id>\d+) CACHED$")
+_LEGACY_CACHED = "---> Using cache"
+
+# в кольцевой буфер кладём не больше стольких символов строки (целиком — в spill-файл)
+_MAX_LINE = 2000
+
+PushStage = Callable[[str, str, str | None], None]
+
+
+class DeployOutput:
+    """
+    Потоковый приёмник вывода SSH-деплоя:
+    - весь вывод пишется в spill-файл на диске;
+    - в памяти — только последние tail_lines строк;
+    - маркеры DEPLOY_START/DEPLOY_END, команды из `set -x` и шаги сборки
+      превращаются в этапы (push_stage) в момент появления строки.
+
+    feed() может звать поток-читатель, а snapshot() — API: всё под локом.
+    """
+
+    def __init__(self, spill_path: str, tail_lines: int, push_stage: PushStage) -> None:
+        self.spill_path = spill_path
+        self._push_stage = push_stage
+        self._lock = threading.Lock()
+        self._tail: deque[str] = deque(maxlen=tail_lines)
+        self._open_stage: str | None = None
+        self._build_steps: set[tuple[str | None, str]] = set()
+        # id вершин BuildKit, которые являются шагами Dockerfile, и какие из них из кэша
+        self._buildkit_ids: set[str] = set()
+        self._cached_ids: set[str] = set()
+        self._legacy_steps = 0
+        self._legacy_cached = 0
+        # этап -> time.monotonic() его первого начала (для замера простоя)
+        self.stage_started: Dict[str, float] = {}
+        self.lines = 0
+        self.bytes = 0
+
+        os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+        self._spill: IO[str] = open(spill_path, "w", encoding="utf-8", errors="replace")
+
+    def _stage(self, name: str, info: str | None = None) -> None:
+        # новый этап закрывает предыдущий
+        if self._open_stage is not None:
+            self._push_stage(self._open_stage, "ok", None)
+        self._open_stage = name
+        self.stage_started.setdefault(name, time.monotonic())
+        self._push_stage(name, "start", info)
+
+    def _parse(self, line: str) -> None:
+        text = line.strip()
+        if text == "DEPLOY_START":
+            self._stage("remote_start")
+            return
+        if text == "DEPLOY_END":
+            if self._open_stage is not None:
+                self._push_stage(self._open_stage, "ok", None)
+                self._open_stage = None
+            self._push_stage("remote_end", "ok", None)
+            return
+
+        for prefix, stage in _COMMAND_STAGES:
+            if text.startswith(prefix):
+                self._stage(stage, text[2:])
+                return
+
+        m = _BUILDKIT_CACHED_RE.match(text)
+        if m:
+            self._cached_ids.add(m.group("id"))
+            return
+        if text == _LEGACY_CACHED:
+            self._legacy_cached += 1
+            return
+
+        m = _BUILDKIT_STEP_RE.match(text) or _LEGACY_STEP_RE.match(text)
+        if m:
+            step_id = m.groupdict().get("id")
+            if step_id is not None:
+                self._buildkit_ids.add(step_id)
+            else:
+                self._legacy_steps += 1
+            svc = m.groupdict().get("svc")
+            key = (svc, m.group("n"))
+            if key in self._build_steps:
+                return
+            self._build_steps.add(key)
+            prefix = f"{svc} " if svc else ""
+            self._stage("build_step", f"{prefix}{m.group('n')}/{m.group('total')} {m.group('cmd')[:200]}")
+
+    def feed(self, line: str) -> None:
+        with self._lock:
+            self._spill.write(line if line.endswith("\n") else line + "\n")
+            self.lines += 1
+            self.bytes += len(line)
+            self._tail.append(line.rstrip("\n")[:_MAX_LINE])
+            self._parse(line)
+
+    def pump(self, pipe: IO[str]) -> None:
+        """Читает pipe построчно до EOF (запускается в отдельном потоке)."""
+        for line in iter(pipe.readline, ""):
+            self.feed(line)
+        pipe.close()
+
+    def finish(self, ok: bool) -> None:
+        with self._lock:
+            if self._open_stage is not None:
+                self._push_stage(self._open_stage, "ok" if ok else "failed", None)
+                self._open_stage = None
+            self._spill.close()
+
+    def build_stats(self) -> Dict[str, Any]:
+        """Сколько шагов сборки было и сколько взято из кэша."""
+        with self._lock:
+            steps = len(self._buildkit_ids) + self._legacy_steps
+            cached = len(self._cached_ids & self._buildkit_ids) + self._legacy_cached
+        return {
+            "steps": steps,
+            "cached": cached,
+            "cache_hit_rate": round(cached / steps, 3) if steps else None,
+        }
+
+    def text(self) -> str:
+        """Хвост вывода (то, что раньше целиком лежало в stdout)."""
+        with self._lock:
+            return "\n".join(self._tail)
+
+    def snapshot(self, last: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            tail = list(self._tail)[-last:]
+            return {
+                "spill_path": self.spill_path,
+                "lines": self.lines,
+                "bytes": self.bytes,
+                "current_stage": self._open_stage,
+                "tail": tail,
+            }
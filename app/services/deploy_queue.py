@@ -0,0 +1,300 @@
+# app/services/deploy_queue.py
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import uuid
+from typing import Any, Dict
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+
+from app.core.config import settings
+from app.services.db.db import get_async_conn
+from app.services.deploy import do_deploy
+from app.services.log_store import log_event
+from app.services.notifier.telegram_notifier import send_deploy_notification
+
+logger = logging.getLogger(__name__)
+
+# advisory lock (ключ из двух int): (пространство, hashtext(цель)) —
+# один деплой на цель во всех uvicorn-воркерах
+_ADVISORY_LOCK_SPACE = 7_211_016
+
+# новый пуш: становится pending; если pending уже есть — заменяет его
+# (деплоим самый свежий коммит), счётчик схлопнутых пушей растёт
+_ENQUEUE_SQL = """
+    INSERT INTO deploy_queue AS q (
+        target, pending_payload, pending_commit, pending_since, pending_pushes, updated_at
+    )
+    VALUES (%(target)s, %(payload)s, %(commit)s, now(), 1, now())
+    ON CONFLICT (target) DO UPDATE SET
+        pending_payload = EXCLUDED.pending_payload,
+        pending_commit  = EXCLUDED.pending_commit,
+        pending_since   = COALESCE(q.pending_since, EXCLUDED.pending_since),
+        pending_pushes  = q.pending_pushes + 1,
+        updated_at      = now()
+    RETURNING pending_pushes, running_deploy_id, running_commit
+    """
+
+# забрать pending в работу (вызывает только держатель advisory lock)
+_CLAIM_SQL = """
+    WITH old AS (
+        SELECT target, pending_payload, pending_pushes
+        FROM deploy_queue
+        WHERE target = %(target)s AND pending_payload IS NOT NULL
+        FOR UPDATE
+    )
+    UPDATE deploy_queue q SET
+        running_deploy_id  = %(deploy_id)s,
+        running_commit     = q.pending_commit,
+        running_started_at = now(),
+        pending_payload    = NULL,
+        pending_commit     = NULL,
+        pending_since      = NULL,
+        pending_pushes     = 0,
+        updated_at         = now()
+    FROM old
+    WHERE q.target = old.target
+    RETURNING old.pending_payload AS payload, old.pending_pushes AS pushes, q.running_commit AS commit
+    """
+
+_FINISH_SQL = """
+    UPDATE deploy_queue SET
+        last_deploy_id     = running_deploy_id,
+        last_commit        = running_commit,
+        last_result        = %(result)s,
+        last_finished_at   = now(),
+        running_deploy_id  = NULL,
+        running_commit     = NULL,
+        running_started_at = NULL,
+        updated_at         = now()
+    WHERE target = %(target)s
+    """
+
+# running_* остался от воркера, который умер посреди деплоя
+# (его lock отпустился вместе с сессией) — закрываем как interrupted
+_RECOVER_SQL = """
+    UPDATE deploy_queue SET
+        last_deploy_id     = running_deploy_id,
+        last_commit        = running_commit,
+        last_result        = 'interrupted',
+        last_finished_at   = now(),
+        running_deploy_id  = NULL,
+        running_commit     = NULL,
+        running_started_at = NULL,
+        updated_at         = now()
+    WHERE target = %(target)s AND running_deploy_id IS NOT NULL
+    """
+
+
+def run_deploy(payload: Dict[str, Any], deploy_id: str) -> Dict[str, Any]:
+    """Сам деплой (блокирующий, до таймаута SSH) + журнал + уведомление."""
+    event = do_deploy(payload, deploy_id=deploy_id)
+    try:
+        log_event(event)
+    except Exception:
+        logger.exception("deploy %s: failed to write deploy log", deploy_id)
+    try:
+        send_deploy_notification(event)
+    except Exception:
+        logger.exception("deploy %s: failed to send notification", deploy_id)
+    return event
+
+
+class DeployQueue:
+    """
+    Очередь деплоев одной цели:
+    - не больше одного деплоя одновременно (advisory lock на сессии,
+      которая живёт весь деплой — держится и между uvicorn-воркерами);
+    - пуши во время деплоя схлопываются в один следующий деплой самого свежего коммита.
+
+    Состояние очереди — в таблице deploy_queue, поэтому пуш, пришедший в любой
+    воркер, подхватит тот, кто держит lock (или первый, кто его возьмёт).
+    """
+
+    def __init__(self, target: str) -> None:
+        self.target = target
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # своё подключение (не из пула) на всё время жизни воркера: на нём
+        # session-level lock цели и опрос очереди, пока деплоит другой воркер
+        self._conn: psycopg.AsyncConnection | None = None
+
+        self.current: Dict[str, Any] | None = None
+        self.deploys = 0
+        self.coalesced = 0
+        self.last_error: str | None = None
+
+    async def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        commit = payload.get("after")
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                _ENQUEUE_SQL,
+                {"target": self.target, "payload": Jsonb(payload), "commit": commit},
+            )
+            row = await cur.fetchone()
+        self._wake.set()
+        return {
+            "target": self.target,
+            "commit": commit,
+            # > 1: пуш склеен с уже ждущими, задеплоится только самый свежий
+            "pending_pushes": row["pending_pushes"],
+            "running_commit": row["running_commit"],
+        }
+
+    async def _lock_key(self, conn: psycopg.AsyncConnection) -> bool:
+        cur = await conn.execute(
+            "SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS locked",
+            (_ADVISORY_LOCK_SPACE, self.target),
+        )
+        return (await cur.fetchone())["locked"]
+
+    async def _connection(self) -> psycopg.AsyncConnection:
+        """Своё подключение воркера: открываем при первом опросе и после обрыва."""
+        if self._conn is None or self._conn.closed:
+            self._conn = await psycopg.AsyncConnection.connect(
+                settings.database_url, autocommit=True, row_factory=dict_row
+            )
+        return self._conn
+
+    async def _close_connection(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _drain(self, conn: psycopg.AsyncConnection) -> None:
+        """Взять lock цели и деплоить, пока в очереди есть pending."""
+        # session-level lock держится весь деплой и отпустится и при падении процесса
+        if not await self._lock_key(conn):
+            return  # деплоит другой воркер — он же заберёт pending
+        try:
+            await conn.execute(_RECOVER_SQL, {"target": self.target})
+            while True:
+                deploy_id = str(uuid.uuid4())
+                cur = await conn.execute(_CLAIM_SQL, {"target": self.target, "deploy_id": deploy_id})
+                job = await cur.fetchone()
+                if job is None:
+                    break
+                await self._deploy(conn, deploy_id, job)
+        finally:
+            await conn.execute(
+                "SELECT pg_advisory_unlock(%s, hashtext(%s))",
+                (_ADVISORY_LOCK_SPACE, self.target),
+            )
+
+    async def _deploy(self, conn: psycopg.AsyncConnection, deploy_id: str, job: Dict[str, Any]) -> None:
+        self.current = {
+            "deploy_id": deploy_id,
+            "commit": job["commit"],
+            "pushes": job["pushes"],
+            "started_at_utc": dt.datetime.now(dt.timezone.utc).isoformat(),
+        }
+        self.coalesced += job["pushes"] - 1
+        logger.info(
+            "deploy %s: %s (%s push(es) coalesced)", deploy_id, job["commit"], job["pushes"]
+        )
+        result = "failed"
+        cancelled = False
+        deploy = asyncio.ensure_future(asyncio.to_thread(run_deploy, job["payload"], deploy_id))
+        try:
+            # поток с docker compose не отменить: при остановке дожидаемся его,
+            # иначе lock отпустится посреди деплоя и другой воркер начнёт свой поверх
+            while True:
+                try:
+                    event = await asyncio.shield(deploy)
+                    break
+                except asyncio.CancelledError:
+                    if deploy.done():
+                        raise
+                    cancelled = True
+                    logger.warning("deploy %s: shutdown requested, waiting for it to finish", deploy_id)
+            result = event["status"]["result"]
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("deploy %s crashed", deploy_id)
+        finally:
+            self.deploys += 1
+            self.current = None
+            await conn.execute(_FINISH_SQL, {"target": self.target, "result": result})
+        if cancelled:
+            raise asyncio.CancelledError
+
+    async def _has_pending(self, conn: psycopg.AsyncConnection) -> bool:
+        cur = await conn.execute(
+            "SELECT 1 FROM deploy_queue WHERE target = %s AND pending_payload IS NOT NULL",
+            (self.target,),
+        )
+        return await cur.fetchone() is not None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.deploy_queue_poll_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                conn = await self._connection()
+                if await self._has_pending(conn):
+                    await self._drain(conn)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("deploy queue %s: worker failed", self.target)
+                # подключение могло оборваться — на следующем круге откроем новое
+                await self._close_connection()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"deploy-queue-{self.target}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._close_connection()
+
+    async def state(self) -> Dict[str, Any]:
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT target, pending_commit, pending_since, pending_pushes,
+                       running_deploy_id, running_commit, running_started_at,
+                       last_deploy_id, last_commit, last_result, last_finished_at,
+                       updated_at
+                FROM deploy_queue
+                WHERE target = %s
+                """,
+                (self.target,),
+            )
+            row = await cur.fetchone()
+        return {
+            "queue": row or {"target": self.target},
+            # что видит именно этот uvicorn-воркер
+            "worker": {
+                "running": self._task is not None,
+                "current": self.current,
+                "deploys": self.deploys,
+                "coalesced_pushes": self.coalesced,
+                "last_error": self.last_error,
+            },
+        }
+
+
+deploy_queue = DeployQueue(settings.deploy_target)
+
+
+async def start_deploy_queue() -> None:
+    await deploy_queue.start()
+
+
+async def stop_deploy_queue() -> None:
+    await deploy_queue.stop()
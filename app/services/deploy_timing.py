@@ -0,0 +1,107 @@
+# app/services/deploy_timing.py
+from __future__ import annotations
+
+import logging
+import statistics
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.services.deploy_history import deploy_history
+
+logger = logging.getLogger(__name__)
+
+# служебное поле этапа: time.monotonic() момента push_stage (в журнал не пишется)
+MONO_KEY = "_mono"
+
+
+def close_stage(stages: list[dict], entry: dict) -> None:
+    """
+    Для ok/failed ищем последний незакрытый start того же этапа
+    и проставляем длительность в закрывающую запись.
+    """
+    name = entry["stage"]
+    for prev in reversed(stages):
+        if prev["stage"] != name:
+            continue
+        if prev["status"] != "start":
+            return  # последний с этим именем уже закрыт — закрывать нечего
+        entry["duration_ms"] = int((entry[MONO_KEY] - prev[MONO_KEY]) * 1000)
+        return
+
+
+def public_stages(stages: list[dict]) -> list[dict]:
+    """
+    Этапы для журнала/API: вместо монотонного времени процесса —
+    t_ms, смещение от начала деплоя (первого этапа).
+    """
+    if not stages:
+        return []
+    base = stages[0].get(MONO_KEY)
+    out = []
+    for entry in stages:
+        item = {k: v for k, v in entry.items() if k != MONO_KEY}
+        if base is not None and MONO_KEY in entry:
+            item["t_ms"] = int((entry[MONO_KEY] - base) * 1000)
+        out.append(item)
+    return out
+
+
+def stage_durations(stages: list[dict]) -> Dict[str, int]:
+    """Суммарная длительность по имени этапа (build_step и т.п. повторяются); total — весь деплой."""
+    durations: Dict[str, int] = {}
+    for entry in stages:
+        if entry.get("duration_ms") is not None:
+            durations[entry["stage"]] = durations.get(entry["stage"], 0) + entry["duration_ms"]
+    return durations
+
+
+def _baseline(window: int) -> tuple[Dict[str, int], int]:
+    """Медиана длительностей по этапам за последние window успешных деплоев."""
+    events, _ = deploy_history.query(limit=window, result="success")
+    samples: Dict[str, List[int]] = {}
+    for event in events:
+        for name, ms in ((event.get("timings") or {}).get("stages") or {}).items():
+            samples.setdefault(name, []).append(ms)
+    baseline = {
+        name: int(statistics.median(values))
+        for name, values in samples.items()
+        if len(values) >= settings.deploy_baseline_min_samples
+    }
+    return baseline, len(events)
+
+
+def build_timings(stages: list[dict]) -> Dict[str, Any]:
+    """
+    Раздел timings события деплоя: длительности этапов, базовая линия
+    (медиана прошлых успешных) и этапы, ставшие заметно медленнее неё.
+    Регрессия = дольше медианы в deploy_regression_ratio раз
+    и при этом больше чем на deploy_regression_min_delta_ms.
+    """
+    durations = stage_durations(stages)
+    if stages and MONO_KEY in stages[0]:
+        durations["total"] = int((stages[-1][MONO_KEY] - stages[0][MONO_KEY]) * 1000)
+    try:
+        baseline, samples = _baseline(settings.deploy_baseline_window)
+    except Exception:
+        logger.exception("deploy timings: failed to read baseline")
+        baseline, samples = {}, 0
+
+    regressions = []
+    for name, ms in durations.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if ms >= base * settings.deploy_regression_ratio and ms - base >= settings.deploy_regression_min_delta_ms:
+            regressions.append({
+                "stage": name,
+                "duration_ms": ms,
+                "baseline_ms": base,
+                "ratio": round(ms / base, 2),
+            })
+    regressions.sort(key=lambda r: r["duration_ms"] - r["baseline_ms"], reverse=True)
+
+    return {
+        "stages": durations,
+        "baseline": {"window": samples, "median_ms": baseline},
+        "regressions": regressions,
+    }
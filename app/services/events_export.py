@@ -0,0 +1,184 @@
+# app/services/events_export.py
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import io
+import json
+import zlib
+from typing import Any, Dict, Iterator
+from uuid import UUID
+
+from psycopg import sql
+from psycopg.rows import tuple_row
+
+from app.core.config import settings
+from app.services.db.db import get_conn
+
+# что можно выгружать: таблица -> колонки (порядок = порядок в CSV)
+EXPORT_TABLES: Dict[str, tuple[str, ...]] = {
+    "transcribe_events": (
+        "id",
+        "created_at_utc",
+        "env",
+        "client",
+        "client_ip",
+        "request_id",
+        "video_id",
+        "filename",
+        "filesize_bytes",
+        "duration_sec",
+        "content_type",
+        "model_name",
+        "model_device",
+        "language_detected",
+        "latency_ms",
+        "transcribe_ms",
+        "ffmpeg_ms",
+        "success",
+        "error_code",
+        "error_message",
+    ),
+    "video_job_events": (
+        "id",
+        "job_id",
+        "created_at_utc",
+        "env",
+        "origin",
+        "step_code",
+        "status",
+        "step_started_at_utc",
+        "step_finished_at_utc",
+        "step_duration_ms",
+        "message",
+        "data",
+    ),
+}
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (dt.datetime, dt.date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, dt.datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def iter_event_rows(
+    table: str,
+    start: dt.datetime,
+    end: dt.datetime,
+    env: str | None = None,
+    chunk_size: int | None = None,
+) -> Iterator[list[tuple]]:
+    """
+    Строки таблицы за [start, end) порциями по chunk_size.
+    Читаем именованным (серверным) курсором: в памяти только одна порция,
+    сколько бы строк ни было в диапазоне.
+    """
+    columns = EXPORT_TABLES[table]
+    chunk_size = chunk_size or settings.export_chunk_rows
+
+    where = [sql.SQL("created_at_utc >= %(start)s"), sql.SQL("created_at_utc < %(end)s")]
+    params: Dict[str, Any] = {"start": start, "end": end}
+    if env is not None:
+        where.append(sql.SQL("env = %(env)s"))
+        params["env"] = env
+
+    query = sql.SQL("SELECT {cols} FROM {table} WHERE {where} ORDER BY created_at_utc").format(
+        cols=sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+        table=sql.Identifier(table),
+        where=sql.SQL(" AND ").join(where),
+    )
+
+    with get_conn() as conn:
+        # DECLARE CURSOR живёт только внутри транзакции
+        with conn.transaction():
+            # tuple-строки вместо dict_row: меньше аллокаций на строку
+            with conn.cursor(name=f"export_{table}", row_factory=tuple_row) as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+
+def _encode_ndjson(columns: tuple[str, ...], chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        lines = [
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _encode_csv(columns: tuple[str, ...], chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    # пустой диапазон — хотя бы заголовок
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _gzip(parts: Iterator[bytes]) -> Iterator[bytes]:
+    # wbits=31 — формат gzip (заголовок + crc), сжимаем потоком
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_events(
+    table: str,
+    start: dt.datetime,
+    end: dt.datetime,
+    fmt: str = "ndjson",
+    gzip: bool = False,
+    env: str | None = None,
+    chunk_size: int | None = None,
+) -> Iterator[bytes]:
+    """
+    Генератор байтов выгрузки (NDJSON или CSV, опционально gzip).
+    Подключение к БД держится, пока генератор не исчерпан или не закрыт.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"unknown table: {table}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+
+    chunks = iter_event_rows(table, start, end, env=env, chunk_size=chunk_size)
+    encoder = _encode_csv if fmt == "csv" else _encode_ndjson
+    parts = encoder(EXPORT_TABLES[table], chunks)
+    return _closing(_gzip(parts) if gzip else parts, chunks)
+
+
+def _closing(parts: Iterator[bytes], chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    try:
+        yield from parts
+    finally:
+        # закрыли выгрузку (в т.ч. на полпути) — сразу закрываем серверный курсор
+        # и транзакцию, соединение возвращается в пул, не дожидаясь сборщика мусора
+        parts.close()
+        chunks.close()
@@ -1,31 +1,98 @@
 # app/services/log_store.py
 from __future__ import annotations
+import hashlib
 import json
 import os
+import threading
 from typing import Any, Dict
 
 from app.core.config import settings
+from app.services.deploy_history import deploy_history
+
+# блок обратного чтения: последняя строка события почти всегда влезает в один
+_TAIL_BLOCK = 8192
+
+# последнее событие журнала; ключ — (inode, size, mtime) файла:
+# пока файл не менялся, /status/latest не читает его вовсе
+_latest_lock = threading.Lock()
+_latest: Dict[str, Any] = {"key": None, "event": None, "etag": None}
+
+
+def _file_key(st: os.stat_result) -> tuple:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _etag(line: bytes) -> str:
+    return '"' + hashlib.sha1(line).hexdigest()[:16] + '"'
+
+
+def _read_last_line(path: str) -> bytes:
+    """
+    Последняя непустая строка файла: читаем блоками с конца,
+    пока не встретим перевод строки перед ней. O(длина строки), а не O(файла).
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            stripped = tail.rstrip()
+            if not stripped:
+                continue
+            nl = stripped.rfind(b"\n")
+            if nl != -1:
+                return stripped[nl + 1:]
+        return tail.strip()
 
 
 def log_event(event: Dict[str, Any]) -> None:
+    # запись в активный сегмент + индекс (см. deploy_history.py)
+    line, st = deploy_history.append(event)
+
+    # сразу кладём в кэш — следующий /status/latest даже не откроет файл
+    with _latest_lock:
+        _latest.update(key=_file_key(st), event=event, etag=_etag(line))
+
+
+def get_latest_event_with_etag() -> tuple[Dict[str, Any] | None, str | None]:
+    """Последнее событие и его ETag (None, None — журнала ещё нет)."""
     log_path = settings.deploy_log_path
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    try:
+        st = os.stat(log_path)
+    except FileNotFoundError:
+        return None, None
+
+    key = _file_key(st)
+    with _latest_lock:
+        if _latest["key"] == key:
+            return _latest["event"], _latest["etag"]
+
+    line = _read_last_line(log_path)
+    event = json.loads(line) if line else None
+    etag = _etag(line) if line else None
+
+    with _latest_lock:
+        _latest.update(key=key, event=event, etag=etag)
+    return event, etag
 
 
 def get_latest_event() -> Dict[str, Any] | None:
-    log_path = settings.deploy_log_path
-    if not os.path.exists(log_path):
-        return None
+    return get_latest_event_with_etag()[0]
+
 
-    last_line = ""
-    with open(log_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                last_line = line
+def get_deploy_history(
+    limit: int = 20,
+    before: int | None = None,
+    result: str | None = None,
+    branch: str | None = None,
+    actor: str | None = None,
+) -> tuple[list[Dict[str, Any]], int | None]:
+    return deploy_history.query(limit=limit, before=before, result=result, branch=branch, actor=actor)
 
-    if not last_line:
-        return None
 
-    return json.loads(last_line)
+def get_deploy_event(deploy_id: str) -> Dict[str, Any] | None:
+    return deploy_history.get(deploy_id)
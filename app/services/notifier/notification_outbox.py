@@ -0,0 +1,466 @@
+# app/services/notifier/notification_outbox.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.schemas.transcribe import TranscribeDigest, TranscribeErrorRepeats, TranscribeEventIn
+from app.schemas.video_jobs import VideoJobEventIn, VideoJobStatus
+from app.services.db.db import get_async_conn
+from app.services.db.listener import pg_listener
+from app.services.notifier.transcribe_notifier import (
+    format_transcribe_digest,
+    format_transcribe_error_repeats,
+    format_transcribe_message,
+)
+from app.services.telegram.client import bot_enabled
+from app.services.telegram.outbox import telegram_outbox
+from app.services.video_job.video_job_notifier import format_video_job_message
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY при вставке в outbox — диспетчер просыпается сразу, а не по опросу
+NOTIFICATION_OUTBOX_CHANNEL = "notification_outbox"
+
+
+class _Kind:
+    __slots__ = ("bot", "model", "render", "critical", "wanted")
+
+    def __init__(
+        self,
+        bot: str,
+        model: type[BaseModel],
+        render: Callable[[Any], str],
+        critical: Callable[[Any], bool],
+        wanted: Callable[[Any], bool] = lambda ev: True,
+    ) -> None:
+        self.bot = bot
+        self.model = model
+        self.render = render
+        self.critical = critical
+        self.wanted = wanted
+
+
+def _digest_mode() -> bool:
+    return settings.transcribe_notify_mode == "digest"
+
+
+# вид уведомления -> бот, схема события (payload), как рендерить, что критично,
+# нужно ли уведомление вообще (успешные транскрибации в режиме digest — только сводкой)
+KINDS: Dict[str, _Kind] = {
+    "transcribe": _Kind(
+        "transcribe",
+        TranscribeEventIn,
+        format_transcribe_message,
+        lambda ev: not ev.success,
+        lambda ev: not (ev.success and _digest_mode()),
+    ),
+    "transcribe_digest": _Kind(
+        "transcribe",
+        TranscribeDigest,
+        format_transcribe_digest,
+        lambda digest: False,
+    ),
+    "transcribe_errors": _Kind(
+        "transcribe",
+        TranscribeErrorRepeats,
+        format_transcribe_error_repeats,
+        lambda repeats: True,
+    ),
+    "video_job": _Kind(
+        "transcribe",
+        VideoJobEventIn,
+        format_video_job_message,
+        lambda ev: ev.status in (VideoJobStatus.FAIL, VideoJobStatus.TIMEOUT),
+    ),
+}
+
+
+def outbox_enabled() -> bool:
+    return settings.notification_delivery == "outbox"
+
+
+def outbox_params(kind: str, ev: BaseModel) -> Dict[str, Any]:
+    """
+    Поля outbox для build_params стора: outbox (payload json или None —
+    уведомление не нужно), outbox_critical, outbox_kind, outbox_bot.
+    """
+    spec = KINDS[kind]
+    enabled = outbox_enabled() and bot_enabled(spec.bot) and spec.wanted(ev)
+    return {
+        "outbox_kind": kind,
+        "outbox_bot": spec.bot,
+        "outbox": ev.model_dump_json() if enabled else None,
+        "outbox_critical": spec.critical(ev) if enabled else False,
+    }
+
+
+# вставка пачки строк outbox (внутри транзакции сохранения событий)
+_INSERT_SQL = f"""
+    INSERT INTO notification_outbox (kind, bot, payload, critical)
+    SELECT %(kind)s, %(bot)s, t.payload::jsonb, t.critical
+    FROM unnest(%(payloads)s::text[], %(criticals)s::bool[]) WITH ORDINALITY AS t(payload, critical, n)
+    ORDER BY t.n
+    RETURNING pg_notify('{NOTIFICATION_OUTBOX_CHANNEL}', '')
+    """
+
+# то же для одного события — как CTE внутри одного запроса сохранения
+# (см. video_jobs_store._SAVE_EVENT_SQL); без payload ничего не вставляет
+OUTBOX_CTE_SQL = f"""
+    INSERT INTO notification_outbox (kind, bot, payload, critical)
+    SELECT %(outbox_kind)s, %(outbox_bot)s, %(outbox)s::jsonb, %(outbox_critical)s
+    WHERE %(outbox)s::jsonb IS NOT NULL
+    RETURNING pg_notify('{NOTIFICATION_OUTBOX_CHANNEL}', '')
+    """
+
+
+def _insert_params(kind: str, rows: List[dict]) -> Dict[str, Any] | None:
+    rows = [r for r in rows if r.get("outbox") is not None]
+    if not rows:
+        return None
+    return {
+        "kind": kind,
+        "bot": KINDS[kind].bot,
+        "payloads": [r["outbox"] for r in rows],
+        "criticals": [r["outbox_critical"] for r in rows],
+    }
+
+
+def add_to_outbox(cur: Any, kind: str, rows: List[dict]) -> None:
+    """Пишет уведомления по строкам стора (build_params) через переданный курсор — в его транзакции."""
+    params = _insert_params(kind, rows)
+    if params is not None:
+        cur.execute(_INSERT_SQL, params)
+
+
+async def add_to_outbox_async(cur: Any, kind: str, rows: List[dict]) -> None:
+    params = _insert_params(kind, rows)
+    if params is not None:
+        await cur.execute(_INSERT_SQL, params)
+
+
+# --- диспетчер ---
+
+# забираем пачку свободных строк: SKIP LOCKED — параллельные воркеры
+# берут разные строки; locked_until — аренда (умер воркер — строки вернутся)
+_CLAIM_SQL = """
+    WITH claimed AS (
+    UPDATE notification_outbox o
+    SET locked_until = now() + make_interval(secs => %(lease_sec)s),
+        locked_by = %(worker)s,
+        attempts = o.attempts + 1
+    WHERE o.id IN (
+        SELECT id
+        FROM notification_outbox
+        WHERE state = 'pending'
+          AND available_at <= now()
+          AND (locked_until IS NULL OR locked_until < now())
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING o.id, o.kind, o.bot, o.payload, o.critical, o.attempts, o.created_at
+    )
+    -- RETURNING порядок не гарантирует, а в чат шлём в порядке событий
+    SELECT * FROM claimed ORDER BY id
+    """
+
+_MARK_SENT_SQL = """
+    UPDATE notification_outbox
+    SET state = 'sent', finished_at = now(), message_id = %(message_id)s,
+        locked_until = NULL, last_error = NULL
+    WHERE id = %(id)s AND locked_by = %(worker)s
+    """
+
+_MARK_FAILED_SQL = """
+    UPDATE notification_outbox
+    SET state = CASE WHEN %(final)s THEN 'failed' ELSE 'pending' END,
+        finished_at = CASE WHEN %(final)s THEN now() END,
+        available_at = now() + make_interval(secs => %(retry_sec)s),
+        locked_until = NULL,
+        last_error = %(error)s
+    WHERE id = %(id)s AND locked_by = %(worker)s
+    """
+
+_MARK_DEFERRED_SQL = """
+    UPDATE notification_outbox
+    SET attempts = attempts - 1,
+        available_at = now() + make_interval(secs => %(defer_sec)s),
+        locked_until = NULL
+    WHERE id = %(id)s AND locked_by = %(worker)s
+    """
+
+# компакция: порциями, чтобы не держать долгую транзакцию
+_COMPACT_SQL = """
+    DELETE FROM notification_outbox
+    WHERE id IN (
+        SELECT id
+        FROM notification_outbox
+        WHERE state = %(state)s
+          AND finished_at < now() - make_interval(secs => %(older_than_sec)s)
+        LIMIT %(limit)s
+    )
+    """
+
+_COMPACT_CHUNK = 5000
+
+_COUNTS_SQL = """
+    SELECT
+        count(*) FILTER (WHERE state = 'pending') AS pending,
+        count(*) FILTER (WHERE state = 'failed') AS failed,
+        min(created_at) FILTER (WHERE state = 'pending') AS oldest_pending
+    FROM notification_outbox
+    """
+
+
+class NotificationDispatcher:
+    """
+    Доставка из notification_outbox: забирает пачку строк (SKIP LOCKED + аренда),
+    рендерит текст, отдаёт в telegram_outbox (лимиты/429 — там) и отмечает итог.
+    Неудача — строка снова pending через backoff, после max_attempts — failed.
+    Будится NOTIFY из вставки; раз в poll_sec проверяет и сам (повторы, чужие аренды).
+    """
+
+    def __init__(self) -> None:
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._last_compact = 0.0
+
+        self.claimed = 0
+        self.sent = 0
+        self.retried = 0
+        self.deferred = 0
+        self.failed = 0
+        self.compacted = 0
+        self.lag_ms_max = 0
+        self.last_error: str | None = None
+
+    def wakeup(self, _payload: str = "") -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self) -> List[dict]:
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(_CLAIM_SQL, {
+                "lease_sec": settings.notification_outbox_lease_sec,
+                "worker": self.worker,
+                "limit": settings.notification_outbox_batch_size,
+            })
+            return await cur.fetchall()
+
+    async def _deliver(self, row: dict) -> Dict[str, Any]:
+        spec = KINDS.get(row["kind"])
+        if spec is None:
+            return {"ok": False, "error": f"unknown kind: {row['kind']}", "final": True}
+        try:
+            text = spec.render(spec.model.model_validate(row["payload"]))
+        except Exception as e:
+            return {"ok": False, "error": f"render failed: {e}", "final": True}
+
+        future = telegram_outbox.submit(row["bot"], text, critical=row["critical"])
+        if future is None:
+            return {"ok": False, "error": f"bot {row['bot']} is not configured", "final": False}
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _batch_handler(row: dict) -> Callable[[List[dict]], Awaitable[Dict[int, Dict[str, Any]]]] | None:
+        """Особая доставка: «живое» сообщение видео-джобы, схлопывание повторов ошибок транскрибации."""
+        # импорты здесь: эти модули сами зависят от этого (через сторы)
+        if row["kind"] == "video_job" and settings.video_job_notify_mode == "live":
+            from app.services.video_job.live_message import live_messages
+
+            return live_messages.deliver
+        if row["kind"] == "transcribe" and _digest_mode() and not row["payload"].get("success"):
+            from app.services.notifier.transcribe_digest import error_bursts
+
+            return error_bursts.deliver
+        return None
+
+    async def _deliver_all(self, rows: List[dict]) -> List[Dict[str, Any]]:
+        groups: Dict[Callable, List[dict]] = {}
+        rest: List[dict] = []
+        for row in rows:
+            handler = self._batch_handler(row)
+            if handler is None:
+                rest.append(row)
+            else:
+                groups.setdefault(handler, []).append(row)
+
+        handled, plain = await asyncio.gather(
+            asyncio.gather(*(handler(group) for handler, group in groups.items())),
+            asyncio.gather(*(self._deliver(row) for row in rest)),
+        )
+        results: Dict[int, Dict[str, Any]] = {row["id"]: res for row, res in zip(rest, plain)}
+        for part in handled:
+            results.update(part)
+        return [results[row["id"]] for row in rows]
+
+    async def _process(self, rows: List[dict]) -> None:
+        results = await self._deliver_all(rows)
+        now = time.time()
+
+        sent, failed, deferred = [], [], []
+        for row, res in zip(rows, results):
+            if res.get("defer_sec") is not None:
+                # не ошибка, а «рано» (debounce правок) — попытку не считаем
+                self.deferred += 1
+                deferred.append({"id": row["id"], "defer_sec": res["defer_sec"], "worker": self.worker})
+                continue
+            if res["ok"]:
+                self.sent += 1
+                lag_ms = int((now - row["created_at"].timestamp()) * 1000)
+                self.lag_ms_max = max(self.lag_ms_max, lag_ms)
+                message_id = (res.get("result") or {}).get("message_id")
+                sent.append({"id": row["id"], "message_id": message_id, "worker": self.worker})
+                continue
+
+            final = res.get("final") or row["attempts"] >= settings.notification_outbox_max_attempts
+            retry_sec = min(
+                settings.notification_outbox_retry_base_sec * 2 ** (row["attempts"] - 1),
+                settings.notification_outbox_retry_max_sec,
+            )
+            if final:
+                self.failed += 1
+                logger.error("notification outbox: #%s failed for good: %s", row["id"], res.get("error"))
+            else:
+                self.retried += 1
+            self.last_error = res.get("error")
+            failed.append({
+                "id": row["id"],
+                "final": final,
+                "retry_sec": retry_sec,
+                "error": (res.get("error") or "")[:1000],
+                "worker": self.worker,
+            })
+
+        async with get_async_conn() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    if sent:
+                        await cur.executemany(_MARK_SENT_SQL, sent)
+                    if failed:
+                        await cur.executemany(_MARK_FAILED_SQL, failed)
+                    if deferred:
+                        await cur.executemany(_MARK_DEFERRED_SQL, deferred)
+
+    async def compact(self) -> int:
+        """Удаляет доставленные (и давно упавшие) строки; возвращает, сколько удалено."""
+        deleted = 0
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            for state, older_than in (
+                ("sent", settings.notification_outbox_sent_retention_sec),
+                ("failed", settings.notification_outbox_failed_retention_sec),
+            ):
+                while True:
+                    await cur.execute(_COMPACT_SQL, {
+                        "state": state,
+                        "older_than_sec": older_than,
+                        "limit": _COMPACT_CHUNK,
+                    })
+                    deleted += cur.rowcount
+                    if cur.rowcount < _COMPACT_CHUNK:
+                        break
+        self.compacted += deleted
+        return deleted
+
+    async def run_once(self) -> int:
+        """Одна пачка: забрать, доставить, отметить. Возвращает размер пачки."""
+        rows = await self._claim()
+        if rows:
+            self.claimed += len(rows)
+            await self._process(rows)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                # полная пачка — сразу за следующей, иначе ждём NOTIFY/опроса
+                if await self.run_once() == settings.notification_outbox_batch_size:
+                    continue
+                if time.monotonic() - self._last_compact >= settings.notification_outbox_compact_interval_sec:
+                    self._last_compact = time.monotonic()
+                    await self.compact()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("notification outbox: dispatch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.notification_outbox_poll_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self._task is not None or not outbox_enabled():
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="notification-outbox")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        # пачка может ждать лимитов Telegram; не дождались — строки
+        # вернутся в очередь по истечении аренды, ничего не теряется
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.telegram_outbox_drain_sec)
+        except asyncio.TimeoutError:
+            logger.warning("notification outbox: batch still in flight on stop, left to lease expiry")
+        self._task = None
+
+    async def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, Any] = {}
+        try:
+            async with get_async_conn() as conn, conn.cursor() as cur:
+                await cur.execute(_COUNTS_SQL)
+                row = await cur.fetchone()
+            oldest = row["oldest_pending"]
+            counts = {
+                "pending": row["pending"],
+                "failed_total": row["failed"],
+                "oldest_pending_ms": int((time.time() - oldest.timestamp()) * 1000) if oldest else 0,
+            }
+        except Exception as e:
+            counts = {"error": str(e)}
+        return {
+            "mode": settings.notification_delivery,
+            "running": self._task is not None,
+            "worker": self.worker,
+            **counts,
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "compacted": self.compacted,
+            # lag — от записи в outbox до доставки
+            "lag_ms_max": self.lag_ms_max,
+            "last_error": self.last_error,
+        }
+
+
+notification_dispatcher = NotificationDispatcher()
+
+pg_listener.subscribe(NOTIFICATION_OUTBOX_CHANNEL, notification_dispatcher.wakeup)
+
+
+async def start_notification_dispatcher() -> None:
+    await notification_dispatcher.start()
+
+
+async def stop_notification_dispatcher() -> None:
+    await notification_dispatcher.stop()
+
+
+async def get_notification_outbox_stats() -> Dict[str, Any]:
+    return await notification_dispatcher.stats()
@@ -1,11 +1,12 @@
 # app/services/telegram_notifier.py
 from __future__ import annotations
 
-from typing import Any, Dict
-import requests
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
 import textwrap
 
 from app.core.config import settings
+from app.services.telegram.outbox import queue_message
 from datetime import datetime, timezone, timedelta
 
 
@@ -30,10 +31,25 @@ def _format_deploy_message(event: Dict[str, Any]) -> str:
     hc_url = hc.get("url") or "-"
     hc_code = hc.get("status_code")
     hc_ms = hc.get("duration_ms")
+    hc_ready_ms = hc.get("time_to_ready_ms")
+    hc_ready = f"~{hc_ready_ms} ms" if hc_ready_ms is not None else "-"
+    hc_attempts = sum(p.get("attempts_total", 0) for p in hc.get("probes") or [])
 
     deploy = event.get("deploy", {}) or {}
     ssh_rc = deploy.get("ssh_returncode")
     ssh_ms = deploy.get("ssh_duration_ms")
+    mode = deploy.get("mode") or "-"
+    downtime_ms = deploy.get("downtime_ms")
+    downtime = f"~{downtime_ms} ms" if downtime_ms is not None else "-"
+    build = deploy.get("build") or {}
+    hit_rate = build.get("cache_hit_rate")
+    cache = f"{build.get('cached')}/{build.get('steps')} ({hit_rate:.0%})" if hit_rate is not None else "-"
+
+    regressions = (event.get("timings") or {}).get("regressions") or []
+    slow = ", ".join(
+        f"{r['stage']} {r['duration_ms'] / 1000:.1f}s vs ~{r['baseline_ms'] / 1000:.1f}s (x{r['ratio']})"
+        for r in regressions
+    ) or "-"
 
     failed_stage = status.get("failed_stage") or "-"
     err = status.get("error_message") or "-"
@@ -54,8 +70,12 @@ def _format_deploy_message(event: Dict[str, Any]) -> str:
                   (user: {event.get("targets", {}).get("home_pc", {}).get("ssh_user", "-")})
 
     🔌 SSH: rc={ssh_rc}, ~{ssh_ms} ms
+    🔁 Mode: {mode}, downtime: {downtime}
+    🧱 Build cache: {cache}
     ❤️ Healthcheck: {hc_url}
-       code={hc_code}, ~{hc_ms} ms
+       code={hc_code}, ~{hc_ms} ms, ready in {hc_ready}, attempts={hc_attempts}
+
+    🐢 Slower than usual: {slow}
 
     🧩 Failed stage: {failed_stage}
     🐞 Error: {err}
@@ -71,32 +91,15 @@ def send_deploy_notification(event: Dict[str, Any]) -> None:
     if not settings.telegram_enabled:
         return
 
-    token = settings.telegram_bot_token
-    chat_id = settings.telegram_chat_id
-
     text = _format_deploy_message(event)
+    # БЕЗ parse_mode, чистый текст
+    queue_message("deploy", text, critical=True)
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": text,        # 👈 БЕЗ parse_mode, чистый текст
-        # "parse_mode": "MarkdownV2",  # если захочешь позже — включим с экранированием
-    }
-    print(f"[telegram payload] send : {payload}")
-
-    try:
-        resp = requests.post(url, json=payload, timeout=5)
-        if resp.status_code != 200:
-            print(f"[telegram main] send failed: {resp.status_code} {resp.text}")
-    except Exception as e:
-        print(f"[telegram main] exception while sending: {e}")
-
-def send_deploy_start_notification(payload: Dict[str, Any]) -> None:
-    if not settings.telegram_enabled:
-        return
 
-    token = settings.telegram_bot_token
-    chat_id = settings.telegram_chat_id
+def send_deploy_start_notification(payload: Dict[str, Any]) -> Optional[Future]:
+    """Ставит сообщение в очередь; future — результат отправки, None — Telegram выключен."""
+    if not settings.telegram_enabled:
+        return None
 
     repo = payload.get("repository", {}).get("full_name", "manual")
     branch = payload.get("ref", "-")
@@ -116,14 +119,4 @@ def send_deploy_start_notification(payload: Dict[str, Any]) -> None:
         "⏳ Ждём результат..."
     )
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "Markdown"
-    }
-
-    try:
-        requests.post(url, json=payload, timeout=5)
-    except Exception as e:
-        print(f"[telegram start] exception: {e}")
\ No newline at end of file
+    return queue_message("deploy", text, parse_mode="Markdown", critical=True)
@@ -0,0 +1,337 @@
+# app/services/notifier/transcribe_digest.py
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.schemas.transcribe import TranscribeDigest, TranscribeErrorRepeats, TranscribeEventIn
+from app.services.db.db import get_async_conn, get_conn
+from app.services.notifier.notification_outbox import add_to_outbox, outbox_enabled, outbox_params
+from app.services.notifier.transcribe_notifier import (
+    format_transcribe_digest,
+    format_transcribe_error_repeats,
+    format_transcribe_message,
+)
+from app.services.stats.transcribe_stats import get_transcribe_stats
+from app.services.telegram.outbox import queue_message, telegram_outbox
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_NAME = "transcribe"
+
+# минутный бакет текущей минуты ещё дописывается (буфер приёма) — берём только закрытые
+_GRACE_SEC = 60
+# после долгого простоя не сводим сутки в одно сообщение — только последние
+_MAX_PERIOD = dt.timedelta(days=1)
+
+_INIT_SQL = """
+    INSERT INTO notification_digests (name, period_end)
+    VALUES (%(name)s, %(period_end)s)
+    ON CONFLICT (name) DO NOTHING
+    """
+
+_GET_SQL = "SELECT period_end FROM notification_digests WHERE name = %(name)s"
+
+# продвигаем окно, только если его не продвинул другой воркер
+_ADVANCE_SQL = """
+    UPDATE notification_digests
+    SET period_end = %(period_end)s, updated_at = now()
+    WHERE name = %(name)s AND period_end = %(period_start)s
+    """
+
+_ENSURE_BURST_SQL = """
+    INSERT INTO transcribe_error_bursts (error_code) VALUES (%(code)s)
+    ON CONFLICT (error_code) DO NOTHING
+    """
+
+# ошибка с этим кодом: окно открыто — только +1 к счётчику (suppressed);
+# закрыто — открываем новое, а несообщённые повторы старого отдаём в prev_repeats
+_ADMIT_SQL = """
+    UPDATE transcribe_error_bursts b
+    SET repeats = CASE WHEN old.window_until > now() THEN old.repeats + 1 ELSE 0 END,
+        window_until = CASE
+            WHEN old.window_until > now() THEN old.window_until
+            ELSE now() + make_interval(secs => %(window_sec)s)
+        END,
+        last_at = now(),
+        last_message = %(message)s
+    FROM (
+        SELECT error_code, repeats, window_until
+        FROM transcribe_error_bursts
+        WHERE error_code = %(code)s
+        FOR UPDATE
+    ) old
+    WHERE b.error_code = old.error_code
+    RETURNING old.window_until > now() AS suppressed, old.repeats AS prev_repeats
+    """
+
+# отправка первой ошибки не удалась — окно не открываем, счётчик возвращаем
+_RELEASE_SQL = """
+    UPDATE transcribe_error_bursts
+    SET window_until = '-infinity', repeats = repeats + %(repeats)s
+    WHERE error_code = %(code)s
+    """
+
+# закрывшиеся окна с повторами — в сообщение со счётчиком
+_FLUSH_SQL = """
+    UPDATE transcribe_error_bursts b
+    SET repeats = 0
+    FROM (
+        SELECT error_code, repeats
+        FROM transcribe_error_bursts
+        WHERE window_until <= now() AND repeats > 0
+        FOR UPDATE SKIP LOCKED
+    ) old
+    WHERE b.error_code = old.error_code
+    RETURNING b.error_code, old.repeats, b.last_at, b.last_message
+    """
+
+_LATENCY_KEYS = ("count", "avg", "p50", "p95", "max")
+
+
+def digest_enabled() -> bool:
+    return settings.transcribe_notify_mode == "digest"
+
+
+def _interval() -> dt.timedelta:
+    # окна ровно по минутным бакетам
+    return dt.timedelta(seconds=max(60, settings.transcribe_digest_interval_sec // 60 * 60))
+
+
+def _period_end(now: dt.datetime) -> dt.datetime:
+    """Конец последнего закрытого окна: окна выровнены по interval от начала эпохи."""
+    step = int(_interval().total_seconds())
+    ts = int((now - dt.timedelta(seconds=_GRACE_SEC)).timestamp()) // step * step
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc)
+
+
+def _top(rows: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+    rows = sorted(rows, key=lambda r: r["events"], reverse=True)[: settings.transcribe_digest_top_n]
+    return [{"name": r[field], "events": r["events"]} for r in rows]
+
+
+def build_digest(start: dt.datetime, end: dt.datetime) -> TranscribeDigest | None:
+    """Сводка успешных транскрибаций за [start, end) по минутным агрегатам; None — успешных не было."""
+    by_success = get_transcribe_stats(start, end, group_by=["success"])
+    ok = next((r for r in by_success if r["success"]), None)
+    if ok is None or not ok["events"]:
+        return None
+    return TranscribeDigest(
+        period_start=start,
+        period_end=end,
+        events=ok["events"],
+        failed_events=sum(r["events"] for r in by_success if not r["success"]),
+        audio_sec=ok["audio_sec"],
+        latency_ms={k: ok["latency_ms"].get(k) for k in _LATENCY_KEYS},
+        rtf={k: ok["rtf"].get(k) for k in _LATENCY_KEYS},
+        top_models=_top(get_transcribe_stats(start, end, group_by=["model_name"], success=True), "model_name"),
+        top_devices=_top(get_transcribe_stats(start, end, group_by=["model_device"], success=True), "model_device"),
+    )
+
+
+def run_digest(now: dt.datetime | None = None) -> TranscribeDigest | None:
+    """
+    Строит сводку за окна, закрывшиеся с прошлого раза, и пишет её в outbox
+    в одной транзакции со сдвигом period_end: ни потери, ни дубля при нескольких воркерах.
+    """
+    end = _period_end(now or dt.datetime.now(dt.timezone.utc))
+    params = {"name": _DIGEST_NAME}
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(_INIT_SQL, {**params, "period_end": end - _interval()})
+        cur.execute(_GET_SQL, params)
+        period_start = cur.fetchone()["period_end"]
+    if period_start >= end:
+        return None
+
+    digest = build_digest(max(period_start, end - _MAX_PERIOD), end)
+
+    with get_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(_ADVANCE_SQL, {**params, "period_start": period_start, "period_end": end})
+                if cur.rowcount == 0:
+                    return None  # окно уже забрал другой воркер
+                if digest is not None and outbox_enabled():
+                    add_to_outbox(cur, "transcribe_digest", [outbox_params("transcribe_digest", digest)])
+
+    if digest is not None and not outbox_enabled():
+        queue_message("transcribe", format_transcribe_digest(digest))
+    return digest
+
+
+def flush_error_repeats() -> List[TranscribeErrorRepeats]:
+    """Закрывшиеся окна ошибок с повторами -> по сообщению со счётчиком на error_code."""
+    with get_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(_FLUSH_SQL)
+                items = [
+                    TranscribeErrorRepeats(
+                        error_code=row["error_code"],
+                        repeats=row["repeats"],
+                        window_sec=settings.transcribe_error_window_sec,
+                        last_at=row["last_at"],
+                        last_message=row["last_message"],
+                    )
+                    for row in cur.fetchall()
+                ]
+                if items and outbox_enabled():
+                    add_to_outbox(cur, "transcribe_errors", [outbox_params("transcribe_errors", it) for it in items])
+
+    if not outbox_enabled():
+        for it in items:
+            queue_message("transcribe", format_transcribe_error_repeats(it), critical=True)
+    return items
+
+
+def _burst_params(ev: TranscribeEventIn) -> Dict[str, Any]:
+    return {
+        "code": ev.error_code or "UNKNOWN",
+        "window_sec": settings.transcribe_error_window_sec,
+        "message": (ev.error_message or "")[:1000] or None,
+    }
+
+
+def _alert_text(text: str, code: str, prev_repeats: int) -> str:
+    if prev_repeats:
+        text += f"\n\n🔁 +{prev_repeats} more {code} since the previous alert"
+    return text
+
+
+class ErrorBursts:
+    """
+    Ошибки транскрибации в режиме digest: первая ошибка с данным error_code
+    уходит сразу и открывает окно transcribe_error_window_sec; такие же ошибки
+    в окне не шлются, а считаются. Счётчик уходит одним сообщением, когда окно
+    закроется (flush_error_repeats), или дописывается к следующей ошибке,
+    если та пришла раньше.
+    Доставка — из диспетчера outbox (deliver) или напрямую (send_direct).
+    Соединение с БД берётся только на admit/release: ожидание Telegram
+    (rate limit, retry_after) идёт без него.
+    """
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.collapsed = 0
+
+    async def deliver(self, rows: List[dict]) -> Dict[int, Dict[str, Any]]:
+        out: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            out[row["id"]] = await self._deliver_one(row)
+        return out
+
+    async def _deliver_one(self, row: dict) -> Dict[str, Any]:
+        try:
+            ev = TranscribeEventIn.model_validate(row["payload"])
+            text = format_transcribe_message(ev)
+        except Exception as e:
+            return {"ok": False, "error": f"render failed: {e}", "final": True}
+
+        params = _burst_params(ev)
+        async with get_async_conn() as conn, conn.cursor() as cur:
+            await cur.execute(_ENSURE_BURST_SQL, params)
+            await cur.execute(_ADMIT_SQL, params)
+            burst = await cur.fetchone()
+        if burst["suppressed"]:
+            self.collapsed += 1
+            return {"ok": True, "result": None, "error": None}
+
+        future = telegram_outbox.submit(
+            row["bot"], _alert_text(text, params["code"], burst["prev_repeats"]), critical=True
+        )
+        if future is None:
+            res = {"ok": False, "error": f"bot {row['bot']} is not configured", "final": False}
+        else:
+            res = await asyncio.wrap_future(future)
+        if res["ok"]:
+            self.sent += 1
+        else:
+            # повтор строки снова пойдёт «первой» ошибкой окна
+            async with get_async_conn() as conn, conn.cursor() as cur:
+                await cur.execute(_RELEASE_SQL, {"code": params["code"], "repeats": burst["prev_repeats"]})
+        return res
+
+    def send_direct(self, ev: TranscribeEventIn) -> None:
+        """Без outbox (из threadpool): то же окно повторов, отправка через очередь Telegram."""
+        params = _burst_params(ev)
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(_ENSURE_BURST_SQL, params)
+            cur.execute(_ADMIT_SQL, params)
+            burst = cur.fetchone()
+        if burst["suppressed"]:
+            self.collapsed += 1
+            return
+
+        text = _alert_text(format_transcribe_message(ev), params["code"], burst["prev_repeats"])
+        future = queue_message("transcribe", text, critical=True)
+        res = future.result() if future is not None else {"ok": False}
+        if res["ok"]:
+            self.sent += 1
+        else:
+            # окно не открываем: следующая такая ошибка снова уйдёт сразу
+            with get_conn() as conn, conn.cursor() as cur:
+                cur.execute(_RELEASE_SQL, {"code": params["code"], "repeats": burst["prev_repeats"]})
+
+
+error_bursts = ErrorBursts()
+
+_task: asyncio.Task | None = None
+
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "digests": 0,
+    "error_repeat_messages": 0,
+    "last_period_end": None,
+    "last_error": None,
+}
+
+
+async def _run() -> None:
+    while True:
+        if digest_enabled():
+            try:
+                digest = await asyncio.to_thread(run_digest)
+                repeats = await asyncio.to_thread(flush_error_repeats)
+                _stats["runs"] += 1
+                if digest is not None:
+                    _stats["digests"] += 1
+                    _stats["last_period_end"] = digest.period_end.isoformat()
+                _stats["error_repeat_messages"] += len(repeats)
+                _stats["last_error"] = None
+            except Exception as e:
+                _stats["last_error"] = str(e)
+                logger.exception("transcribe digest: run failed")
+
+        await asyncio.sleep(settings.transcribe_digest_check_interval_sec)
+
+
+async def start_transcribe_digest() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run(), name="transcribe-digest")
+
+
+async def stop_transcribe_digest() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def get_transcribe_digest_stats() -> Dict[str, Any]:
+    return {
+        "mode": settings.transcribe_notify_mode,
+        "interval_sec": int(_interval().total_seconds()),
+        "error_window_sec": settings.transcribe_error_window_sec,
+        "errors_sent": error_bursts.sent,
+        "errors_collapsed": error_bursts.collapsed,
+        **_stats,
+    }
@@ -4,13 +4,12 @@ from __future__ import annotations
 from typing import Any
 import textwrap
 
-import requests
-
 from app.core.config import settings
-from app.schemas.transcribe import TranscribeEventIn
+from app.services.telegram.outbox import queue_message
+from app.schemas.transcribe import TranscribeDigest, TranscribeErrorRepeats, TranscribeEventIn
 
 
-def _format_transcribe_message(ev: TranscribeEventIn) -> str:
+def format_transcribe_message(ev: TranscribeEventIn) -> str:
     emoji = "🎧" if ev.success else "💥"
 
     filename = ev.filename or "-"
@@ -48,6 +47,45 @@ def _format_transcribe_message(ev: TranscribeEventIn) -> str:
     return textwrap.dedent(text).strip()
 
 
+def _fmt_top(items: list[dict]) -> str:
+    return ", ".join(f"{item['name'] or '-'} ×{item['events']}" for item in items) or "-"
+
+
+def format_transcribe_digest(d: TranscribeDigest) -> str:
+    latency = d.latency_ms
+    rtf = d.rtf
+    period = f"{d.period_start:%H:%M}–{d.period_end:%H:%M} UTC"
+    lat = f"p50 {latency.get('p50', '-')} ms | p95 {latency.get('p95', '-')} ms" if latency.get("count") else "-"
+    rtf_line = f"p50 {rtf.get('p50', '-')} | p95 {rtf.get('p95', '-')}" if rtf.get("count") else "-"
+
+    text = f"""
+    📊 TRANSCRIBE DIGEST [{settings.env_name}] {period}
+    ✅ Success: {d.events} | 💥 Failed: {d.failed_events}
+    🔊 Audio:   {d.audio_sec / 60:.1f} min
+
+    🕒 Latency: {lat}
+    ⚡️ RTF:     {rtf_line}
+
+    🤖 Models:  {_fmt_top(d.top_models)}
+    💻 Devices: {_fmt_top(d.top_devices)}
+    """
+    return textwrap.dedent(text).strip()
+
+
+def format_transcribe_error_repeats(r: TranscribeErrorRepeats) -> str:
+    last_at = f"{r.last_at:%H:%M:%S} UTC" if r.last_at else "-"
+    msg = (r.last_message or "-")[:500]
+    window = f"{int(r.window_sec // 60)} min" if r.window_sec >= 60 else f"{int(r.window_sec)} s"
+    text = f"""
+    💥 FAILED ×{r.repeats} more [{settings.env_name}]
+    ❌ Error code: {r.error_code}
+    🔁 Repeated {r.repeats} times within {window} after the first alert
+    🕒 Last at:    {last_at}
+    📝 Last msg:   {msg}
+    """
+    return textwrap.dedent(text).strip()
+
+
 def send_transcribe_notification(ev: TranscribeEventIn) -> None:
     """
     Шлём уведомление о транскрибации во второго бота.
@@ -55,22 +93,16 @@ def send_transcribe_notification(ev: TranscribeEventIn) -> None:
     """
     if not settings.transcribe_telegram_enabled:
         return
+    # успешные в режиме digest — только сводкой, ошибки — с окном повторов (см. transcribe_digest.py)
+    if settings.transcribe_notify_mode == "digest":
+        if not ev.success:
+            # импорт здесь: transcribe_digest сам импортирует этот модуль
+            from app.services.notifier.transcribe_digest import error_bursts
 
-    token = settings.transcribe_telegram_bot_token
-    chat_id = settings.transcribe_telegram_chat_id
-
-    text = _format_transcribe_message(ev)
+            error_bursts.send_direct(ev)
+        return
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload: dict[str, Any] = {
-        "chat_id": chat_id,
-        "text": text,
-        # "parse_mode": "Markdown",
-    }
+    text = format_transcribe_message(ev)
 
-    try:
-        resp = requests.post(url, json=payload, timeout=5)
-        if resp.status_code != 200:
-            print(f"[transcribe-telegram] send failed: {resp.status_code} {resp.text}")
-    except Exception as e:
-        print(f"[transcribe-telegram] exception while sending: {e}")
+    # ошибки не выкидываются из очереди при переполнении
+    queue_message("transcribe", text, critical=not ev.success)
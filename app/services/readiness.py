@@ -0,0 +1,171 @@
+# app/services/readiness.py
+from __future__ import annotations
+
+import http.client
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+# сколько последних попыток по каждому URL кладём в событие деплоя
+_KEEP_ATTEMPTS = 10
+
+
+def _ms(start: float, end: float) -> int:
+    return int((end - start) * 1000)
+
+
+def probe_once(url: str, timeout: float) -> Dict[str, Any]:
+    """
+    Один GET с разбивкой по фазам (всё в мс от начала попытки):
+    dns_ms — резолв, connect_ms — TCP, tls_ms — handshake (только https),
+    ttfb_ms — до статус-строки ответа, total_ms — до конца тела.
+    Ошибка помечается фазой, на которой упали: "connect: [Errno 111] ...".
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    host = parts.hostname or ""
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    attempt: Dict[str, Any] = {
+        "status_code": 0,
+        "dns_ms": None,
+        "connect_ms": None,
+        "tls_ms": None,
+        "ttfb_ms": None,
+        "total_ms": None,
+        "error": None,
+    }
+    start = time.perf_counter()
+    phase = "dns"
+    sock: socket.socket | None = None
+    conn: http.client.HTTPConnection | None = None
+    try:
+        addrs = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        attempt["dns_ms"] = _ms(start, time.perf_counter())
+
+        phase = "connect"
+        error: OSError | None = None
+        for family, type_, proto, _, addr in addrs:
+            sock = socket.socket(family, type_, proto)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(addr)
+                error = None
+                break
+            except OSError as e:
+                sock.close()
+                sock = None
+                error = e
+        if sock is None:
+            raise error or OSError("no addresses")
+        attempt["connect_ms"] = _ms(start, time.perf_counter())
+
+        if https:
+            phase = "tls"
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            attempt["tls_ms"] = _ms(start, time.perf_counter())
+
+        phase = "request"
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        conn.request("GET", path, headers={"Connection": "close"})
+        resp = conn.getresponse()
+        attempt["ttfb_ms"] = _ms(start, time.perf_counter())
+        attempt["status_code"] = resp.status
+
+        phase = "body"
+        resp.read()
+    except Exception as e:
+        attempt["error"] = f"{phase}: {e}"
+    finally:
+        if conn is not None:
+            conn.close()
+        elif sock is not None:
+            sock.close()
+    attempt["total_ms"] = _ms(start, time.perf_counter())
+    return attempt
+
+
+def wait_ready(
+    url: str,
+    deadline_sec: float,
+    attempt_timeout_sec: float,
+    backoff_initial_sec: float,
+    backoff_max_sec: float,
+    success_threshold: int = 1,
+) -> Dict[str, Any]:
+    """
+    Опрашивает url, пока он не ответит 2xx success_threshold раз подряд
+    или не выйдет deadline_sec. После неудачи пауза растёт вдвое
+    (backoff_initial_sec .. backoff_max_sec), после удачи — подтверждаем
+    через backoff_initial_sec.
+
+    ready_at — time.monotonic() первой удачи из финальной серии
+    (с него сервис уже отвечает; нужен для замера простоя).
+    """
+    started = time.monotonic()
+    deadline = started + deadline_sec
+    delay = backoff_initial_sec
+    streak = 0
+    streak_started: float | None = None
+    attempts: List[Dict[str, Any]] = []
+    total = 0
+
+    while True:
+        at = time.monotonic()
+        timeout = max(0.1, min(attempt_timeout_sec, deadline - at))
+        attempt = probe_once(url, timeout)
+        attempt["at_ms"] = _ms(started, at)
+        total += 1
+        attempts.append(attempt)
+        del attempts[:-_KEEP_ATTEMPTS]
+
+        ok = attempt["error"] is None and 200 <= attempt["status_code"] < 300
+        if ok:
+            if streak == 0:
+                streak_started = at
+            streak += 1
+            if streak >= success_threshold:
+                break
+            pause = backoff_initial_sec
+        else:
+            streak = 0
+            streak_started = None
+            pause = delay
+            delay = min(delay * 2, backoff_max_sec)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(pause, remaining))
+
+    last = attempts[-1]
+    ready = streak >= success_threshold
+    error = None
+    if not ready:
+        error = last["error"] or f"status_code={last['status_code']}"
+        error = f"not ready after {deadline_sec:g}s ({total} attempts): {error}"
+    return {
+        "url": url,
+        "ready": ready,
+        "status_code": last["status_code"],
+        "time_to_ready_ms": _ms(started, streak_started) if ready else None,
+        "ready_at": streak_started if ready else None,
+        "attempts_total": total,
+        "attempts": attempts,
+        "error": error,
+    }
+
+
+def wait_all_ready(urls: List[str], **kwargs: Any) -> List[Dict[str, Any]]:
+    """wait_ready по всем URL параллельно, с общим дедлайном; порядок результатов = порядок urls."""
+    if len(urls) == 1:
+        return [wait_ready(urls[0], **kwargs)]
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="readiness") as pool:
+        return list(pool.map(lambda u: wait_ready(u, **kwargs), urls))
@@ -0,0 +1,92 @@
+# app/services/stats/sketch.py
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, Mapping
+
+# Логарифмические корзины (как в DDSketch): корзина i покрывает (GAMMA^(i-1), GAMMA^i].
+# Относительная ошибка квантиля ≈ (GAMMA - 1) / (GAMMA + 1) ≈ 2%.
+# Скетчи складываются покорзинно, поэтому минутные бакеты можно
+# сливать в любое окно без потери точности.
+GAMMA = 1.04
+_LOG_GAMMA = math.log(GAMMA)
+
+# всё, что <= 1 (мс), — в корзину 0
+MIN_BIN = 0
+# ~ 2^31 мс сверху: всё, что больше, — в последнюю корзину
+MAX_BIN = math.ceil(math.log(2**31) / _LOG_GAMMA)
+
+
+def bin_index(value: float) -> int:
+    if value <= 1:
+        return MIN_BIN
+    return min(MAX_BIN, math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def bin_value(index: int) -> float:
+    """Представитель корзины: середина (GAMMA^(i-1), GAMMA^i] в смысле относительной ошибки."""
+    if index <= MIN_BIN:
+        return 1.0
+    return 2 * GAMMA**index / (GAMMA + 1)
+
+
+class LogSketch:
+    """
+    Разреженный логарифмический скетч для квантилей.
+    В БД хранится как jsonb {"<корзина>": <кол-во>}.
+    """
+
+    __slots__ = ("bins", "count")
+
+    def __init__(self, bins: Mapping[int, int] | None = None):
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        if bins:
+            for index, n in bins.items():
+                self.add_bin(int(index), int(n))
+
+    def add(self, value: float | None) -> None:
+        if value is None:
+            return
+        self.add_bin(bin_index(value), 1)
+
+    def add_bin(self, index: int, n: int) -> None:
+        if n <= 0:
+            return
+        self.bins[index] = self.bins.get(index, 0) + n
+        self.count += n
+
+    def merge(self, other: "LogSketch") -> None:
+        for index, n in other.bins.items():
+            self.add_bin(index, n)
+
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return bin_value(index)
+        return bin_value(max(self.bins))
+
+    def quantiles(self, qs: Iterable[float], lo: float | None = None, hi: float | None = None) -> Dict[str, float | None]:
+        """
+        Несколько квантилей разом, ключи вида p50/p95/p99.
+        lo/hi — точные min/max, если известны: квантиль не выходит за них.
+        """
+        result: Dict[str, float | None] = {}
+        for q in qs:
+            v = self.quantile(q)
+            if v is not None:
+                if lo is not None:
+                    v = max(v, lo)
+                if hi is not None:
+                    v = min(v, hi)
+                v = round(v, 1)
+            result[f"p{round(q * 100):g}"] = v
+        return result
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(index): n for index, n in self.bins.items()}
@@ -0,0 +1,305 @@
+# app/services/stats/transcribe_rollup.py
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, Iterable
+
+from psycopg.types.json import Jsonb
+
+from app.services.db.db import get_conn
+from app.services.stats.sketch import LogSketch
+
+# метрика -> префикс колонок в transcribe_rollup_minutely.
+# rtf_milli — производная: transcribe_ms / duration_sec, т.е. RTF * 1000
+# (целые, чтобы лечь в те же count/sum/min/max/sketch).
+METRICS: Dict[str, str] = {
+    "latency_ms": "latency",
+    "transcribe_ms": "transcribe",
+    "ffmpeg_ms": "ffmpeg",
+    "rtf_milli": "rtf",
+}
+
+# ключ минутного бакета (без самой минуты)
+KEY_FIELDS = ("env", "model_name", "model_device", "language_detected", "client", "success")
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _metric_columns() -> list[str]:
+    cols = []
+    for prefix in METRICS.values():
+        cols += [f"{prefix}_count", f"{prefix}_sum", f"{prefix}_min", f"{prefix}_max", f"{prefix}_sketch"]
+    return cols
+
+
+_ROLLUP_COLUMNS = ["bucket_minute", *KEY_FIELDS, "events", "audio_sec_sum", *_metric_columns()]
+
+
+def _conflict_updates() -> str:
+    sets = [
+        "events = r.events + EXCLUDED.events",
+        "audio_sec_sum = r.audio_sec_sum + EXCLUDED.audio_sec_sum",
+    ]
+    for prefix in METRICS.values():
+        sets += [
+            f"{prefix}_count = r.{prefix}_count + EXCLUDED.{prefix}_count",
+            f"{prefix}_sum = r.{prefix}_sum + EXCLUDED.{prefix}_sum",
+            # LEAST/GREATEST игнорируют NULL
+            f"{prefix}_min = LEAST(r.{prefix}_min, EXCLUDED.{prefix}_min)",
+            f"{prefix}_max = GREATEST(r.{prefix}_max, EXCLUDED.{prefix}_max)",
+            f"{prefix}_sketch = rollup_sketch_merge(r.{prefix}_sketch, EXCLUDED.{prefix}_sketch)",
+        ]
+    return ",\n        ".join(sets)
+
+
+_UPSERT_ROLLUP_SQL = f"""
+    INSERT INTO transcribe_rollup_minutely AS r ({", ".join(_ROLLUP_COLUMNS)})
+    VALUES ({", ".join(f"%({c})s" for c in _ROLLUP_COLUMNS)})
+    ON CONFLICT ON CONSTRAINT uq_transcribe_rollup_minutely_key DO UPDATE SET
+        {_conflict_updates()}
+    """
+
+
+def _bucket(ts: dt.datetime) -> dt.datetime:
+    return ts.replace(second=0, microsecond=0)
+
+
+def _metric_value(row: dict, field: str) -> int | None:
+    if field == "rtf_milli":
+        transcribe_ms, duration_sec = row.get("transcribe_ms"), row.get("duration_sec")
+        if transcribe_ms is None or not duration_sec:
+            return None
+        return round(transcribe_ms / duration_sec)
+    return row.get(field)
+
+
+def build_rollup_rows(rows: Iterable[dict]) -> list[dict]:
+    """
+    Сворачивает строки transcribe_events (в виде параметров INSERT/COPY,
+    см. transcribe_store.build_params) в дельты минутных бакетов.
+    Результат отсортирован по ключу — одинаковый порядок блокировок
+    у параллельных транзакций, без deadlock-ов.
+    """
+    acc: Dict[tuple, Dict[str, Any]] = {}
+
+    for row in rows:
+        key = (_bucket(row["created_at_utc"]), *(row[f] for f in KEY_FIELDS))
+        delta = acc.get(key)
+        if delta is None:
+            delta = {"events": 0, "audio_sec_sum": 0.0}
+            for prefix in METRICS.values():
+                delta[prefix] = {"count": 0, "sum": 0, "min": None, "max": None, "sketch": LogSketch()}
+            acc[key] = delta
+
+        delta["events"] += 1
+        delta["audio_sec_sum"] += row.get("duration_sec") or 0.0
+        for field, prefix in METRICS.items():
+            value = _metric_value(row, field)
+            if value is None:
+                continue
+            m = delta[prefix]
+            m["count"] += 1
+            m["sum"] += value
+            m["min"] = value if m["min"] is None else min(m["min"], value)
+            m["max"] = value if m["max"] is None else max(m["max"], value)
+            m["sketch"].add(value)
+
+    result = []
+    for key in sorted(acc, key=lambda k: tuple("" if v is None else str(v) for v in k)):
+        delta = acc[key]
+        params: Dict[str, Any] = {
+            "bucket_minute": key[0],
+            "events": delta["events"],
+            "audio_sec_sum": delta["audio_sec_sum"],
+        }
+        params.update(zip(KEY_FIELDS, key[1:]))
+        for prefix in METRICS.values():
+            m = delta[prefix]
+            params[f"{prefix}_count"] = m["count"]
+            params[f"{prefix}_sum"] = m["sum"]
+            params[f"{prefix}_min"] = m["min"]
+            params[f"{prefix}_max"] = m["max"]
+            params[f"{prefix}_sketch"] = Jsonb(m["sketch"].to_json())
+        result.append(params)
+    return result
+
+
+def upsert_rollups(cur, rows: list[dict]) -> None:
+    """Обновляет минутные агрегаты на уже открытом курсоре (в транзакции записи событий)."""
+    deltas = build_rollup_rows(rows)
+    if deltas:
+        cur.executemany(_UPSERT_ROLLUP_SQL, deltas)
+
+
+async def upsert_rollups_async(cur, rows: list[dict]) -> None:
+    deltas = build_rollup_rows(rows)
+    if deltas:
+        await cur.executemany(_UPSERT_ROLLUP_SQL, deltas)
+
+
+# --- чтение: слияние минутных бакетов в произвольное окно ---
+
+GROUP_FIELDS = KEY_FIELDS
+
+
+def _where(filters: Dict[str, Any]) -> tuple[str, dict]:
+    clauses = ["bucket_minute >= %(start)s", "bucket_minute < %(end)s"]
+    params: Dict[str, Any] = {}
+    for field, value in filters.items():
+        if value is None:
+            continue
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"unknown filter: {field}")
+        clauses.append(f"{field} = %({field})s")
+        params[field] = value
+    return " AND ".join(clauses), params
+
+
+def query_transcribe_rollups(
+    start: dt.datetime,
+    end: dt.datetime,
+    group_by: Iterable[str] = (),
+    bucket_sec: int | None = None,
+    **filters: Any,
+) -> list[Dict[str, Any]]:
+    """
+    Сливает минутные бакеты окна [start, end) в одну строку на группу.
+
+    group_by — любые из env / model_name / model_device /
+    language_detected / client / success;
+    bucket_sec — если задан, дополнительно режем окно на интервалы
+    такой длины (временной ряд); filters — равенство по тем же полям.
+    На группу: events, success_events, audio_sec и по каждой метрике
+    count/avg/min/max и p50/p90/p95/p99.
+    """
+    group_by = list(group_by)
+    for field in group_by:
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"unknown group_by field: {field}")
+
+    where, params = _where(filters)
+    params.update({"start": start, "end": end})
+
+    group_cols = list(group_by)
+    select_cols = list(group_by)
+    if bucket_sec:
+        params["bucket"] = dt.timedelta(seconds=bucket_sec)
+        select_cols.insert(0, "date_bin(%(bucket)s, bucket_minute, %(start)s) AS bucket")
+        group_cols.insert(0, "bucket")
+
+    group_sql = f"GROUP BY {', '.join(group_cols)}" if group_cols else ""
+    out_cols = (["bucket"] if bucket_sec else []) + group_by
+
+    agg_cols = [
+        "sum(events)::bigint AS events",
+        "COALESCE(sum(events) FILTER (WHERE success), 0)::bigint AS success_events",
+        "sum(audio_sec_sum) AS audio_sec",
+    ]
+    for prefix in METRICS.values():
+        agg_cols += [
+            f"sum({prefix}_count)::bigint AS {prefix}_count",
+            f"sum({prefix}_sum)::bigint AS {prefix}_sum",
+            f"min({prefix}_min) AS {prefix}_min",
+            f"max({prefix}_max) AS {prefix}_max",
+        ]
+
+    totals_sql = f"""
+        SELECT {", ".join(select_cols + agg_cols)}
+        FROM transcribe_rollup_minutely
+        WHERE {where}
+        {group_sql}
+    """
+
+    # скетчи сливаем на стороне БД: сумма по корзинам внутри группы
+    sketch_parts = []
+    for field, prefix in METRICS.items():
+        sketch_parts.append(f"""
+            SELECT {", ".join(select_cols + [f"'{field}' AS metric", "s.key::int AS bin", "sum(s.value::bigint)::bigint AS n"])}
+            FROM transcribe_rollup_minutely, jsonb_each_text({prefix}_sketch) AS s
+            WHERE {where}
+            GROUP BY {", ".join(group_cols + ["s.key"])}
+        """)
+    sketch_sql = " UNION ALL ".join(sketch_parts)
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(totals_sql, params)
+        totals = cur.fetchall()
+        cur.execute(sketch_sql, params)
+        sketch_rows = cur.fetchall()
+
+    sketches: Dict[tuple, Dict[str, LogSketch]] = {}
+    for row in sketch_rows:
+        key = tuple(row[c] for c in out_cols)
+        per_metric = sketches.setdefault(key, {})
+        per_metric.setdefault(row["metric"], LogSketch()).add_bin(row["bin"], row["n"])
+
+    result = []
+    for row in totals:
+        key = tuple(row[c] for c in out_cols)
+        item: Dict[str, Any] = {c: row[c] for c in out_cols}
+        item["events"] = row["events"] or 0
+        item["success_events"] = row["success_events"]
+        item["audio_sec"] = round(row["audio_sec"] or 0.0, 3)
+        for field, prefix in METRICS.items():
+            count = row[f"{prefix}_count"] or 0
+            lo, hi = row[f"{prefix}_min"], row[f"{prefix}_max"]
+            sketch = sketches.get(key, {}).get(field, LogSketch())
+            item[field] = {
+                "count": count,
+                "avg": round(row[f"{prefix}_sum"] / count, 1) if count else None,
+                "min": lo,
+                "max": hi,
+                **sketch.quantiles(QUANTILES, lo=lo, hi=hi),
+            }
+        result.append(item)
+
+    result.sort(key=lambda r: tuple("" if r[c] is None else str(r[c]) for c in out_cols))
+    return result
+
+
+# --- пересборка из сырых событий (для истории до появления rollup) ---
+
+_REBUILD_COLUMNS = (
+    "created_at_utc",
+    *KEY_FIELDS,
+    "duration_sec",
+    "latency_ms",
+    "transcribe_ms",
+    "ffmpeg_ms",
+)
+
+
+def rebuild_transcribe_rollups(start: dt.datetime, end: dt.datetime, chunk_size: int = 5000) -> int:
+    """
+    Пересчитывает бакеты [start, end) из transcribe_events.
+    Границы выравниваются на минуты; события читаются серверным курсором пачками.
+    Возвращает количество обработанных событий.
+    """
+    start, end = _bucket(start), _bucket(end)
+    processed = 0
+
+    with get_conn() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM transcribe_rollup_minutely "
+                    "WHERE bucket_minute >= %s AND bucket_minute < %s",
+                    (start, end),
+                )
+                with conn.cursor(name="transcribe_rollup_rebuild") as src:
+                    src.execute(
+                        f"""
+                        SELECT {", ".join(_REBUILD_COLUMNS)}
+                        FROM transcribe_events
+                        WHERE created_at_utc >= %s AND created_at_utc < %s
+                        """,
+                        (start, end),
+                    )
+                    while True:
+                        rows = src.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        upsert_rollups(cur, rows)
+                        processed += len(rows)
+
+    return processed
@@ -0,0 +1,39 @@
+# app/services/stats/transcribe_stats.py
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, Iterable
+
+from app.services.stats.transcribe_rollup import query_transcribe_rollups
+
+
+def _rtf_from_milli(m: Dict[str, Any]) -> Dict[str, Any]:
+    """rtf_milli хранится как RTF * 1000 — возвращаем обычный RTF."""
+    return {
+        key: (round(value / 1000, 4) if value is not None and key != "count" else value)
+        for key, value in m.items()
+    }
+
+
+def get_transcribe_stats(
+    start: dt.datetime,
+    end: dt.datetime,
+    group_by: Iterable[str] = (),
+    bucket_sec: int | None = None,
+    **filters: Any,
+) -> list[Dict[str, Any]]:
+    """
+    Статистика транскрибаций за окно [start, end) по минутным агрегатам:
+    throughput, success rate, перцентили латентностей и RTF по группам.
+    Сырые transcribe_events не читаются.
+    """
+    rows = query_transcribe_rollups(start, end, group_by=group_by, bucket_sec=bucket_sec, **filters)
+
+    window_sec = bucket_sec or max((end - start).total_seconds(), 1.0)
+    for row in rows:
+        events = row["events"]
+        row["success_rate"] = round(row["success_events"] / events, 4) if events else None
+        row["throughput_per_min"] = round(events / window_sec * 60, 3)
+        row["audio_sec_per_min"] = round(row["audio_sec"] / window_sec * 60, 3)
+        row["rtf"] = _rtf_from_milli(row.pop("rtf_milli"))
+    return rows
@@ -0,0 +1,285 @@
+# app/services/telegram/client.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org"
+
+# files = {"document": ("benchmark.png", png_bytes)}
+TelegramFiles = Dict[str, Tuple[str, bytes]]
+
+# Боты сервиса: имя -> (поле токена, поле чата) в settings
+BOTS: Dict[str, Tuple[str, str]] = {
+    "deploy": ("telegram_bot_token", "telegram_chat_id"),
+    "transcribe": ("transcribe_telegram_bot_token", "transcribe_telegram_chat_id"),
+    "all_eat": ("all_eat_bot_token", "all_eat_chat_id"),
+}
+
+
+def bot_config(bot: str) -> Tuple[Optional[str], Optional[str]]:
+    """(token, chat_id) бота из настроек; (None, None) — бот не настроен."""
+    token_field, chat_field = BOTS[bot]
+    token = getattr(settings, token_field)
+    chat_id = getattr(settings, chat_field)
+    if not token or not chat_id:
+        return None, None
+    return token, str(chat_id)
+
+
+def bot_name(token: str) -> str:
+    """
+    Имя бота по токену — для статистики и логов: настроенный бот — его имя из BOTS,
+    чужой токен — по id бота (часть до ':' — не секрет), чтобы разные боты не сливались.
+    """
+    for name, (token_field, _) in BOTS.items():
+        if getattr(settings, token_field) == token:
+            return name
+    return f"bot{token.split(':', 1)[0]}"
+
+
+def bot_enabled(bot: str) -> bool:
+    return bot_config(bot)[0] is not None
+
+
+class TelegramClient:
+    """
+    Общий клиент Bot API на процесс: keep-alive пулы соединений
+    (requests.Session для синхронных вызовов и потоков, httpx.AsyncClient —
+    для event loop), одинаковые таймауты и обработка ошибок.
+
+    Вызовы НЕ бросают исключений: результат — словарь
+    ok, status_code, result, error, retry_after, latency_ms.
+    По каждой паре (бот, метод) копим счётчики и задержки (stats()).
+    """
+
+    def __init__(self) -> None:
+        self._session: requests.Session | None = None
+        self._async: httpx.AsyncClient | None = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=len(BOTS),
+                    pool_maxsize=settings.telegram_pool_size,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def _get_async(self) -> httpx.AsyncClient:
+        if self._async is None:
+            self._async = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.telegram_pool_size,
+                    max_keepalive_connections=settings.telegram_pool_size,
+                ),
+            )
+        return self._async
+
+    @staticmethod
+    def _timeout(files: Optional[TelegramFiles]) -> float:
+        return settings.telegram_upload_timeout_sec if files else settings.telegram_timeout_sec
+
+    @staticmethod
+    def _parse(status_code: int, body: Any, latency_ms: int) -> Dict[str, Any]:
+        body = body if isinstance(body, dict) else {}
+        ok = status_code == 200 and bool(body.get("ok"))
+        params = body.get("parameters") or {}
+        return {
+            "ok": ok,
+            "status_code": status_code,
+            "result": body.get("result") if ok else None,
+            "error": None if ok else (body.get("description") or f"HTTP {status_code}"),
+            "retry_after": params.get("retry_after"),
+            "latency_ms": latency_ms,
+        }
+
+    def _record(self, bot: str, method: str, res: Dict[str, Any]) -> None:
+        key = f"{bot}.{method}"
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None:
+                st = self._stats[key] = {
+                    "calls": 0,
+                    "ok": 0,
+                    "failed": 0,
+                    "status_codes": {},
+                    "latency_ms_total": 0,
+                    "latency_ms_max": 0,
+                    "last_error": None,
+                }
+            st["calls"] += 1
+            st["ok" if res["ok"] else "failed"] += 1
+            code = str(res["status_code"])
+            st["status_codes"][code] = st["status_codes"].get(code, 0) + 1
+            st["latency_ms_total"] += res["latency_ms"]
+            st["latency_ms_max"] = max(st["latency_ms_max"], res["latency_ms"])
+            if not res["ok"]:
+                st["last_error"] = res["error"]
+        if not res["ok"]:
+            logger.warning(
+                "telegram %s %s failed (%s): %s", bot, method, res["status_code"], (res["error"] or "")[:500]
+            )
+
+    def call(
+        self,
+        bot: str,
+        method: str,
+        payload: Dict[str, Any],
+        files: Optional[TelegramFiles] = None,
+        token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Синхронный вызов метода Bot API (token — если не из настроек бота)."""
+        token = token or bot_config(bot)[0]
+        url = f"{API_URL}/bot{token}/{method}"
+        start = time.perf_counter()
+        try:
+            if files:
+                resp = self._get_session().post(url, data=payload, files=files, timeout=self._timeout(files))
+            else:
+                resp = self._get_session().post(url, json=payload, timeout=self._timeout(files))
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            res = self._parse(resp.status_code, body, int((time.perf_counter() - start) * 1000))
+        except Exception as e:
+            res = self._parse(0, None, int((time.perf_counter() - start) * 1000))
+            # текст исключения содержит URL, а в нём — токен бота
+            res["error"] = f"{type(e).__name__}: {e}".replace(str(token), "<token>")
+        self._record(bot, method, res)
+        return res
+
+    async def acall(
+        self,
+        bot: str,
+        method: str,
+        payload: Dict[str, Any],
+        files: Optional[TelegramFiles] = None,
+        token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """То же, что call(), но без блокировки event loop."""
+        token = token or bot_config(bot)[0]
+        url = f"{API_URL}/bot{token}/{method}"
+        start = time.perf_counter()
+        try:
+            client = self._get_async()
+            if files:
+                resp = await client.post(url, data=payload, files=files, timeout=self._timeout(files))
+            else:
+                resp = await client.post(url, json=payload, timeout=self._timeout(files))
+            try:
+                body = resp.json()
+            except ValueError:
+                body = None
+            res = self._parse(resp.status_code, body, int((time.perf_counter() - start) * 1000))
+        except Exception as e:
+            res = self._parse(0, None, int((time.perf_counter() - start) * 1000))
+            # текст исключения содержит URL, а в нём — токен бота
+            res["error"] = f"{type(e).__name__}: {e}".replace(str(token), "<token>")
+        self._record(bot, method, res)
+        return res
+
+    async def aclose(self) -> None:
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for key, st in self._stats.items():
+                out[key] = {
+                    **st,
+                    "status_codes": dict(st["status_codes"]),
+                    "latency_ms_avg": int(st["latency_ms_total"] / st["calls"]) if st["calls"] else None,
+                }
+            return out
+
+
+telegram_client = TelegramClient()
+
+
+def first_file(files: TelegramFiles) -> TelegramFiles:
+    field_name, file = next(iter(files.items()))
+    return {field_name: file}
+
+
+def message_payload(
+    chat_id: str,
+    text: str,
+    files: Optional[TelegramFiles],
+    parse_mode: Optional[str],
+    disable_web_page_preview: bool,
+) -> Tuple[str, Dict[str, Any]]:
+    if files:
+        # первый файл — документом с caption (sendMediaGroup пока не нужен)
+        payload: Dict[str, Any] = {"chat_id": chat_id, "caption": text}
+        method = "sendDocument"
+    else:
+        payload = {"chat_id": chat_id, "text": text, "disable_web_page_preview": disable_web_page_preview}
+        method = "sendMessage"
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    return method, payload
+
+
+def send_message(
+    bot: str,
+    text: str,
+    files: Optional[TelegramFiles] = None,
+    parse_mode: Optional[str] = None,
+    disable_web_page_preview: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """Сообщение в чат бота из настроек; None — бот не настроен (тихо выходим)."""
+    token, chat_id = bot_config(bot)
+    if token is None:
+        return None
+    method, payload = message_payload(chat_id, text, files, parse_mode, disable_web_page_preview)
+    if files:
+        files = first_file(files)
+    return telegram_client.call(bot, method, payload, files=files)
+
+
+async def asend_message(
+    bot: str,
+    text: str,
+    files: Optional[TelegramFiles] = None,
+    parse_mode: Optional[str] = None,
+    disable_web_page_preview: bool = True,
+) -> Optional[Dict[str, Any]]:
+    token, chat_id = bot_config(bot)
+    if token is None:
+        return None
+    method, payload = message_payload(chat_id, text, files, parse_mode, disable_web_page_preview)
+    if files:
+        files = first_file(files)
+    return await telegram_client.acall(bot, method, payload, files=files)
+
+
+async def close_telegram_client() -> None:
+    await telegram_client.aclose()
+
+
+def get_telegram_stats() -> Dict[str, Any]:
+    return telegram_client.stats()
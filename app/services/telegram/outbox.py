@@ -0,0 +1,337 @@
+# app/services/telegram/outbox.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.services.telegram.client import bot_config, bot_enabled, message_payload, telegram_client
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    rate токенов в секунду, не больше burst впрок.
+    pause(sec) — после 429: до этого момента токенов нет вовсе.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Сколько ждать до свободного токена (0 — можно сейчас)."""
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, now: float, sec: float) -> None:
+        self.paused_until = max(self.paused_until, now + sec)
+        self.tokens = 0.0
+
+
+class _Item:
+    __slots__ = ("bot", "method", "payload", "critical", "future", "enqueued", "attempts", "not_before")
+
+    def __init__(self, bot: str, method: str, payload: Dict[str, Any], critical: bool) -> None:
+        self.bot = bot
+        self.method = method
+        self.payload = payload
+        self.critical = critical
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class _Chat:
+    __slots__ = ("key", "bucket", "queue", "busy")
+
+    def __init__(self, key: str, bucket: TokenBucket) -> None:
+        self.key = key
+        self.bucket = bucket
+        self.queue: Deque[_Item] = deque()
+        self.busy = False  # в чат шлём строго по одному — порядок сообщений сохраняется
+
+
+def _result(error: str) -> Dict[str, Any]:
+    return {"ok": False, "status_code": 0, "result": None, "error": error, "retry_after": None, "latency_ms": 0}
+
+
+class TelegramOutbox:
+    """
+    Асинхронная очередь исходящих сообщений Telegram:
+    - token bucket на бота (лимит Bot API на все чаты) и на каждый чат
+      (в группы — около 20 сообщений в минуту);
+    - 429: чат замолкает на retry_after из ответа, сообщение остаётся первым в очереди;
+    - сетевые ошибки и 5xx — повтор с экспоненциальной паузой, до max_attempts;
+    - глубина очереди ограничена: при переполнении выкидываем самое старое
+      некритичное сообщение (drop_oldest) или не берём новое (drop_new);
+      critical (ошибки, деплой) не выкидываются никогда.
+
+    submit() можно звать из любого потока; возвращает concurrent Future
+    с результатом вызова API (как у TelegramClient.call).
+    Пока outbox не запущен (скрипты, один процесс без event loop) — шлём сразу.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._chats: Dict[str, _Chat] = {}
+        self._bots: Dict[str, TokenBucket] = {}
+        self._pending = 0
+
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.lag_ms_max = 0
+        self.lag_ms_total = 0
+
+    # --- постановка в очередь ---
+
+    def submit(self, bot: str, text: str, parse_mode: Optional[str] = None, critical: bool = False) -> Optional[Future]:
+        token, chat_id = bot_config(bot)
+        if token is None:
+            return None
+        method, payload = message_payload(chat_id, text, None, parse_mode, True)
+        return self.submit_call(bot, method, payload, critical=critical)
+
+    def submit_call(self, bot: str, method: str, payload: Dict[str, Any], critical: bool = False) -> Optional[Future]:
+        """Любой метод Bot API (editMessageText и т.п.) через ту же очередь; payload — с chat_id."""
+        if not bot_enabled(bot):
+            return None
+
+        if self._task is None:
+            future: Future = Future()
+            future.set_result(telegram_client.call(bot, method, payload))
+            return future
+
+        item = _Item(bot, method, payload, critical)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._put(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put, item)
+        return item.future
+
+    def _chat(self, bot: str, chat_id: Any) -> _Chat:
+        key = f"{bot}:{chat_id}"
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = _Chat(
+                key,
+                TokenBucket(settings.telegram_chat_rate_per_min / 60.0, settings.telegram_chat_burst),
+            )
+        return chat
+
+    def _bot_bucket(self, bot: str) -> TokenBucket:
+        bucket = self._bots.get(bot)
+        if bucket is None:
+            bucket = self._bots[bot] = TokenBucket(settings.telegram_bot_rate_per_sec, settings.telegram_bot_rate_per_sec)
+        return bucket
+
+    def _put(self, item: _Item) -> None:
+        if self._stopping:
+            self._drop(item)
+            return
+        chat = self._chat(item.bot, item.payload["chat_id"])
+        if self._pending >= settings.telegram_outbox_max_pending:
+            if settings.telegram_outbox_drop_policy == "drop_new" and not item.critical:
+                self._drop(item)
+                return
+            victim = self._oldest_droppable(chat)
+            if victim is None:
+                if not item.critical:
+                    self._drop(item)
+                    return
+                # всё критичное — превышаем лимит, но не теряем
+            else:
+                victim_chat, victim_item = victim
+                victim_chat.queue.remove(victim_item)
+                self._pending -= 1
+                self._drop(victim_item)
+
+        chat.queue.append(item)
+        self._pending += 1
+        self.enqueued += 1
+        self._wakeup.set()
+
+    def _oldest_droppable(self, prefer: _Chat) -> tuple[_Chat, _Item] | None:
+        # сначала из того же чата (он и переполняет), потом из любого
+        for chat in (prefer, *self._chats.values()):
+            for item in chat.queue:
+                if not item.critical and item.attempts == 0:
+                    return chat, item
+        return None
+
+    def _drop(self, item: _Item) -> None:
+        self.dropped += 1
+        reason = "outbox stopped" if self._stopping else "outbox queue is full"
+        logger.warning("telegram outbox: dropped %s message (%s)", item.bot, reason)
+        item.future.set_result(_result(f"dropped: {reason}"))
+
+    # --- отправка ---
+
+    def _dispatch(self) -> float | None:
+        """Отправляет всё, что можно отправить сейчас; возвращает, сколько спать до следующего."""
+        now = time.monotonic()
+        sleep: float | None = None
+        for chat in self._chats.values():
+            if chat.busy or not chat.queue:
+                continue
+            item = chat.queue[0]
+            bot_bucket = self._bot_bucket(item.bot)
+            wait = max(chat.bucket.wait(now), bot_bucket.wait(now), item.not_before - now)
+            if wait > 0:
+                sleep = wait if sleep is None else min(sleep, wait)
+                continue
+            chat.bucket.take()
+            bot_bucket.take()
+            chat.queue.popleft()
+            chat.busy = True
+            asyncio.create_task(self._send(chat, item))
+        return sleep
+
+    async def _send(self, chat: _Chat, item: _Item) -> None:
+        item.attempts += 1
+        res = await telegram_client.acall(item.bot, item.method, item.payload)
+        now = time.monotonic()
+        retry = False
+        if res["ok"]:
+            self.sent += 1
+            lag_ms = int((now - item.enqueued) * 1000)
+            self.lag_ms_total += lag_ms
+            self.lag_ms_max = max(self.lag_ms_max, lag_ms)
+        elif res["status_code"] == 429:
+            # лимит превышен: не тратим попытку, чат молчит retry_after секунд
+            self.rate_limited += 1
+            item.attempts -= 1
+            chat.bucket.pause(now, float(res["retry_after"] or 1))
+            retry = True
+        elif (res["status_code"] == 0 or res["status_code"] >= 500) and item.attempts < settings.telegram_outbox_max_attempts:
+            self.retries += 1
+            backoff = settings.telegram_outbox_backoff_base_sec * 2 ** (item.attempts - 1)
+            item.not_before = now + min(backoff, settings.telegram_outbox_backoff_max_sec)
+            retry = True
+        else:
+            self.failed += 1
+
+        if retry and not self._stopping:
+            chat.queue.appendleft(item)
+        else:
+            self._pending -= 1
+            item.future.set_result(res)
+        chat.busy = False
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            sleep = self._dispatch()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- жизненный цикл ---
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="telegram-outbox")
+
+    async def stop(self) -> None:
+        """Даём очереди до telegram_outbox_drain_sec дослать накопленное, остальное — dropped."""
+        if self._task is None:
+            return
+        deadline = time.monotonic() + settings.telegram_outbox_drain_sec
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        for chat in self._chats.values():
+            while chat.queue:
+                self._drop(chat.queue.popleft())
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        chats = {}
+        oldest = None
+        for chat in self._chats.values():
+            if not chat.queue:
+                continue
+            age = now - chat.queue[0].enqueued
+            oldest = age if oldest is None else max(oldest, age)
+            chats[chat.key] = {
+                "pending": len(chat.queue),
+                "oldest_age_ms": int(age * 1000),
+                "paused_ms": int(max(0.0, chat.bucket.paused_until - now) * 1000),
+            }
+        return {
+            "running": self._task is not None,
+            "pending": self._pending,
+            "max_pending": settings.telegram_outbox_max_pending,
+            "drop_policy": settings.telegram_outbox_drop_policy,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            # lag — от постановки в очередь до успешной отправки
+            "oldest_pending_ms": int(oldest * 1000) if oldest is not None else 0,
+            "lag_ms_avg": int(self.lag_ms_total / self.sent) if self.sent else None,
+            "lag_ms_max": self.lag_ms_max,
+            "chats": chats,
+        }
+
+
+telegram_outbox = TelegramOutbox()
+
+
+def queue_message(bot: str, text: str, parse_mode: Optional[str] = None, critical: bool = False) -> Optional[Future]:
+    return telegram_outbox.submit(bot, text, parse_mode=parse_mode, critical=critical)
+
+
+async def start_telegram_outbox() -> None:
+    await telegram_outbox.start()
+
+
+async def stop_telegram_outbox() -> None:
+    await telegram_outbox.stop()
+
+
+def get_telegram_outbox_stats() -> Dict[str, Any]:
+    return telegram_outbox.stats()
@@ -2,23 +2,14 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Optional, Tuple
-
-import requests
+from typing import Optional
 
 from app.core.config import settings
+from app.services.telegram.client import TelegramFiles, bot_name, first_file, message_payload, telegram_client
 
 logger = logging.getLogger(__name__)
 
 
-# Тип для файлов:
-# files = {
-#   "document": ("benchmark.png", png_bytes),
-#   "document2": ("raw.json", json_bytes),
-# }
-TelegramFiles = Dict[str, Tuple[str, bytes]]
-
-
 def send_telegram_message(
     token: Optional[str],
     chat_id: Optional[str],
@@ -36,7 +27,8 @@ def send_telegram_message(
     - Если files есть -> отправляем первый файл как документ с caption=text.
       (Если нужно сложнее — можно поверх этого сделать отдельный helper.)
 
-    Любые ошибки ЛОГИРУЮТСЯ, но НЕ пробрасываются выше — сервис не падает.
+    Любые ошибки ЛОГИРУЮТСЯ, но НЕ пробрасываются выше — сервис не падает
+    (общий keep-alive клиент, см. client.py).
     """
 
     # Fallback к all-eat боту, если явно не передали
@@ -49,49 +41,6 @@ def send_telegram_message(
         logger.warning("Telegram sender disabled: no token/chat_id provided")
         return
 
-    base_url = f"https://api.telegram.org/bot{token}"
-
-    try:
-        if not files:
-            # Просто текст
-            url = f"{base_url}/sendMessage"
-            payload: Dict[str, Any] = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": parse_mode,
-                "disable_web_page_preview": disable_web_page_preview,
-            }
-            resp = requests.post(url, json=payload, timeout=15)
-        else:
-            # Отправляем первый файл как документ с caption.
-            # (остальные можно будет потом развить до sendMediaGroup)
-            url = f"{base_url}/sendDocument"
-
-            # Берём первый элемент из словаря
-            field_name, (filename, content) = next(iter(files.items()))
-            files_payload = {
-                field_name: (filename, content),
-            }
-
-            data: Dict[str, Any] = {
-                "chat_id": chat_id,
-                "caption": text,
-                "parse_mode": parse_mode,
-            }
-
-            resp = requests.post(
-                url,
-                data=data,
-                files=files_payload,
-                timeout=30,
-            )
-
-        if not resp.ok:
-            logger.error(
-                "Telegram send failed (%s): %s",
-                resp.status_code,
-                resp.text[:500],
-            )
-    except Exception:
-        # Никаких raise — только лог.
-        logger.exception("Telegram send exception")
+    bot = bot_name(token)
+    method, payload = message_payload(str(chat_id), text, files, parse_mode, disable_web_page_preview)
+    telegram_client.call(bot, method, payload, files=first_file(files) if files else None, token=token)
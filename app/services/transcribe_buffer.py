@@ -0,0 +1,248 @@
+# app/services/transcribe_buffer.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict
+
+import psycopg
+
+from app.core.config import settings
+from app.schemas.transcribe import TranscribeEventIn
+from app.services.transcribe_store import (
+    build_params,
+    save_transcribe_event_async,
+    save_transcribe_rows_async,
+)
+
+logger = logging.getLogger(__name__)
+
+# ошибки самих строк: повтор той же пачки упадёт так же — ищем виноватые строки
+_DATA_ERRORS = (psycopg.DataError, psycopg.IntegrityError)
+
+
+class TranscribeWriteBuffer:
+    """
+    Write-behind буфер для transcribe_events.
+
+    - add() кладёт подготовленную строку в память и сразу возвращается;
+    - фоновая таска сливает буфер через COPY, когда набралось max_rows
+      или прошло flush_interval_sec с прошлого flush;
+    - stop() сливает остаток (вызывается на shutdown);
+    - пачка упала на ошибке данных — делим пополам, пока не найдём
+      плохие строки; они уходят в dead-letter файл, остальные пишутся.
+      Прочие ошибки (БД недоступна) — пачка возвращается в буфер.
+
+    Строки готовятся в момент приёма (id, created_at_utc), поэтому
+    в БД время события не зависит от задержки flush.
+    """
+
+    def __init__(self, max_rows: int, flush_interval_sec: float, max_pending: int):
+        self.max_rows = max_rows
+        self.flush_interval_sec = flush_interval_sec
+        self.max_pending = max_pending
+
+        self._rows: list[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+        self._stats: Dict[str, Any] = {
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_failures": 0,
+            "rows_dropped": 0,
+            "rows_dead_lettered": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "flush_ms_total": 0.0,
+            "last_error": None,
+        }
+
+    # --- жизненный цикл ---
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="transcribe-write-buffer")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # финальный слив того, что успело прилететь
+        await self.flush()
+
+    # --- запись ---
+
+    async def add(self, ev: TranscribeEventIn) -> None:
+        self._rows.append(build_params(ev))
+
+        if len(self._rows) >= self.max_rows:
+            self._wakeup.set()
+
+        # backpressure: буфер переполнен (БД тормозит/лежит) — ждём flush в запросе
+        if len(self._rows) >= self.max_pending:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._rows:
+                return
+
+            rows, self._rows = self._rows, []
+            start = time.perf_counter()
+            try:
+                await save_transcribe_rows_async(rows)
+            except _DATA_ERRORS as e:
+                self._stats["flush_failures"] += 1
+                self._stats["last_error"] = str(e)
+                logger.warning("transcribe buffer: flush of %s rows rejected (%s), isolating bad rows", len(rows), e)
+                left = await self._save_isolating(rows)
+                if left:
+                    self._requeue(left)
+                return
+            except Exception as e:
+                self._stats["flush_failures"] += 1
+                self._stats["last_error"] = str(e)
+                logger.exception("transcribe buffer: flush of %s rows failed", len(rows))
+                self._requeue(rows)
+                return
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._stats["flushes"] += 1
+            self._stats["rows_flushed"] += len(rows)
+            self._stats["last_flush_rows"] = len(rows)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["flush_ms_total"] += elapsed_ms
+            if elapsed_ms > self._stats["max_flush_ms"]:
+                self._stats["max_flush_ms"] = round(elapsed_ms, 3)
+
+    async def _save_isolating(self, rows: list[dict]) -> list[dict]:
+        """
+        Пишет пачку половинками; строку, которую БД не принимает и поодиночке,
+        отправляет в dead-letter. Возвращает строки, не записанные из-за
+        других ошибок (их — обратно в буфер).
+        """
+        stack = [rows]
+        while stack:
+            part = stack.pop()
+            try:
+                await save_transcribe_rows_async(part)
+                self._stats["rows_flushed"] += len(part)
+            except _DATA_ERRORS as e:
+                if len(part) == 1:
+                    self._dead_letter(part[0], e)
+                    continue
+                mid = len(part) // 2
+                stack.append(part[mid:])
+                stack.append(part[:mid])
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                logger.exception("transcribe buffer: flush failed while isolating bad rows")
+                return [row for chunk in [part, *reversed(stack)] for row in chunk]
+        return []
+
+    def _dead_letter(self, row: dict, error: Exception) -> None:
+        self._stats["rows_dead_lettered"] += 1
+        logger.error(
+            "transcribe buffer: row %s (request_id=%s) rejected: %s",
+            row.get("id"), row.get("request_id"), error,
+        )
+        path = settings.transcribe_dead_letter_path
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"error": str(error), "row": row}, ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            logger.exception("transcribe buffer: dead-letter write failed")
+
+    def _requeue(self, rows: list[dict]) -> None:
+        """Возвращаем неудачную пачку в начало буфера, не выходя за max_pending."""
+        merged = rows + self._rows
+        overflow = len(merged) - self.max_pending
+        if overflow > 0:
+            # выкидываем самые старые — их шансы дожить всё равно минимальны
+            self._stats["rows_dropped"] += overflow
+            logger.error("transcribe buffer: dropped %s rows (buffer full)", overflow)
+            merged = merged[overflow:]
+        self._rows = merged
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("transcribe buffer: unexpected flush error")
+
+    # --- метрики ---
+
+    def stats(self) -> Dict[str, Any]:
+        flushes = self._stats["flushes"]
+        return {
+            "mode": settings.transcribe_write_mode,
+            "depth": len(self._rows),
+            "max_rows": self.max_rows,
+            "max_pending": self.max_pending,
+            "flush_interval_sec": self.flush_interval_sec,
+            "flushes": flushes,
+            "rows_flushed": self._stats["rows_flushed"],
+            "flush_failures": self._stats["flush_failures"],
+            "rows_dropped": self._stats["rows_dropped"],
+            "rows_dead_lettered": self._stats["rows_dead_lettered"],
+            "last_flush_rows": self._stats["last_flush_rows"],
+            "last_flush_ms": self._stats["last_flush_ms"],
+            "max_flush_ms": self._stats["max_flush_ms"],
+            "avg_flush_ms": round(self._stats["flush_ms_total"] / flushes, 3) if flushes else 0.0,
+            "last_error": self._stats["last_error"],
+        }
+
+
+transcribe_buffer = TranscribeWriteBuffer(
+    max_rows=settings.transcribe_buffer_max_rows,
+    flush_interval_sec=settings.transcribe_buffer_flush_interval_sec,
+    max_pending=settings.transcribe_buffer_max_pending,
+)
+
+
+def _buffered() -> bool:
+    return settings.transcribe_write_mode == "buffered"
+
+
+async def write_transcribe_event(ev: TranscribeEventIn) -> None:
+    """
+    Точка входа для записи события транскрибации.
+    TRANSCRIBE_WRITE_MODE=sync — сразу INSERT (удобно для тестов),
+    иначе — в write-behind буфер.
+    """
+    if _buffered():
+        await transcribe_buffer.add(ev)
+    else:
+        await save_transcribe_event_async(ev)
+
+
+async def start_transcribe_buffer() -> None:
+    if _buffered():
+        transcribe_buffer.start()
+
+
+async def stop_transcribe_buffer() -> None:
+    await transcribe_buffer.stop()
+
+
+def get_transcribe_buffer_stats() -> Dict[str, Any]:
+    return transcribe_buffer.stats()
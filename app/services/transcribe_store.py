@@ -5,88 +5,165 @@ import datetime as dt
 import uuid
 
 from app.core.config import settings
-from app.services.db.db import get_conn
+from app.services.db.db import get_async_conn, get_conn
 from app.schemas.transcribe import TranscribeEventIn
+from app.services.notifier.notification_outbox import add_to_outbox, add_to_outbox_async, outbox_params
+from app.services.stats.transcribe_rollup import upsert_rollups, upsert_rollups_async
 
 
-def save_transcribe_event(ev: TranscribeEventIn) -> None:
+# порядок колонок для COPY (совпадает с INSERT ниже)
+_COLUMNS = (
+    "id",
+    "created_at_utc",
+    "env",
+    "client",
+    "client_ip",
+    "request_id",
+    "video_id",
+    "filename",
+    "filesize_bytes",
+    "duration_sec",
+    "content_type",
+    "model_name",
+    "model_device",
+    "language_detected",
+    "latency_ms",
+    "transcribe_ms",
+    "ffmpeg_ms",
+    "success",
+    "error_code",
+    "error_message",
+)
+
+_COPY_SQL = f"COPY transcribe_events ({', '.join(_COLUMNS)}) FROM STDIN"
+
+_INSERT_SQL = """
+    INSERT INTO transcribe_events (
+        id,
+        created_at_utc,
+        env,
+        client,
+        client_ip,
+        request_id,
+        video_id,
+        filename,
+        filesize_bytes,
+        duration_sec,
+        content_type,
+        model_name,
+        model_device,
+        language_detected,
+        latency_ms,
+        transcribe_ms,
+        ffmpeg_ms,
+        success,
+        error_code,
+        error_message
+    ) VALUES (
+        %(id)s,
+        %(created_at_utc)s,
+        %(env)s,
+        %(client)s,
+        %(client_ip)s,
+        %(request_id)s,
+        %(video_id)s,
+        %(filename)s,
+        %(filesize_bytes)s,
+        %(duration_sec)s,
+        %(content_type)s,
+        %(model_name)s,
+        %(model_device)s,
+        %(language_detected)s,
+        %(latency_ms)s,
+        %(transcribe_ms)s,
+        %(ffmpeg_ms)s,
+        %(success)s,
+        %(error_code)s,
+        %(error_message)s
+    )
+    """
+
+
+def build_params(ev: TranscribeEventIn) -> dict:
     """
-    Сохраняет событие транскрибации в таблицу transcribe_events.
+    Параметры для INSERT в transcribe_events.
     created_at_utc и env проставляются на стороне оркестратора.
     """
     event_id = uuid.uuid4()
     now_utc = dt.datetime.now(dt.timezone.utc)
 
+    return {
+        "id": str(event_id),
+        "created_at_utc": now_utc,
+        "env": settings.env_name,
+
+        "client": ev.client,
+        "client_ip": ev.client_ip,
+
+        "request_id": ev.request_id,
+        "video_id": ev.video_id,
+        "filename": ev.filename,
+        "filesize_bytes": ev.filesize_bytes,
+        "duration_sec": ev.duration_sec,
+        "content_type": ev.content_type,
+        "model_name": ev.model_name,
+        "model_device": ev.model_device,
+        "language_detected": ev.language_detected,
+        "latency_ms": ev.latency_ms,
+        "transcribe_ms": ev.transcribe_ms,
+        "ffmpeg_ms": ev.ffmpeg_ms,
+        "success": ev.success,
+        "error_code": ev.error_code,
+        "error_message": ev.error_message,
+
+        # уведомление — в notification_outbox той же транзакцией
+        **outbox_params("transcribe", ev),
+    }
+
+
+def save_transcribe_event(ev: TranscribeEventIn) -> None:
+    """
+    Сохраняет событие транскрибации в таблицу transcribe_events
+    и в той же транзакции обновляет минутные агрегаты и пишет уведомление в outbox.
+    created_at_utc и env проставляются на стороне оркестратора.
+    """
+    params = build_params(ev)
     with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO transcribe_events (
-                    id,
-                    created_at_utc,
-                    env,
-                    client,
-                    client_ip,
-                    request_id,
-                    video_id,
-                    filename,
-                    filesize_bytes,
-                    duration_sec,
-                    content_type,
-                    model_name,
-                    model_device,
-                    language_detected,
-                    latency_ms,
-                    transcribe_ms,
-                    ffmpeg_ms,
-                    success,
-                    error_code,
-                    error_message
-                ) VALUES (
-                    %(id)s,
-                    %(created_at_utc)s,
-                    %(env)s,
-                    %(client)s,
-                    %(client_ip)s,
-                    %(request_id)s,
-                    %(video_id)s,
-                    %(filename)s,
-                    %(filesize_bytes)s,
-                    %(duration_sec)s,
-                    %(content_type)s,
-                    %(model_name)s,
-                    %(model_device)s,
-                    %(language_detected)s,
-                    %(latency_ms)s,
-                    %(transcribe_ms)s,
-                    %(ffmpeg_ms)s,
-                    %(success)s,
-                    %(error_code)s,
-                    %(error_message)s
-                )
-                """,
-                {
-                    "id": str(event_id),
-                    "created_at_utc": now_utc,
-                    "env": settings.env_name,
-
-                    "client": ev.client,
-                    "client_ip": ev.client_ip,
-
-                    "request_id": ev.request_id,
-                    "video_id": ev.video_id,
-                    "filename": ev.filename,
-                    "filesize_bytes": ev.filesize_bytes,
-                    "duration_sec": ev.duration_sec,
-                    "content_type": ev.content_type,
-                    "model_name": ev.model_name,
-                    "model_device": ev.model_device,
-                    "language_detected": ev.language_detected,
-                    "latency_ms": ev.latency_ms,
-                    "transcribe_ms": ev.transcribe_ms,
-                    "ffmpeg_ms": ev.ffmpeg_ms,
-                    "success": ev.success,
-                    "error_code": ev.error_code,
-                    "error_message": ev.error_message,
-                },
-            )
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute(_INSERT_SQL, params)
+                upsert_rollups(cur, [params])
+                add_to_outbox(cur, "transcribe", [params])
+
+
+async def save_transcribe_event_async(ev: TranscribeEventIn) -> None:
+    """
+    То же, что save_transcribe_event, но через async-пул:
+    выполняется прямо в event loop, без потока из threadpool.
+    """
+    params = build_params(ev)
+    async with get_async_conn() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(_INSERT_SQL, params)
+                await upsert_rollups_async(cur, [params])
+                await add_to_outbox_async(cur, "transcribe", [params])
+
+
+async def save_transcribe_rows_async(rows: list[dict]) -> None:
+    """
+    Пачкой пишет уже подготовленные строки (см. build_params)
+    через COPY transcribe_events FROM STDIN — одна транзакция на пачку
+    (вместе с минутными агрегатами и уведомлениями в outbox).
+    """
+    if not rows:
+        return
+
+    async with get_async_conn() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                async with cur.copy(_COPY_SQL) as copy:
+                    for row in rows:
+                        await copy.write_row([row[col] for col in _COLUMNS])
+                await upsert_rollups_async(cur, rows)
+                await add_to_outbox_async(cur, "transcribe", rows)
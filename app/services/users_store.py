@@ -1,20 +1,55 @@
+from app.core.config import settings
+from app.services.cache import NOTIFY_INVALIDATION_SQL, register_cache
 from app.services.db.db import get_conn
 
+USERS_CACHE = "users"
+
+# пользователь по tg_id; сбрасывается при ensure_user_exists (во всех воркерах)
+users_cache = register_cache(USERS_CACHE, settings.users_cache_ttl_sec, settings.cache_max_items)
+
+
 def ensure_user_exists(tg_id, username, first_name, last_name, language):
+    """
+    Upsert пользователя; возвращает актуальную строку (без второго SELECT).
+    В том же запросе — NOTIFY, чтобы остальные воркеры сбросили кэш;
+    своё уведомление этот воркер пропускает (иначе оно сбросит put ниже).
+    """
     with get_conn() as conn, conn.cursor() as cur:
+        users_cache.expect_own_invalidation(tg_id, conn.info.backend_pid)
         cur.execute("""
-            INSERT INTO users (tg_id, username, first_name, last_name, language_code)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (tg_id) DO UPDATE SET
-                username = EXCLUDED.username,
-                first_name = EXCLUDED.first_name,
-                last_name = EXCLUDED.last_name,
-                language_code = EXCLUDED.language_code,
-                updated_at = now();
-        """, (tg_id, username, first_name, last_name, language))
+            WITH u AS (
+                INSERT INTO users (tg_id, username, first_name, last_name, language_code)
+                VALUES (%(tg_id)s, %(username)s, %(first_name)s, %(last_name)s, %(language)s)
+                ON CONFLICT (tg_id) DO UPDATE SET
+                    username = EXCLUDED.username,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    language_code = EXCLUDED.language_code,
+                    updated_at = now()
+                RETURNING *
+            )
+            SELECT u.*
+            FROM u, LATERAL (SELECT """ + NOTIFY_INVALIDATION_SQL.format(key="u.tg_id") + """) n;
+        """, {
+            "tg_id": tg_id,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "language": language,
+            "cache": USERS_CACHE,
+        })
+        row = cur.fetchone()
 
+    users_cache.invalidate(tg_id)
+    users_cache.put(tg_id, row)
+    return row
 
-def get_user_by_id(tg_id):
+
+def _load_user(tg_id):
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT * FROM users WHERE tg_id = %s", (tg_id,))
         return cur.fetchone()
+
+
+def get_user_by_id(tg_id):
+    return users_cache.get_or_load(tg_id, lambda: _load_user(tg_id))
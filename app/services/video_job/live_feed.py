@@ -0,0 +1,99 @@
+# app/services/video_job/live_feed.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Set
+
+from app.core.config import settings
+from app.services.db.listener import pg_listener
+from app.services.video_job.video_jobs_store import VIDEO_JOB_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    Очередь событий одного клиента. Ограничена по размеру:
+    медленный клиент теряет самые старые события, а не тормозит остальных
+    и не раздувает память процесса.
+    """
+
+    __slots__ = ("key", "queue", "dropped")
+
+    def __init__(self, key: tuple[str, str], max_queue: int) -> None:
+        self.key = key
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def push(self, event: dict) -> bool:
+        """False, если ради этого события пришлось выкинуть старое."""
+        dropped = self.queue.full()
+        if dropped:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+        return not dropped
+
+
+class LiveFeed:
+    """
+    In-memory fan-out событий видео-джоб подписчикам по job_id / user_id.
+    Источник — общий LISTEN (pg_listener), БД никто не опрашивает.
+    """
+
+    def __init__(self) -> None:
+        self._subs: Dict[tuple[str, str], Set[Subscriber]] = {}
+        self.delivered = 0
+        self.dropped = 0
+        self.bad_payloads = 0
+
+    def subscribe(self, kind: str, value: Any) -> Subscriber:
+        sub = Subscriber((kind, str(value)), settings.live_feed_queue_size)
+        self._subs.setdefault(sub.key, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        subs = self._subs.get(sub.key)
+        if not subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subs[sub.key]
+
+    def on_notify(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            self.bad_payloads += 1
+            logger.warning("live feed: bad payload %r", payload[:200])
+            return
+
+        keys = [("job", str(event.get("job_id")))]
+        if event.get("user_id") is not None:
+            keys.append(("user", str(event["user_id"])))
+
+        for key in keys:
+            for sub in self._subs.get(key, ()):
+                self.delivered += 1
+                if not sub.push(event):
+                    self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        subs = [s for group in self._subs.values() for s in group]
+        return {
+            "subscribers": len(subs),
+            "keys": len(self._subs),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "bad_payloads": self.bad_payloads,
+        }
+
+
+live_feed = LiveFeed()
+pg_listener.subscribe(VIDEO_JOB_EVENTS_CHANNEL, live_feed.on_notify)
+
+
+def get_live_feed_stats() -> Dict[str, Any]:
+    return {**live_feed.stats(), "listener": pg_listener.stats()}
@@ -0,0 +1,246 @@
+# app/services/video_job/live_message.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List
+from uuid import UUID, uuid4
+
+from app.core.config import settings
+from app.schemas.video_jobs import VideoJobEventIn
+from app.services.db.db import get_async_conn
+from app.services.telegram.client import bot_config
+from app.services.telegram.outbox import telegram_outbox
+from app.services.video_job.video_job_notifier import (
+    TERMINAL_STATUSES,
+    format_video_job_final,
+    format_video_job_timeline,
+)
+from app.services.video_job.video_jobs_store import get_video_job_timeline
+
+logger = logging.getLogger(__name__)
+
+# одну джобу правит один воркер: аренда строкой, а не advisory lock —
+# соединение не держим, пока ждём Telegram; упал воркер — аренда истечёт
+_LEASE_SQL = """
+    INSERT INTO video_job_message_leases AS l (job_id, token, locked_until)
+    VALUES (%(job_id)s, %(token)s, now() + make_interval(secs => %(lease_sec)s))
+    ON CONFLICT (job_id) DO UPDATE SET
+        token = EXCLUDED.token,
+        locked_until = EXCLUDED.locked_until
+    WHERE l.locked_until < now()
+    RETURNING job_id
+    """
+
+_RELEASE_SQL = "DELETE FROM video_job_message_leases WHERE job_id = %(job_id)s AND token = %(token)s"
+
+_GET_SQL = """
+    SELECT job_id, bot, chat_id, message_id, text_hash, final_status, edits,
+           extract(epoch FROM now() - edited_at) AS since_edit_sec
+    FROM video_job_messages
+    WHERE job_id = %(job_id)s
+    """
+
+_SAVE_SQL = """
+    INSERT INTO video_job_messages AS m (job_id, bot, chat_id, message_id, text_hash)
+    VALUES (%(job_id)s, %(bot)s, %(chat_id)s, %(message_id)s, %(text_hash)s)
+    ON CONFLICT (job_id) DO UPDATE SET
+        bot = EXCLUDED.bot,
+        chat_id = EXCLUDED.chat_id,
+        message_id = EXCLUDED.message_id,
+        text_hash = EXCLUDED.text_hash,
+        edits = CASE WHEN m.message_id = EXCLUDED.message_id THEN m.edits + 1 ELSE 0 END,
+        edited_at = now()
+    """
+
+_SET_FINAL_SQL = """
+    UPDATE video_job_messages SET final_status = %(final_status)s WHERE job_id = %(job_id)s
+    """
+
+# ответы Bot API, которые для правки означают «всё уже так»
+_NOT_MODIFIED = "message is not modified"
+# сообщение удалили из чата (или оно слишком старое для правки) — шлём новое
+_EDIT_GONE = ("message to edit not found", "message can't be edited")
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def _fetchone(sql: str, params: Dict[str, Any]) -> Dict[str, Any] | None:
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute(sql, params)
+        return await cur.fetchone()
+
+
+async def _execute(sql: str, params: Dict[str, Any]) -> None:
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute(sql, params)
+
+
+async def _call(bot: str, method: str, payload: Dict[str, Any], critical: bool) -> Dict[str, Any]:
+    future = telegram_outbox.submit_call(bot, method, payload, critical=critical)
+    if future is None:
+        return {"ok": False, "error": f"bot {bot} is not configured", "final": False}
+    return await asyncio.wrap_future(future)
+
+
+class LiveMessages:
+    """
+    Режим video_job_notify_mode=live: одно сообщение Telegram на джобу.
+    Строки outbox вида video_job группируются по job_id; текст строится
+    по таймлайну джобы из БД (а не по payload), так что несколько событий
+    сливаются в одну правку, а порядок доставки не важен.
+    - первое событие — sendMessage, message_id сохраняем в video_job_messages;
+    - дальше — editMessageText не чаще video_job_edit_debounce_sec:
+      раньше срока строки откладываются (defer_sec), попытка не тратится;
+    - финальный статус правит сразу и шлёт отдельное короткое уведомление
+      ответом на «живое» сообщение (раз на статус).
+    """
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.edited = 0
+        self.unchanged = 0
+        self.deferred = 0
+        self.finals = 0
+
+    async def deliver(self, rows: List[dict]) -> Dict[int, Dict[str, Any]]:
+        """Доставка строк video_job: результат по id строки (как у TelegramClient.call, + defer_sec)."""
+        by_job: Dict[str, List[dict]] = {}
+        for row in rows:
+            by_job.setdefault(str(row["payload"]["job_id"]), []).append(row)
+
+        # джобы — по очереди: в чат всё равно шлём по одному сообщению.
+        # Соединение берём из пула на каждый запрос, а не на всю пачку:
+        # вызовы Telegram ждут rate limit и могут идти минутами
+        out: Dict[int, Dict[str, Any]] = {}
+        for job_id, job_rows in by_job.items():
+            res = await self._deliver_job(job_id, job_rows)
+            for row in job_rows:
+                out[row["id"]] = res
+        return out
+
+    async def _deliver_job(self, job_id: str, rows: List[dict]) -> Dict[str, Any]:
+        try:
+            events = [VideoJobEventIn.model_validate(row["payload"]) for row in rows]
+        except Exception as e:
+            return {"ok": False, "error": f"render failed: {e}", "final": True}
+        params = {"job_id": job_id, "token": uuid4()}
+
+        leased = await _fetchone(_LEASE_SQL, {**params, "lease_sec": settings.notification_outbox_lease_sec})
+        if leased is None:
+            # джобу сейчас правит другой воркер — подойдём после него
+            self.deferred += 1
+            return {"ok": False, "defer_sec": settings.video_job_edit_debounce_sec}
+        try:
+            return await self._deliver_locked(job_id, rows, events)
+        finally:
+            await asyncio.shield(_execute(_RELEASE_SQL, params))
+
+    async def _deliver_locked(self, job_id: str, rows: List[dict], events: List[VideoJobEventIn]) -> Dict[str, Any]:
+        bot = rows[0]["bot"]
+        token, chat_id = bot_config(bot)
+        if token is None:
+            return {"ok": False, "error": f"bot {bot} is not configured", "final": False}
+        critical = any(row["critical"] for row in rows)
+        terminal = next((ev for ev in reversed(events) if ev.status in TERMINAL_STATUSES), None)
+
+        msg = await _fetchone(_GET_SQL, {"job_id": job_id})
+        if msg is not None and msg["chat_id"] != chat_id:
+            msg = None  # чат бота сменили — начинаем новое сообщение там
+
+        if msg is not None and terminal is None:
+            wait = settings.video_job_edit_debounce_sec - float(msg["since_edit_sec"])
+            if wait > 0:
+                self.deferred += 1
+                return {"ok": False, "defer_sec": round(wait, 3)}
+
+        timeline = await asyncio.to_thread(get_video_job_timeline, UUID(job_id))
+        if timeline is None:
+            return {"ok": False, "error": f"job {job_id} not found", "final": True}
+        text = format_video_job_timeline(timeline)
+        text_hash = _text_hash(text)
+
+        res: Dict[str, Any] | None = None
+        created = False
+        if msg is not None and msg["text_hash"] != text_hash:
+            res = await _call(bot, "editMessageText", {
+                "chat_id": chat_id,
+                "message_id": msg["message_id"],
+                "text": text,
+                "disable_web_page_preview": True,
+            }, critical)
+            error = (res.get("error") or "").lower()
+            if not res["ok"] and _NOT_MODIFIED in error:
+                res = {**res, "ok": True}
+            elif not res["ok"] and any(gone in error for gone in _EDIT_GONE):
+                msg = None
+            elif not res["ok"]:
+                return res
+            if res["ok"]:
+                self.edited += 1
+        elif msg is not None:
+            self.unchanged += 1
+
+        if msg is None:
+            res = await _call(bot, "sendMessage", {
+                "chat_id": chat_id,
+                "text": text,
+                "disable_web_page_preview": True,
+            }, critical)
+            if not res["ok"]:
+                return res
+            created = True
+            self.sent += 1
+            message_id = res["result"]["message_id"]
+        else:
+            message_id = msg["message_id"]
+
+        if res is not None:
+            await _execute(_SAVE_SQL, {
+                "job_id": job_id,
+                "bot": bot,
+                "chat_id": chat_id,
+                "message_id": message_id,
+                "text_hash": text_hash,
+            })
+
+        # новое сообщение само и есть уведомление; иначе — отдельный ответ, раз на статус
+        if terminal is not None and (created or msg["final_status"] != terminal.status.value):
+            if not created:
+                final_res = await _call(bot, "sendMessage", {
+                    "chat_id": chat_id,
+                    "text": format_video_job_final(terminal, timeline),
+                    "reply_to_message_id": message_id,
+                    "disable_web_page_preview": True,
+                }, critical)
+                if not final_res["ok"]:
+                    return final_res
+                self.finals += 1
+            await _execute(_SET_FINAL_SQL, {"job_id": job_id, "final_status": terminal.status.value})
+
+        return {"ok": True, "result": {"message_id": message_id}, "error": None}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.video_job_notify_mode,
+            "edit_debounce_sec": settings.video_job_edit_debounce_sec,
+            "sent": self.sent,
+            "edited": self.edited,
+            "unchanged": self.unchanged,
+            "deferred": self.deferred,
+            "finals": self.finals,
+        }
+
+
+live_messages = LiveMessages()
+
+
+def live_enabled() -> bool:
+    return settings.video_job_notify_mode == "live"
+
+
+def get_live_message_stats() -> Dict[str, Any]:
+    return live_messages.stats()
@@ -0,0 +1,221 @@
+# app/services/video_job/partitions.py
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import re
+from typing import Any, Dict
+
+from psycopg import sql
+
+from app.core.config import settings
+from app.services.db.db import get_async_conn
+
+logger = logging.getLogger(__name__)
+
+# суточные партиции video_job_events: video_job_events_pYYYYMMDD, границы — полночь UTC
+_PARENT = "video_job_events"
+# DEFAULT-партиция из миграции: туда попадают строки, для суток которых партиции ещё нет
+_DEFAULT = "video_job_events_default"
+_PARTITION_RE = re.compile(r"^video_job_events_p(\d{8})$")
+
+# чтобы несколько uvicorn-воркеров не делали одно и то же одновременно
+_ADVISORY_LOCK_KEY = 7_211_006_001
+
+_task: asyncio.Task | None = None
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "last_run_utc": None,
+    "created": [],
+    "dropped": [],
+    "skipped": [],
+    "last_error": None,
+}
+
+
+def partition_name(day: dt.date) -> str:
+    return f"{_PARENT}_p{day:%Y%m%d}"
+
+
+def _day_start(day: dt.date) -> dt.datetime:
+    return dt.datetime(day.year, day.month, day.day, tzinfo=dt.timezone.utc)
+
+
+async def _existing_partitions(cur) -> dict[str, dt.date]:
+    await cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        (_PARENT,),
+    )
+    result: dict[str, dt.date] = {}
+    for row in await cur.fetchall():
+        m = _PARTITION_RE.match(row["relname"])
+        if m:
+            result[row["relname"]] = dt.datetime.strptime(m.group(1), "%Y%m%d").date()
+    return result
+
+
+async def _create_partition(cur, name: str, day: dt.date) -> int:
+    """
+    Создаёт партицию суток; возвращает, сколько строк перенесено из DEFAULT.
+    CREATE ... PARTITION OF падает, если в DEFAULT уже есть строки этих суток, —
+    тогда создаём отдельную таблицу, переносим в неё строки и ATTACH.
+    """
+    bounds = {"start": _day_start(day), "end": _day_start(day + dt.timedelta(days=1))}
+    # DDL не принимает bind-параметры — собираем через psycopg.sql
+    values = sql.SQL("FOR VALUES FROM ({}) TO ({})").format(
+        sql.Literal(bounds["start"]), sql.Literal(bounds["end"])
+    )
+    await cur.execute(
+        sql.SQL(
+            "SELECT EXISTS (SELECT 1 FROM {} WHERE created_at_utc >= %(start)s AND created_at_utc < %(end)s) AS stray"
+        ).format(sql.Identifier(_DEFAULT)),
+        bounds,
+    )
+    if not (await cur.fetchone())["stray"]:
+        await cur.execute(
+            sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} {}").format(
+                sql.Identifier(name), sql.Identifier(_PARENT), values
+            )
+        )
+        return 0
+
+    # индексы и FK родителя ATTACH добавит сам
+    await cur.execute(
+        sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(
+            sql.Identifier(name), sql.Identifier(_PARENT)
+        )
+    )
+    await cur.execute(
+        sql.SQL(
+            "WITH moved AS ("
+            " DELETE FROM {} WHERE created_at_utc >= %(start)s AND created_at_utc < %(end)s RETURNING *"
+            ") INSERT INTO {} SELECT * FROM moved"
+        ).format(sql.Identifier(_DEFAULT), sql.Identifier(name)),
+        bounds,
+    )
+    moved = cur.rowcount
+    await cur.execute(
+        sql.SQL("ALTER TABLE {} ATTACH PARTITION {} {}").format(
+            sql.Identifier(_PARENT), sql.Identifier(name), values
+        )
+    )
+    return moved
+
+
+async def maintain_partitions(
+    days_ahead: int | None = None,
+    retention_days: int | None = None,
+) -> Dict[str, list[str]]:
+    """
+    Один проход обслуживания:
+    - создаёт суточные партиции на сегодня и days_ahead суток вперёд
+      (строки этих суток из DEFAULT-партиции переносит в новую; не вышло —
+      сутки пропускаются с ошибкой в логе, остальной проход не откатывается);
+    - если retention_days > 0 — отцепляет и удаляет партиции целиком,
+      когда их сутки закончились раньше, чем retention_days назад (без DELETE).
+    Возвращает имена созданных, удалённых и пропущенных партиций.
+    """
+    if days_ahead is None:
+        days_ahead = settings.video_job_events_partition_days_ahead
+    if retention_days is None:
+        retention_days = settings.video_job_events_retention_days
+
+    today = dt.datetime.now(dt.timezone.utc).date()
+    created: list[str] = []
+    dropped: list[str] = []
+    skipped: list[str] = []
+
+    async with get_async_conn() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (_ADVISORY_LOCK_KEY,))
+                if not (await cur.fetchone())["locked"]:
+                    # другой воркер уже обслуживает партиции
+                    return {"created": created, "dropped": dropped, "skipped": skipped}
+
+                existing = await _existing_partitions(cur)
+
+                for offset in range(days_ahead + 1):
+                    day = today + dt.timedelta(days=offset)
+                    name = partition_name(day)
+                    if name in existing:
+                        continue
+                    try:
+                        # savepoint: неудача с одними сутками не откатывает остальные
+                        async with conn.transaction():
+                            moved = await _create_partition(cur, name, day)
+                    except Exception:
+                        logger.exception("video_job_events: cannot create partition %s, skipped", name)
+                        skipped.append(name)
+                        continue
+                    if moved:
+                        logger.warning("video_job_events: moved %d rows from %s to %s", moved, _DEFAULT, name)
+                    created.append(name)
+
+                if retention_days > 0:
+                    cutoff = today - dt.timedelta(days=retention_days)
+                    for name, day in sorted(existing.items(), key=lambda kv: kv[1]):
+                        # партиция целиком старше окна хранения
+                        if day + dt.timedelta(days=1) <= cutoff:
+                            await cur.execute(
+                                sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                                    sql.Identifier(_PARENT), sql.Identifier(name)
+                                )
+                            )
+                            await cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                            dropped.append(name)
+
+    if created:
+        logger.info("video_job_events: created partitions %s", created)
+    if dropped:
+        logger.info("video_job_events: dropped partitions %s", dropped)
+    return {"created": created, "dropped": dropped, "skipped": skipped}
+
+
+async def _run() -> None:
+    while True:
+        try:
+            result = await maintain_partitions()
+            _stats["runs"] += 1
+            _stats["last_run_utc"] = dt.datetime.now(dt.timezone.utc).isoformat()
+            _stats["created"] = result["created"]
+            _stats["dropped"] = result["dropped"]
+            _stats["skipped"] = result["skipped"]
+            _stats["last_error"] = None
+        except Exception as e:
+            _stats["last_error"] = str(e)
+            logger.exception("video_job_events: partition maintenance failed")
+
+        await asyncio.sleep(settings.video_job_events_partition_check_interval_sec)
+
+
+async def start_partition_maintainer() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run(), name="video-job-events-partitions")
+
+
+async def stop_partition_maintainer() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def get_partition_stats() -> Dict[str, Any]:
+    return {
+        "days_ahead": settings.video_job_events_partition_days_ahead,
+        "retention_days": settings.video_job_events_retention_days,
+        **_stats,
+    }
@@ -3,24 +3,38 @@ from __future__ import annotations
 from typing import Any
 import textwrap
 
-import requests
-
 from app.core.config import settings
+from app.services.telegram.outbox import queue_message
 from app.schemas.video_jobs import VideoJobEventIn, VideoJobStatus
 
 
-def _format_video_job_message(ev: VideoJobEventIn) -> str:
-    # эмодзи по статусу
-    if ev.status == VideoJobStatus.DONE:
-        emoji = "✅"
-    elif ev.status == VideoJobStatus.FAIL:
-        emoji = "❌"
-    elif ev.status == VideoJobStatus.TIMEOUT:
-        emoji = "⏰"
-    elif ev.status == VideoJobStatus.IN_PROGRESS:
-        emoji = "🔄"
-    else:
-        emoji = "🟡"  # STARTED / неизвестное
+# эмодзи по статусу (STARTED / неизвестное — 🟡)
+_STATUS_EMOJI = {
+    VideoJobStatus.DONE: "✅",
+    VideoJobStatus.FAIL: "❌",
+    VideoJobStatus.TIMEOUT: "⏰",
+    VideoJobStatus.IN_PROGRESS: "🔄",
+}
+
+# финальные статусы: только на них в режиме live уходит отдельное уведомление
+TERMINAL_STATUSES = (VideoJobStatus.DONE, VideoJobStatus.FAIL, VideoJobStatus.TIMEOUT)
+
+
+def status_emoji(status: Any) -> str:
+    try:
+        return _STATUS_EMOJI.get(VideoJobStatus(status), "🟡")
+    except ValueError:
+        return "🟡"
+
+
+def _fmt_ms(ms: int | None) -> str:
+    if ms is None:
+        return "-"
+    return f"{ms} ms" if ms < 10_000 else f"{ms / 1000:.1f} s"
+
+
+def format_video_job_message(ev: VideoJobEventIn) -> str:
+    emoji = status_emoji(ev.status)
 
     job_id = str(ev.job_id)
     step = ev.step_code
@@ -74,6 +88,53 @@ def _format_video_job_message(ev: VideoJobEventIn) -> str:
     return textwrap.dedent(text).strip()
 
 
+def format_video_job_timeline(timeline: dict) -> str:
+    """
+    Текст «живого» сообщения джобы: шапка + таймлайн шагов
+    (статус, смещение от начала джобы, длительность шага).
+    timeline — как из get_video_job_timeline().
+    """
+    job = timeline["job"]
+    steps = timeline["steps"]
+    status = VideoJobStatus(job["status"])
+
+    lines = [
+        f"{status_emoji(status)} VIDEO JOB [{settings.env_name}]",
+        f"🆔 Job:    {job['job_id']}",
+        f"📌 Status: {status.value}",
+        f"🖥 GPU host: {job['gpu_host'] or '-'}",
+        f"🤖 Model:    {job['model_name'] or '-'}",
+    ]
+    if job["duration_total_ms"] is not None:
+        lines.append(f"⏱ Total:    {_fmt_ms(job['duration_total_ms'])}")
+    if job["error_code"]:
+        lines.append(f"🧯 Error:    {job['error_code']}")
+
+    lines.append("")
+    lines.append(f"🧩 Steps ({len(steps)}):")
+    max_steps = settings.video_job_message_max_steps
+    if len(steps) > max_steps:
+        lines.append(f"… {len(steps) - max_steps} earlier")
+        steps = steps[-max_steps:]
+    for step in steps:
+        lines.append(
+            f"{status_emoji(step['status'])} {step['step_code']} "
+            f"+{step['since_start_ms'] / 1000:.1f}s · {_fmt_ms(step['step_duration_ms'])}"
+        )
+    return "\n".join(lines)
+
+
+def format_video_job_final(ev: VideoJobEventIn, timeline: dict) -> str:
+    """Короткое отдельное уведомление о финальном статусе (ответом на «живое» сообщение)."""
+    job = timeline["job"]
+    text = f"{status_emoji(ev.status)} Job {ev.job_id}: {ev.status.value} ({ev.step_code})"
+    if job["duration_total_ms"] is not None:
+        text += f" · {_fmt_ms(job['duration_total_ms'])}"
+    if ev.status != VideoJobStatus.DONE and ev.message:
+        text += f"\n{ev.message[:1000]}"
+    return text
+
+
 def send_video_job_notification(ev: VideoJobEventIn) -> None:
     """
     Шлём уведомление в телеграм по видео-джобе.
@@ -85,32 +146,13 @@ def send_video_job_notification(ev: VideoJobEventIn) -> None:
     if not settings.transcribe_telegram_enabled:
         return
 
-    # только финальные статусы
-    # if ev.status not in (
-    #     VideoJobStatus.DONE,
-    #     VideoJobStatus.FAIL,
-    #     VideoJobStatus.TIMEOUT,
-    # ):
-    #     return
-
-    token = settings.transcribe_telegram_bot_token
-    chat_id = settings.transcribe_telegram_chat_id
-
-    if not token or not chat_id:
+    # без outbox «живое» сообщение править негде (message_id хранится в БД
+    # и правится диспетчером) — в режиме live шлём только финальные статусы
+    if settings.video_job_notify_mode == "live" and ev.status not in TERMINAL_STATUSES:
         return
 
-    text = _format_video_job_message(ev)
+    text = format_video_job_message(ev)
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload: dict[str, Any] = {
-        "chat_id": chat_id,
-        "text": text,
-        # parse_mode не ставим, чтобы не ловить ошибки форматирования
-    }
-
-    try:
-        resp = requests.post(url, json=payload, timeout=5)
-        if resp.status_code != 200:
-            print(f"[video-job-telegram] send failed: {resp.status_code} {resp.text}")
-    except Exception as e:
-        print(f"[video-job-telegram] exception while sending: {e}")
+    # parse_mode не ставим, чтобы не ловить ошибки форматирования
+    critical = ev.status in (VideoJobStatus.FAIL, VideoJobStatus.TIMEOUT)
+    queue_message("transcribe", text, critical=critical)
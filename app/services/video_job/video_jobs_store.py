@@ -1,19 +1,175 @@
 from __future__ import annotations
 
+import base64
 import datetime as dt
 import json
+from typing import Any
+from uuid import UUID
 
 from app.core.config import settings
 from app.schemas.video_jobs import VideoJobEventIn
-from app.services.db.db import get_conn
+from app.services.db.db import get_async_conn, get_conn
+from app.services.notifier.notification_outbox import OUTBOX_CTE_SQL, add_to_outbox_async, outbox_params
 
 
-def save_video_job_event(ev: VideoJobEventIn) -> None:
+# upsert строки video_jobs: одна запись на событие вместо INSERT + двух UPDATE.
+# Семантика та же, что была у трёх запросов:
+# - status всегда берём из последнего события;
+# - gpu/модель/started/finished — первое непустое значение (COALESCE со старым);
+# - duration_total_ms считаем один раз, когда известны и started, и finished.
+_UPSERT_JOB_SQL = """
+    INSERT INTO video_jobs AS j (
+        job_id,
+        created_at_utc,
+        env,
+        status,
+        gpu_host,
+        gpu_service_version,
+        model_name,
+        model_version,
+        started_at_utc,
+        finished_at_utc,
+        duration_total_ms
+    )
+    VALUES (
+        %(job_id)s,
+        %(now_utc)s,
+        %(env)s,
+        %(status)s::video_job_status,
+        %(gpu_host)s,
+        %(gpu_service_version)s,
+        %(model_name)s,
+        %(model_version)s,
+        %(started_at_utc)s::timestamptz,
+        %(finished_at_utc)s::timestamptz,
+        (EXTRACT(EPOCH FROM (
+            %(finished_at_utc)s::timestamptz - %(started_at_utc)s::timestamptz
+        )) * 1000)::int
+    )
+    ON CONFLICT (job_id) DO UPDATE SET
+        status              = EXCLUDED.status,
+        gpu_host            = COALESCE(j.gpu_host, EXCLUDED.gpu_host),
+        gpu_service_version = COALESCE(j.gpu_service_version, EXCLUDED.gpu_service_version),
+        model_name          = COALESCE(j.model_name, EXCLUDED.model_name),
+        model_version       = COALESCE(j.model_version, EXCLUDED.model_version),
+        started_at_utc      = COALESCE(j.started_at_utc, EXCLUDED.started_at_utc),
+        finished_at_utc     = COALESCE(j.finished_at_utc, EXCLUDED.finished_at_utc),
+        duration_total_ms   = COALESCE(
+            j.duration_total_ms,
+            (EXTRACT(EPOCH FROM (
+                COALESCE(j.finished_at_utc, EXCLUDED.finished_at_utc)
+                - COALESCE(j.started_at_utc, EXCLUDED.started_at_utc)
+            )) * 1000)::int
+        )
     """
-    Сохраняет событие видео-джобы:
-    - создаёт запись в video_jobs, если её ещё нет
-    - слегка обновляет общую инфу по job (статус, gpu, модель, тайминги)
-    - пишет сырое событие в video_job_events
+
+# канал NOTIFY для live-подписчиков (см. live_feed.py)
+VIDEO_JOB_EVENTS_CHANNEL = "video_job_events"
+
+# payload NOTIFY у Postgres < 8000 байт, иначе падает весь запрос вместе с INSERT события;
+# запас — под id/user_id, которые добавляет SQL
+_NOTIFY_PAYLOAD_MAX_BYTES = 7500
+
+# одно событие = один запрос: upsert job + INSERT события + строка notification_outbox
+# + NOTIFY в одном CTE.
+# NOTIFY уходит только на COMMIT — подписчики не увидят несохранённое событие.
+_SAVE_EVENT_SQL = """
+    WITH job AS (
+    """ + _UPSERT_JOB_SQL + """
+        RETURNING j.job_id, j.user_id
+    ),
+    ev AS (
+    INSERT INTO video_job_events (
+        job_id,
+        created_at_utc,
+        env,
+        origin,
+        step_code,
+        status,
+        step_started_at_utc,
+        step_finished_at_utc,
+        step_duration_ms,
+        message,
+        data
+    )
+    VALUES (
+        (SELECT job_id FROM job),
+        %(now_utc)s,
+        %(env)s,
+        %(origin)s,
+        %(step_code)s,
+        %(status)s::video_job_status,
+        %(started_at_utc)s,
+        %(finished_at_utc)s,
+        %(step_duration_ms)s,
+        %(message)s,
+        %(data)s::jsonb
+    )
+    RETURNING id
+    ),
+    ob AS (
+    """ + OUTBOX_CTE_SQL + """
+    )
+    SELECT pg_notify(
+        '""" + VIDEO_JOB_EVENTS_CHANNEL + """',
+        (%(notify)s::jsonb || jsonb_build_object('id', ev.id, 'user_id', job.user_id))::text
+    )
+    FROM ev, job;
+    """
+
+# id событий пачки — заранее из sequence: COPY ничего не возвращает,
+# а подписчикам (SSE id:) нужен id, как и для одиночного события
+_NEXT_EVENT_IDS_SQL = "SELECT nextval('video_job_events_id_seq') AS id FROM generate_series(1, %s)"
+
+# NOTIFY для пачки (события ушли через COPY): user_id подтягиваем из video_jobs
+_NOTIFY_BATCH_SQL = """
+    SELECT pg_notify(
+        '""" + VIDEO_JOB_EVENTS_CHANNEL + """',
+        (p.payload::jsonb || jsonb_build_object('id', p.id, 'user_id', j.user_id))::text
+    )
+    FROM unnest(%s::text[], %s::bigint[]) WITH ORDINALITY AS p(payload, id, n)
+    LEFT JOIN video_jobs j ON j.job_id = (p.payload::jsonb ->> 'job_id')::uuid
+    ORDER BY p.n
+    """
+
+
+# колонки video_job_events для COPY и ключи build_params, из которых они берутся
+_EVENT_COPY_COLUMNS = (
+    ("id", "id"),
+    ("job_id", "job_id"),
+    ("created_at_utc", "now_utc"),
+    ("env", "env"),
+    ("origin", "origin"),
+    ("step_code", "step_code"),
+    ("status", "status"),
+    ("step_started_at_utc", "started_at_utc"),
+    ("step_finished_at_utc", "finished_at_utc"),
+    ("step_duration_ms", "step_duration_ms"),
+    ("message", "message"),
+    ("data", "data"),
+)
+
+_COPY_EVENTS_SQL = (
+    "COPY video_job_events ("
+    + ", ".join(col for col, _ in _EVENT_COPY_COLUMNS)
+    + ") FROM STDIN"
+)
+
+# поля job, где побеждает первое непустое значение (как COALESCE в upsert)
+_JOB_COALESCE_FIELDS = (
+    "gpu_host",
+    "gpu_service_version",
+    "model_name",
+    "model_version",
+    "started_at_utc",
+    "finished_at_utc",
+)
+
+
+def build_params(ev: VideoJobEventIn) -> dict:
+    """
+    Параметры для _SAVE_EVENT_SQL / _UPSERT_JOB_SQL по одному событию —
+    общие для sync- и async-пути.
     """
     now_utc = dt.datetime.now(dt.timezone.utc)
 
@@ -23,101 +179,282 @@ def save_video_job_event(ev: VideoJobEventIn) -> None:
         delta = ev.step_finished_at_utc - ev.step_started_at_utc
         step_duration_ms = int(delta.total_seconds() * 1000)
 
+    params = {
+        "job_id": ev.job_id,
+        "now_utc": now_utc,
+        "env": settings.env_name,
+        "status": ev.status.value,
+
+        "gpu_host": ev.gpu_host,
+        "gpu_service_version": ev.gpu_service_version,
+        "model_name": ev.model_name,
+        "model_version": ev.model_version,
+
+        "started_at_utc": ev.step_started_at_utc,
+        "finished_at_utc": ev.step_finished_at_utc,
+        "step_duration_ms": step_duration_ms,
+
+        "origin": ev.origin,
+        "step_code": ev.step_code,
+        "message": ev.message,
+        "data": json.dumps(ev.data or {}),
+    }
+    params["notify"] = _notify_payload(params)
+    params.update(outbox_params("video_job", ev))
+    return params
+
+
+def _notify_payload(params: dict) -> str:
+    """
+    Payload NOTIFY без id/user_id — их добавляет SQL.
+    Размер считаем в байтах UTF-8 (так его считает Postgres): не влезает —
+    урезаем message, в крайнем случае убираем его совсем.
+    """
+    payload = {
+        "job_id": str(params["job_id"]),
+        "created_at_utc": params["now_utc"].isoformat(),
+        "env": params["env"],
+        "origin": params["origin"],
+        "step_code": params["step_code"],
+        "status": params["status"],
+        "step_started_at_utc": _iso(params["started_at_utc"]),
+        "step_finished_at_utc": _iso(params["finished_at_utc"]),
+        "step_duration_ms": params["step_duration_ms"],
+        "message": params["message"],
+    }
+    while True:
+        # jsonb отдаёт текст без \u-экранирования и с пробелами — как json.dumps по умолчанию
+        size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        message = payload["message"]
+        if size <= _NOTIFY_PAYLOAD_MAX_BYTES or message is None:
+            return json.dumps(payload)
+        raw = message.encode("utf-8")
+        keep = len(raw) - (size - _NOTIFY_PAYLOAD_MAX_BYTES)
+        payload["message"] = raw[:keep].decode("utf-8", "ignore") if keep > 0 else None
+
+
+def _iso(ts: dt.datetime | None) -> str | None:
+    return ts.isoformat() if ts is not None else None
+
+
+def save_video_job_event(ev: VideoJobEventIn) -> None:
+    """
+    Сохраняет событие видео-джобы одним запросом (один round trip):
+    - создаёт запись в video_jobs, если её ещё нет,
+      иначе слегка обновляет общую инфу по job (статус, gpu, модель, тайминги)
+    - пишет сырое событие в video_job_events
+    - пишет уведомление в notification_outbox
+    - шлёт NOTIFY live-подписчикам (см. live_feed.py)
+    """
     with get_conn() as conn, conn.cursor() as cur:
-        # 1) гарантируем, что job существует
-        cur.execute(
-            """
-            INSERT INTO video_jobs (job_id, created_at_utc, env, status)
-            VALUES (%s, %s, %s, %s::video_job_status)
-            ON CONFLICT (job_id) DO NOTHING;
-            """,
-            (ev.job_id, now_utc, settings.env_name, ev.status.value),
-        )
+        cur.execute(_SAVE_EVENT_SQL, build_params(ev))
+
+
+async def save_video_job_event_async(ev: VideoJobEventIn) -> None:
+    """
+    То же, что save_video_job_event, но через async-пул — прямо в event loop.
+    """
+    async with get_async_conn() as conn, conn.cursor() as cur:
+        await cur.execute(_SAVE_EVENT_SQL, build_params(ev))
+
+
+def merge_job_params(events_params: list[dict]) -> list[dict]:
+    """
+    Схлопывает события пачки в одно итоговое состояние на job_id —
+    ровно то, что дал бы последовательный upsert каждого события:
+    status — из последнего события, остальное — первое непустое.
+    Порядок — по job_id, чтобы параллельные пачки не ловили deadlock.
+    """
+    merged: dict = {}
+    for params in events_params:
+        job = merged.get(params["job_id"])
+        if job is None:
+            merged[params["job_id"]] = dict(params)
+            continue
+        job["status"] = params["status"]
+        for field in _JOB_COALESCE_FIELDS:
+            if job[field] is None:
+                job[field] = params[field]
+
+    return [merged[job_id] for job_id in sorted(merged, key=str)]
+
+
+async def save_video_job_events_batch_async(events: list[VideoJobEventIn]) -> int:
+    """
+    Пачка событий одной транзакцией:
+    - один upsert на job (с итоговым состоянием по всей пачке),
+      отправленный через executemany (pipeline — без round trip на строку)
+    - все события — одним COPY в video_job_events (id — заранее из sequence)
+    - NOTIFY live-подписчикам (с id, как у одиночного события) — одним запросом на всю пачку
+    - уведомления — одной вставкой в notification_outbox
+    Возвращает количество затронутых job.
+    """
+    if not events:
+        return 0
+
+    events_params = [build_params(ev) for ev in events]
+    jobs_params = merge_job_params(events_params)
+
+    async with get_async_conn() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.executemany(_UPSERT_JOB_SQL, jobs_params)
+                await cur.execute(_NEXT_EVENT_IDS_SQL, (len(events_params),))
+                for params, row in zip(events_params, await cur.fetchall()):
+                    params["id"] = row["id"]
+                async with cur.copy(_COPY_EVENTS_SQL) as copy:
+                    for params in events_params:
+                        await copy.write_row([params[key] for _, key in _EVENT_COPY_COLUMNS])
+                await cur.execute(_NOTIFY_BATCH_SQL, (
+                    [p["notify"] for p in events_params],
+                    [p["id"] for p in events_params],
+                ))
+                await add_to_outbox_async(cur, "video_job", events_params)
+
+    return len(jobs_params)
+
+
+# --- чтение: список джоб (keyset) и таймлайн ---
+
+_JOB_LIST_COLUMNS = """
+    job_id,
+    created_at_utc,
+    env,
+    status,
+    user_id,
+    gpu_host,
+    model_name,
+    started_at_utc,
+    finished_at_utc,
+    duration_total_ms,
+    error_code
+    """
+
+# фильтры списка: параметр -> колонка
+_JOB_FILTERS = ("status", "env", "gpu_host", "model_name", "user_id")
+
+
+def encode_cursor(created_at_utc: dt.datetime, job_id: UUID) -> str:
+    raw = json.dumps([created_at_utc.isoformat(), str(job_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, UUID]:
+    """ValueError, если курсор битый."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, job_id = json.loads(raw)
+        return dt.datetime.fromisoformat(created_at), UUID(job_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def list_video_jobs(
+    limit: int = 50,
+    cursor: str | None = None,
+    **filters: Any,
+) -> tuple[list[dict], str | None]:
+    """
+    Страница джоб, новые сверху. Keyset по (created_at_utc, job_id):
+    без OFFSET, каждая страница — проход по индексу с места курсора.
+    Возвращает (строки, курсор следующей страницы или None).
+    """
+    clauses: list[str] = []
+    params: dict[str, Any] = {"limit": limit + 1}
+
+    for field in _JOB_FILTERS:
+        value = filters.get(field)
+        if value is None:
+            continue
+        cast = "::video_job_status" if field == "status" else ""
+        clauses.append(f"{field} = %({field})s{cast}")
+        params[field] = value
+
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = decode_cursor(cursor)
+        clauses.append("(created_at_utc, job_id) < (%(cursor_ts)s, %(cursor_id)s)")
 
-        # 2) слегка обновляем общую инфу по job
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            UPDATE video_jobs
-            SET
-                status              = %s::video_job_status,
-                gpu_host            = COALESCE(gpu_host, %s),
-                gpu_service_version = COALESCE(gpu_service_version, %s),
-                model_name          = COALESCE(model_name, %s),
-                model_version       = COALESCE(model_version, %s),
-                started_at_utc      = COALESCE(started_at_utc, %s),
-                finished_at_utc     = COALESCE(finished_at_utc, %s)
-            WHERE job_id = %s;
+            f"""
+            SELECT {_JOB_LIST_COLUMNS}
+            FROM video_jobs
+            {where}
+            ORDER BY created_at_utc DESC, job_id DESC
+            LIMIT %(limit)s
             """,
-            (
-                ev.status.value,
-                ev.gpu_host,
-                ev.gpu_service_version,
-                ev.model_name,
-                ev.model_version,
-                ev.step_started_at_utc,
-                ev.step_finished_at_utc,
-                ev.job_id,
-            ),
+            params,
         )
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at_utc"], last["job_id"])
+    return rows, next_cursor
+
+
+def get_video_job_timeline(job_id: UUID, with_messages: bool = False) -> dict | None:
+    """
+    Джоба + её события по порядку с длительностями шагов.
+    Без message запрос к video_job_events покрывается
+    idx_video_job_events_timeline (index-only scan).
+    """
+    message_col = ", message" if with_messages else ""
 
-        # 3) если можно, считаем общую длительность job
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            UPDATE video_jobs
-            SET duration_total_ms =
-                CASE
-                    WHEN started_at_utc IS NOT NULL
-                         AND finished_at_utc IS NOT NULL
-                         AND duration_total_ms IS NULL
-                    THEN (EXTRACT(EPOCH FROM (finished_at_utc - started_at_utc)) * 1000)::int
-                    ELSE duration_total_ms
-                END
-            WHERE job_id = %s;
-            """,
-            (ev.job_id,),
+            f"SELECT {_JOB_LIST_COLUMNS} FROM video_jobs WHERE job_id = %s",
+            (job_id,),
         )
+        job = cur.fetchone()
+        if job is None:
+            return None
 
-        # 4) пишем само событие
         cur.execute(
-            """
-            INSERT INTO video_job_events (
-                job_id,
+            f"""
+            SELECT
+                id,
                 created_at_utc,
-                env,
-                origin,
                 step_code,
                 status,
+                origin,
                 step_started_at_utc,
                 step_finished_at_utc,
-                step_duration_ms,
-                message,
-                data
-            )
-            VALUES (
-                %s,
-                %s,
-                %s,
-                %s,
-                %s,
-                %s::video_job_status,
-                %s,
-                %s,
-                %s,
-                %s,
-                %s::jsonb
-            );
+                step_duration_ms
+                {message_col}
+            FROM video_job_events
+            WHERE job_id = %s
+            ORDER BY created_at_utc, id
             """,
-            (
-                ev.job_id,
-                now_utc,
-                settings.env_name,
-                ev.origin,
-                ev.step_code,
-                ev.status.value,
-                ev.step_started_at_utc,
-                ev.step_finished_at_utc,
-                step_duration_ms,
-                ev.message,
-                json.dumps(ev.data or {}),
-            ),
+            (job_id,),
         )
+        events = cur.fetchall()
+
+    steps = []
+    first_at: dt.datetime | None = None
+    prev_at: dt.datetime | None = None
+    for ev in events:
+        created_at = ev["created_at_utc"]
+        if first_at is None:
+            first_at = created_at
+
+        duration_ms = ev["step_duration_ms"]
+        if duration_ms is None and ev["step_started_at_utc"] and ev["step_finished_at_utc"]:
+            delta = ev["step_finished_at_utc"] - ev["step_started_at_utc"]
+            duration_ms = int(delta.total_seconds() * 1000)
+
+        steps.append({
+            **ev,
+            "step_duration_ms": duration_ms,
+            "since_start_ms": int((created_at - first_at).total_seconds() * 1000),
+            "since_prev_ms": (
+                int((created_at - prev_at).total_seconds() * 1000) if prev_at else None
+            ),
+        })
+        prev_at = created_at
+
+    return {"job": job, "steps": steps}
@@ -0,0 +1,51 @@
+"""create deploy_queue
+
+Revision ID: 5e8d2f0c7a41
+Revises: c41e7a2b9d10
+Create Date: 2026-10-18 05:00:00.000000
+
+Очередь деплоев: одна строка на цель (home_pc, ...).
+- pending_* — следующий деплой; новые пуши перезаписывают его
+  (деплоим самый свежий коммит), pending_pushes — сколько пушей схлопнуто;
+- running_* — деплой, который идёт сейчас;
+- last_* — результат последнего завершённого.
+Кто деплоит — решает advisory lock на цель (см. app/services/deploy_queue.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8d2f0c7a41'
+down_revision: Union[str, Sequence[str], None] = 'c41e7a2b9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE deploy_queue (
+            target              text PRIMARY KEY,
+
+            pending_payload     jsonb,
+            pending_commit      text,
+            pending_since       timestamptz,
+            pending_pushes      int         NOT NULL DEFAULT 0,
+
+            running_deploy_id   uuid,
+            running_commit      text,
+            running_started_at  timestamptz,
+
+            last_deploy_id      uuid,
+            last_commit         text,
+            last_result         text,
+            last_finished_at    timestamptz,
+
+            updated_at          timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS deploy_queue;")
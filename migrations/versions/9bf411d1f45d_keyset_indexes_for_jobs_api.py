@@ -0,0 +1,61 @@
+"""keyset indexes for jobs api
+
+Revision ID: 9bf411d1f45d
+Revises: a9e3e3351c99
+Create Date: 2026-10-18 03:30:00.000000
+
+Индексы под /jobs и /jobs/{job_id}/timeline:
+- video_jobs: keyset по (created_at_utc, job_id), общий и по user_id.
+  Только неизменяемые колонки — upsert события остаётся HOT-update,
+  поэтому status/gpu_host/model_name сюда не входят;
+- video_job_events: (job_id, created_at_utc, id) + INCLUDE полей таймлайна —
+  таблица append-only, так что таймлайн читается index-only scan.
+Старые индексы покрываются новыми по префиксу и удаляются.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9bf411d1f45d'
+down_revision: Union[str, Sequence[str], None] = 'a9e3e3351c99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX idx_video_jobs_created_job
+            ON video_jobs (created_at_utc DESC, job_id DESC);
+    """)
+    op.execute("""
+        CREATE INDEX idx_video_jobs_user_created_job
+            ON video_jobs (user_id, created_at_utc DESC, job_id DESC);
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_video_jobs_created_at;")
+    op.execute("DROP INDEX IF EXISTS idx_video_jobs_user_id;")
+
+    op.execute("""
+        CREATE INDEX idx_video_job_events_timeline
+            ON video_job_events (job_id, created_at_utc, id)
+            INCLUDE (
+                step_code,
+                status,
+                origin,
+                step_started_at_utc,
+                step_finished_at_utc,
+                step_duration_ms
+            );
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_video_job_events_job_id_created;")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX idx_video_job_events_job_id_created ON video_job_events(job_id, created_at_utc);")
+    op.execute("DROP INDEX IF EXISTS idx_video_job_events_timeline;")
+
+    op.execute("CREATE INDEX idx_video_jobs_user_id ON video_jobs(user_id);")
+    op.execute("CREATE INDEX idx_video_jobs_created_at ON video_jobs(created_at_utc);")
+    op.execute("DROP INDEX IF EXISTS idx_video_jobs_user_created_job;")
+    op.execute("DROP INDEX IF EXISTS idx_video_jobs_created_job;")
@@ -0,0 +1,35 @@
+"""create video_job_message_leases
+
+Revision ID: a7c3e91d5b24
+Revises: e5b0c93f7d18
+Create Date: 2026-10-18 12:00:00.000000
+
+Аренда «живого» сообщения джобы: одну джобу в Telegram правит один воркер.
+Вместо сессионного advisory lock — строка с locked_until: соединение
+не держится, пока ждём Telegram, а упавший воркер отпускает джобу сам
+по истечении аренды. token — чтобы снять только свою аренду.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e91d5b24'
+down_revision: Union[str, Sequence[str], None] = 'e5b0c93f7d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE video_job_message_leases (
+            job_id          uuid        PRIMARY KEY,
+            token           uuid        NOT NULL,
+            locked_until    timestamptz NOT NULL
+        );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS video_job_message_leases;")
@@ -0,0 +1,70 @@
+"""extend transcribe rollup for stats api
+
+Revision ID: a9e3e3351c99
+Revises: f3c2f4ec3d5e
+Create Date: 2026-10-18 02:50:00.000000
+
+Под /stats/transcribe:
+- в ключ минутного бакета добавляются language_detected и client;
+- RTF (transcribe_ms / duration_sec) хранится как метрика в тысячных
+  (rtf_*: count/sum/min/max/sketch) + суммарная длительность аудио.
+
+У уже накопленных бакетов language_detected/client будут NULL —
+для точной разбивки истории: python -m scripts.rebuild_transcribe_rollups.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e3e3351c99'
+down_revision: Union[str, Sequence[str], None] = 'f3c2f4ec3d5e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        ALTER TABLE transcribe_rollup_minutely
+            ADD COLUMN language_detected text,
+            ADD COLUMN client            text,
+
+            ADD COLUMN audio_sec_sum     double precision NOT NULL DEFAULT 0,
+
+            ADD COLUMN rtf_count         bigint NOT NULL DEFAULT 0,
+            ADD COLUMN rtf_sum           bigint NOT NULL DEFAULT 0,
+            ADD COLUMN rtf_min           int,
+            ADD COLUMN rtf_max           int,
+            ADD COLUMN rtf_sketch        jsonb  NOT NULL DEFAULT '{}'::jsonb;
+    """)
+
+    op.execute("""
+        ALTER TABLE transcribe_rollup_minutely
+            DROP CONSTRAINT uq_transcribe_rollup_minutely_key,
+            ADD CONSTRAINT uq_transcribe_rollup_minutely_key
+                UNIQUE NULLS NOT DISTINCT (
+                    bucket_minute, env, model_name, model_device,
+                    language_detected, client, success
+                );
+    """)
+
+
+def downgrade() -> None:
+    # схлопнуть бакеты обратно по старому ключу без потерь нельзя (скетчи) —
+    # просто пересоберите агрегаты после даунгрейда
+    op.execute("TRUNCATE transcribe_rollup_minutely;")
+    op.execute("""
+        ALTER TABLE transcribe_rollup_minutely
+            DROP CONSTRAINT uq_transcribe_rollup_minutely_key,
+            DROP COLUMN language_detected,
+            DROP COLUMN client,
+            DROP COLUMN audio_sec_sum,
+            DROP COLUMN rtf_count,
+            DROP COLUMN rtf_sum,
+            DROP COLUMN rtf_min,
+            DROP COLUMN rtf_max,
+            DROP COLUMN rtf_sketch,
+            ADD CONSTRAINT uq_transcribe_rollup_minutely_key
+                UNIQUE NULLS NOT DISTINCT (bucket_minute, env, model_name, model_device, success);
+    """)
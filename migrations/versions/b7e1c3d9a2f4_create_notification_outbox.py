@@ -0,0 +1,66 @@
+"""create notification_outbox
+
+Revision ID: b7e1c3d9a2f4
+Revises: 5e8d2f0c7a41
+Create Date: 2026-10-18 06:00:00.000000
+
+Outbox уведомлений: строка пишется в той же транзакции, что и событие
+(transcribe_events / video_job_events), и живёт, пока её не доставят.
+- state: pending -> sent | failed;
+- available_at — не раньше этого момента (backoff повторов);
+- locked_until / locked_by — аренда воркера-диспетчера: если воркер умер,
+  после locked_until строку заберёт другой.
+Доставленные строки удаляются компакцией (см. app/services/notifier/notification_outbox.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1c3d9a2f4'
+down_revision: Union[str, Sequence[str], None] = '5e8d2f0c7a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE notification_outbox (
+            id              bigserial PRIMARY KEY,
+            created_at      timestamptz NOT NULL DEFAULT now(),
+            kind            text        NOT NULL,
+            bot             text        NOT NULL,
+            payload         jsonb       NOT NULL,
+            critical        boolean     NOT NULL DEFAULT false,
+
+            state           text        NOT NULL DEFAULT 'pending',
+            attempts        int         NOT NULL DEFAULT 0,
+            available_at    timestamptz NOT NULL DEFAULT now(),
+            locked_until    timestamptz,
+            locked_by       text,
+
+            finished_at     timestamptz,  -- когда стала sent / failed
+            message_id      bigint,
+            last_error      text,
+
+            CONSTRAINT notification_outbox_state_check
+                CHECK (state IN ('pending', 'sent', 'failed'))
+        );
+    """)
+    # очередь на выдачу: только pending, в порядке id
+    op.execute("""
+        CREATE INDEX ix_notification_outbox_pending
+            ON notification_outbox (id)
+            WHERE state = 'pending';
+    """)
+    # компакция: доставленные/упавшие по времени завершения
+    op.execute("""
+        CREATE INDEX ix_notification_outbox_finished
+            ON notification_outbox (finished_at)
+            WHERE state <> 'pending';
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS notification_outbox;")
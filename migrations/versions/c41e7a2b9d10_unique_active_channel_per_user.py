@@ -0,0 +1,49 @@
+"""unique active channel per user
+
+Revision ID: c41e7a2b9d10
+Revises: 9bf411d1f45d
+Create Date: 2026-10-18 04:10:00.000000
+
+Один активный канал на (user_id, channel) — частичный уникальный индекс.
+На нём держится ensure_channel_exists (INSERT ... ON CONFLICT): без него
+два параллельных запроса создавали дубли.
+
+Уже накопленные дубли гасим: активным остаётся самый ранний, остальные
+is_active = FALSE (строки не удаляем — на них могут ссылаться video_jobs).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7a2b9d10'
+down_revision: Union[str, Sequence[str], None] = '9bf411d1f45d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE channels c
+        SET is_active = FALSE
+        FROM (
+            SELECT id,
+                   row_number() OVER (
+                       PARTITION BY user_id, channel
+                       ORDER BY created_at, id
+                   ) AS rn
+            FROM channels
+            WHERE is_active
+        ) d
+        WHERE c.id = d.id AND d.rn > 1;
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX uq_channels_user_channel_active
+            ON channels (user_id, channel)
+            WHERE is_active;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_channels_user_channel_active;")
@@ -0,0 +1,43 @@
+"""create video_job_messages
+
+Revision ID: d2a6f81c4e03
+Revises: b7e1c3d9a2f4
+Create Date: 2026-10-18 09:00:00.000000
+
+Одно «живое» сообщение Telegram на видео-джобу: первое событие его отправляет,
+следующие редактируют (editMessageText) — нужен message_id.
+- text_hash — хэш последнего отправленного текста: одинаковый не редактируем;
+- final_status — по какому финальному статусу уже ушло отдельное уведомление
+  (чтобы повтор доставки не слал его второй раз);
+- edited_at — для debounce правок.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a6f81c4e03'
+down_revision: Union[str, Sequence[str], None] = 'b7e1c3d9a2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE video_job_messages (
+            job_id          uuid        PRIMARY KEY REFERENCES video_jobs(job_id) ON DELETE CASCADE,
+            bot             text        NOT NULL,
+            chat_id         text        NOT NULL,
+            message_id      bigint      NOT NULL,
+            text_hash       text,
+            final_status    text,
+            edits           int         NOT NULL DEFAULT 0,
+            created_at      timestamptz NOT NULL DEFAULT now(),
+            edited_at       timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS video_job_messages;")
@@ -0,0 +1,48 @@
+"""create notification_digests and transcribe_error_bursts
+
+Revision ID: e5b0c93f7d18
+Revises: d2a6f81c4e03
+Create Date: 2026-10-18 11:00:00.000000
+
+Режим сводок для transcribe-уведомлений:
+- notification_digests — до какого момента сводка уже построена
+  (period_end); продвигается вместе с записью сводки в outbox,
+  поэтому окно не теряется и не уходит дважды при нескольких воркерах;
+- transcribe_error_bursts — окно повторов по error_code: первая ошибка
+  уходит сразу, следующие до window_until только считаются (repeats),
+  счётчик потом уходит одним сообщением.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b0c93f7d18'
+down_revision: Union[str, Sequence[str], None] = 'd2a6f81c4e03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE notification_digests (
+            name            text        PRIMARY KEY,
+            period_end      timestamptz NOT NULL,
+            updated_at      timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+    op.execute("""
+        CREATE TABLE transcribe_error_bursts (
+            error_code      text        PRIMARY KEY,
+            window_until    timestamptz NOT NULL DEFAULT '-infinity',
+            repeats         int         NOT NULL DEFAULT 0,
+            last_at         timestamptz,
+            last_message    text
+        );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS transcribe_error_bursts;")
+    op.execute("DROP TABLE IF EXISTS notification_digests;")
@@ -0,0 +1,83 @@
+"""create transcribe_rollup_minutely
+
+Revision ID: f3c2f4ec3d5e
+Revises: fbf19766ad78
+Create Date: 2026-10-18 02:05:00.000000
+
+Минутные агрегаты по transcribe_events: count/sum/min/max и
+скетч квантилей (jsonb {"корзина": кол-во}, см. app/services/stats/sketch.py)
+для latency_ms / transcribe_ms / ffmpeg_ms.
+Обновляются в той же транзакции, что и запись событий.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c2f4ec3d5e'
+down_revision: Union[str, Sequence[str], None] = 'fbf19766ad78'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # покорзинное сложение двух скетчей (для ON CONFLICT DO UPDATE)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION rollup_sketch_merge(a jsonb, b jsonb)
+        RETURNS jsonb
+        LANGUAGE sql
+        IMMUTABLE
+        AS $$
+            SELECT COALESCE(jsonb_object_agg(k, n), '{}'::jsonb)
+            FROM (
+                SELECT k, sum(v::bigint) AS n
+                FROM (
+                    SELECT key AS k, value AS v FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+                    UNION ALL
+                    SELECT key, value FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+                ) s
+                GROUP BY k
+            ) t
+        $$;
+    """)
+
+    op.execute("""
+        CREATE TABLE transcribe_rollup_minutely (
+            bucket_minute       timestamptz NOT NULL,
+            env                 text        NOT NULL,
+            model_name          text,
+            model_device        text,
+            success             boolean     NOT NULL,
+
+            events              bigint      NOT NULL DEFAULT 0,
+
+            latency_count       bigint      NOT NULL DEFAULT 0,
+            latency_sum         bigint      NOT NULL DEFAULT 0,
+            latency_min         int,
+            latency_max         int,
+            latency_sketch      jsonb       NOT NULL DEFAULT '{}'::jsonb,
+
+            transcribe_count    bigint      NOT NULL DEFAULT 0,
+            transcribe_sum      bigint      NOT NULL DEFAULT 0,
+            transcribe_min      int,
+            transcribe_max      int,
+            transcribe_sketch   jsonb       NOT NULL DEFAULT '{}'::jsonb,
+
+            ffmpeg_count        bigint      NOT NULL DEFAULT 0,
+            ffmpeg_sum          bigint      NOT NULL DEFAULT 0,
+            ffmpeg_min          int,
+            ffmpeg_max          int,
+            ffmpeg_sketch       jsonb       NOT NULL DEFAULT '{}'::jsonb,
+
+            -- model_name / model_device бывают NULL: NULLS NOT DISTINCT (PG15+),
+            -- чтобы ON CONFLICT считал их одним ключом
+            CONSTRAINT uq_transcribe_rollup_minutely_key
+                UNIQUE NULLS NOT DISTINCT (bucket_minute, env, model_name, model_device, success)
+        );
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS transcribe_rollup_minutely;")
+    op.execute("DROP FUNCTION IF EXISTS rollup_sketch_merge(jsonb, jsonb);")
@@ -0,0 +1,137 @@
+"""partition video_job_events by day
+
+Revision ID: fbf19766ad78
+Revises: 9d4d8c8a71d6
+Create Date: 2026-10-18 01:10:00.000000
+
+Переводим video_job_events на RANGE-партиционирование по created_at_utc
+(одна партиция на сутки UTC, имена video_job_events_pYYYYMMDD).
+Партиции на будущее и удаление старых делает
+app/services/video_job/partitions.py, здесь — только перенос данных.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fbf19766ad78'
+down_revision: Union[str, Sequence[str], None] = '9d4d8c8a71d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# сколько суток вперёд создаём сразу (дальше — фоновый maintainer)
+DAYS_AHEAD = 7
+
+
+def upgrade() -> None:
+    # 1) старую таблицу — в сторону (имена индексов/PK уникальны на схему)
+    op.execute("ALTER TABLE video_job_events RENAME TO video_job_events_old;")
+    op.execute("ALTER INDEX video_job_events_pkey RENAME TO video_job_events_old_pkey;")
+    op.execute(
+        "ALTER INDEX idx_video_job_events_job_id_created "
+        "RENAME TO idx_video_job_events_old_job_id_created;"
+    )
+    op.execute(
+        "ALTER INDEX idx_video_job_events_step_code "
+        "RENAME TO idx_video_job_events_old_step_code;"
+    )
+
+    # 2) новая партиционированная таблица, тот же порядок колонок.
+    # PK обязан включать ключ партиционирования.
+    op.execute("""
+        CREATE TABLE video_job_events (
+            id                      bigint NOT NULL DEFAULT nextval('video_job_events_id_seq'),
+            job_id                  uuid NOT NULL REFERENCES video_jobs(job_id) ON DELETE CASCADE,
+
+            created_at_utc          timestamptz NOT NULL,
+            env                     text NOT NULL,
+
+            origin                  text NOT NULL,
+            step_code               text NOT NULL,
+
+            status                  video_job_status NOT NULL,
+
+            step_started_at_utc     timestamptz,
+            step_finished_at_utc    timestamptz,
+            step_duration_ms        int,
+
+            message                 text,
+            data                    jsonb,
+
+            PRIMARY KEY (id, created_at_utc)
+        ) PARTITION BY RANGE (created_at_utc);
+    """)
+    op.execute("ALTER SEQUENCE video_job_events_id_seq OWNED BY video_job_events.id;")
+
+    op.execute("CREATE INDEX idx_video_job_events_job_id_created ON video_job_events(job_id, created_at_utc);")
+    op.execute("CREATE INDEX idx_video_job_events_step_code ON video_job_events(step_code);")
+
+    # страховка: то, что не попало ни в одну суточную партицию
+    op.execute("CREATE TABLE video_job_events_default PARTITION OF video_job_events DEFAULT;")
+
+    # 3) суточные партиции: от самого старого события до сегодня + DAYS_AHEAD
+    op.execute(f"""
+        DO $$
+        DECLARE
+            d date;
+            first_day date;
+        BEGIN
+            SELECT COALESCE(min((created_at_utc AT TIME ZONE 'UTC')::date), current_date)
+            INTO first_day
+            FROM video_job_events_old;
+
+            FOR d IN
+                SELECT generate_series(first_day, current_date + {DAYS_AHEAD}, interval '1 day')::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF video_job_events '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'video_job_events_p' || to_char(d, 'YYYYMMDD'),
+                    d::timestamp AT TIME ZONE 'UTC',
+                    (d + 1)::timestamp AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END$$;
+    """)
+
+    # 4) переносим данные и убираем старую таблицу
+    # (sequence уже принадлежит новой таблице и не удалится вместе со старой)
+    op.execute("INSERT INTO video_job_events SELECT * FROM video_job_events_old;")
+    op.execute("DROP TABLE video_job_events_old;")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE video_job_events RENAME TO video_job_events_partitioned;")
+    op.execute("ALTER INDEX idx_video_job_events_job_id_created RENAME TO idx_video_job_events_part_job_id_created;")
+    op.execute("ALTER INDEX idx_video_job_events_step_code RENAME TO idx_video_job_events_part_step_code;")
+    op.execute("ALTER INDEX video_job_events_pkey RENAME TO video_job_events_partitioned_pkey;")
+
+    op.execute("""
+        CREATE TABLE video_job_events (
+            id                      bigint PRIMARY KEY DEFAULT nextval('video_job_events_id_seq'),
+            job_id                  uuid NOT NULL REFERENCES video_jobs(job_id) ON DELETE CASCADE,
+
+            created_at_utc          timestamptz NOT NULL,
+            env                     text NOT NULL,
+
+            origin                  text NOT NULL,
+            step_code               text NOT NULL,
+
+            status                  video_job_status NOT NULL,
+
+            step_started_at_utc     timestamptz,
+            step_finished_at_utc    timestamptz,
+            step_duration_ms        int,
+
+            message                 text,
+            data                    jsonb
+        );
+    """)
+    op.execute("ALTER SEQUENCE video_job_events_id_seq OWNED BY video_job_events.id;")
+    op.execute("INSERT INTO video_job_events SELECT * FROM video_job_events_partitioned;")
+    op.execute("DROP TABLE video_job_events_partitioned;")
+
+    op.execute("CREATE INDEX idx_video_job_events_job_id_created ON video_job_events(job_id, created_at_utc);")
+    op.execute("CREATE INDEX idx_video_job_events_step_code ON video_job_events(step_code);")
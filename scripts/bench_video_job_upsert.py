@@ -0,0 +1,209 @@
+# scripts/bench_video_job_upsert.py
+"""
+Бенчмарк записи событий видео-джоб: старый путь (4 запроса на событие)
+против нового (один CTE-запрос, см. video_jobs_store._SAVE_EVENT_SQL).
+
+Запуск (нужна БД с применёнными миграциями, DATABASE_URL как у сервиса):
+
+    python -m scripts.bench_video_job_upsert --jobs 500
+
+Оба пути пишут одинаковые последовательности событий в разные job_id;
+в конце сверяем итоговые строки video_jobs, печатаем латентность
+и статистику по версиям строк, и удаляем всё, что насоздавали.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import statistics
+import time
+import uuid
+from typing import Callable
+
+from app.schemas.video_jobs import VideoJobEventIn, VideoJobStatus
+from app.services.db.db import get_conn
+from app.services.video_job.video_jobs_store import _SAVE_EVENT_SQL, build_params
+
+
+# --- старый путь: 4 запроса на событие (как было до single-statement upsert) ---
+
+_LEGACY_STATEMENTS = (
+    """
+    INSERT INTO video_jobs (job_id, created_at_utc, env, status)
+    VALUES (%(job_id)s, %(now_utc)s, %(env)s, %(status)s::video_job_status)
+    ON CONFLICT (job_id) DO NOTHING;
+    """,
+    """
+    UPDATE video_jobs
+    SET
+        status              = %(status)s::video_job_status,
+        gpu_host            = COALESCE(gpu_host, %(gpu_host)s),
+        gpu_service_version = COALESCE(gpu_service_version, %(gpu_service_version)s),
+        model_name          = COALESCE(model_name, %(model_name)s),
+        model_version       = COALESCE(model_version, %(model_version)s),
+        started_at_utc      = COALESCE(started_at_utc, %(started_at_utc)s),
+        finished_at_utc     = COALESCE(finished_at_utc, %(finished_at_utc)s)
+    WHERE job_id = %(job_id)s;
+    """,
+    """
+    UPDATE video_jobs
+    SET duration_total_ms =
+        CASE
+            WHEN started_at_utc IS NOT NULL
+                 AND finished_at_utc IS NOT NULL
+                 AND duration_total_ms IS NULL
+            THEN (EXTRACT(EPOCH FROM (finished_at_utc - started_at_utc)) * 1000)::int
+            ELSE duration_total_ms
+        END
+    WHERE job_id = %(job_id)s;
+    """,
+    """
+    INSERT INTO video_job_events (
+        job_id, created_at_utc, env, origin, step_code, status,
+        step_started_at_utc, step_finished_at_utc, step_duration_ms, message, data
+    )
+    VALUES (
+        %(job_id)s, %(now_utc)s, %(env)s, %(origin)s, %(step_code)s,
+        %(status)s::video_job_status, %(started_at_utc)s, %(finished_at_utc)s,
+        %(step_duration_ms)s, %(message)s, %(data)s::jsonb
+    );
+    """,
+)
+
+
+def _legacy_save(cur, params: dict) -> None:
+    for sql in _LEGACY_STATEMENTS:
+        cur.execute(sql, params)
+
+
+def _new_save(cur, params: dict) -> None:
+    cur.execute(_SAVE_EVENT_SQL, params)
+
+
+def _job_events(job_id: uuid.UUID) -> list[VideoJobEventIn]:
+    """Типичный жизненный цикл job: приём → ffmpeg → инференс → готово."""
+    t0 = dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+    steps = [
+        ("REQUEST_RECEIVED", VideoJobStatus.STARTED, 0, None),
+        ("FFMPEG_CONVERT", VideoJobStatus.IN_PROGRESS, 100, 900),
+        ("MODEL_INFERENCE", VideoJobStatus.IN_PROGRESS, 1000, 4200),
+        ("DONE", VideoJobStatus.DONE, None, 4300),
+    ]
+    events = []
+    for code, status, start_ms, finish_ms in steps:
+        events.append(
+            VideoJobEventIn(
+                job_id=job_id,
+                step_code=code,
+                status=status,
+                gpu_host="bench-gpu",
+                gpu_service_version="bench",
+                model_name="whisper-medium",
+                step_started_at_utc=(
+                    t0 + dt.timedelta(milliseconds=start_ms) if start_ms is not None else None
+                ),
+                step_finished_at_utc=(
+                    t0 + dt.timedelta(milliseconds=finish_ms) if finish_ms is not None else None
+                ),
+                message=f"bench {code}",
+                data={"bench": True},
+            )
+        )
+    return events
+
+
+def _table_stats(cur, table: str) -> dict:
+    cur.execute("SELECT pg_stat_force_next_flush()")
+    cur.execute("SELECT pg_stat_clear_snapshot()")
+    cur.execute(
+        """
+        SELECT n_tup_ins, n_tup_upd, n_tup_hot_upd, n_dead_tup
+        FROM pg_stat_user_tables WHERE relname = %s
+        """,
+        (table,),
+    )
+    return cur.fetchone() or {}
+
+
+def _run(name: str, save: Callable, jobs: int) -> tuple[list[uuid.UUID], dict]:
+    job_ids = [uuid.uuid4() for _ in range(jobs)]
+    latencies: list[float] = []
+
+    with get_conn() as conn, conn.cursor() as cur:
+        before = _table_stats(cur, "video_jobs")
+        started = time.perf_counter()
+        for job_id in job_ids:
+            for ev in _job_events(job_id):
+                t = time.perf_counter()
+                save(cur, build_params(ev))
+                latencies.append((time.perf_counter() - t) * 1000)
+        total_s = time.perf_counter() - started
+        after = _table_stats(cur, "video_jobs")
+
+    latencies.sort()
+    result = {
+        "path": name,
+        "events": len(latencies),
+        "events_per_sec": round(len(latencies) / total_s, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+        "video_jobs_upd": after.get("n_tup_upd", 0) - before.get("n_tup_upd", 0),
+        "video_jobs_hot_upd": after.get("n_tup_hot_upd", 0) - before.get("n_tup_hot_upd", 0),
+    }
+    return job_ids, result
+
+
+_COMPARE_COLUMNS = """
+    status, env, gpu_host, gpu_service_version, model_name, model_version,
+    started_at_utc, finished_at_utc, duration_total_ms
+"""
+
+
+def _check_same_end_state(legacy_ids: list[uuid.UUID], new_ids: list[uuid.UUID]) -> bool:
+    with get_conn() as conn, conn.cursor() as cur:
+        for old_id, new_id in zip(legacy_ids, new_ids):
+            cur.execute(
+                f"SELECT {_COMPARE_COLUMNS} FROM video_jobs WHERE job_id = %s", (old_id,)
+            )
+            old_row = cur.fetchone()
+            cur.execute(
+                f"SELECT {_COMPARE_COLUMNS} FROM video_jobs WHERE job_id = %s", (new_id,)
+            )
+            new_row = cur.fetchone()
+            if old_row != new_row:
+                print(f"MISMATCH: {old_row} != {new_row}")
+                return False
+    return True
+
+
+def _cleanup(job_ids: list[uuid.UUID]) -> None:
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM video_jobs WHERE job_id = ANY(%s)", (job_ids,))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200, help="сколько job прогнать на каждый путь")
+    args = parser.parse_args()
+
+    legacy_ids, legacy = _run("legacy (4 statements)", _legacy_save, args.jobs)
+    new_ids, new = _run("single statement", _new_save, args.jobs)
+
+    try:
+        same = _check_same_end_state(legacy_ids, new_ids)
+    finally:
+        _cleanup(legacy_ids + new_ids)
+
+    for r in (legacy, new):
+        print(
+            f"{r['path']:<24} events={r['events']:<6} {r['events_per_sec']:>9} ev/s  "
+            f"mean={r['mean_ms']}ms p50={r['p50_ms']}ms p95={r['p95_ms']}ms  "
+            f"video_jobs updates={r['video_jobs_upd']} (hot={r['video_jobs_hot_upd']})"
+        )
+    print(f"speedup: x{new['events_per_sec'] / legacy['events_per_sec']:.2f}")
+    print(f"same end state: {same}")
+
+
+if __name__ == "__main__":
+    main()
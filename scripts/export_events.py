@@ -0,0 +1,57 @@
+# scripts/export_events.py
+"""
+Выгружает transcribe_events / video_job_events за период в NDJSON или CSV.
+
+    python -m scripts.export_events video_job_events --start 2025-01-01 --end 2025-02-01 \
+        --format csv --gzip -o jobs.csv.gz
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sys
+
+from app.services.events_export import EXPORT_FORMATS, EXPORT_TABLES, export_events
+
+
+def _parse_ts(value: str) -> dt.datetime:
+    ts = dt.datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=dt.timezone.utc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--start", required=True, type=_parse_ts, help="начало (ISO, UTC по умолчанию)")
+    parser.add_argument("--end", required=True, type=_parse_ts, help="конец, не включительно")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--env", default=None)
+    parser.add_argument("--chunk-size", type=int, default=None, help="строк на выборку из курсора")
+    parser.add_argument("-o", "--output", default="-", help="файл (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    parts = export_events(
+        args.table,
+        args.start,
+        args.end,
+        fmt=args.format,
+        gzip=args.gzip,
+        env=args.env,
+        chunk_size=args.chunk_size,
+    )
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    written = 0
+    try:
+        for part in parts:
+            out.write(part)
+            written += len(part)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"exported {written} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
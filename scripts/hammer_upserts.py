@@ -0,0 +1,135 @@
+# scripts/hammer_upserts.py
+"""
+Нагрузочный прогон идемпотентных upsert-ов users / channels (опционально, руками).
+Корректность под конкуренцией проверяет tests/test_upserts_concurrency.py;
+этот скрипт — чтобы погонять живой сервис и посмотреть на латентность.
+
+Много потоков одновременно дёргают /users/register и /channels/create
+с одними и теми же (user_id, channel); в конце проверяем в БД, что
+на каждую пару ровно один активный канал, а все ответы вернули один и тот же id.
+
+    python -m scripts.hammer_upserts --base-url http://localhost:8000 --workers 32 --rounds 20
+
+Без --base-url запросы идут в приложение in-process (fastapi TestClient).
+Созданных пользователей и каналы удаляем в конце.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.db.db import get_conn
+
+# tg_id из заведомо пустого диапазона, чтобы не задеть реальных пользователей
+_TG_ID_BASE = 9_000_000_000_000
+
+
+def _make_client(base_url: str | None):
+    if base_url:
+        import requests
+
+        session = requests.Session()
+
+        def post(path: str, **kwargs):
+            r = session.post(base_url.rstrip("/") + path, timeout=30, **kwargs)
+            r.raise_for_status()
+            return r.json()
+
+        return post, None
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    client.__enter__()
+
+    def post(path: str, **kwargs):
+        r = client.post(path, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+    return post, client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default=None, help="адрес сервиса; по умолчанию — in-process")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20, help="сколько раз повторить каждую пару")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--channels", type=int, default=4, help="каналов на пользователя")
+    args = parser.parse_args()
+
+    post, client = _make_client(args.base_url)
+
+    run_id = random.randrange(1_000_000)
+    tg_ids = [_TG_ID_BASE + run_id * 1000 + i for i in range(args.users)]
+    pairs = [(tg_id, f"@hammer_{run_id}_{j}") for tg_id in tg_ids for j in range(args.channels)]
+
+    # каждый запрос: register пользователя + create канала, всё вперемешку
+    tasks = pairs * args.rounds
+    random.shuffle(tasks)
+
+    ids: dict[tuple[int, str], set[str]] = defaultdict(set)
+    ids_lock = threading.Lock()
+    latencies: list[float] = []
+
+    def hit(pair: tuple[int, str]) -> None:
+        tg_id, channel = pair
+        start = time.perf_counter()
+        post("/users/register", json={"tg_id": tg_id, "username": f"hammer{tg_id}"})
+        ch = post("/channels/create", json={"user_id": tg_id, "channel": channel})
+        elapsed = (time.perf_counter() - start) * 1000
+        with ids_lock:
+            ids[pair].add(ch["id"])
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(hit, tasks))
+        elapsed = time.perf_counter() - started
+
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT user_id, channel, count(*) AS active
+                FROM channels
+                WHERE user_id = ANY(%s) AND is_active
+                GROUP BY user_id, channel
+                """,
+                (tg_ids,),
+            )
+            active = {(r["user_id"], r["channel"]): r["active"] for r in cur.fetchall()}
+    finally:
+        with get_conn() as conn, conn.cursor() as cur:
+            # channels удалятся каскадом
+            cur.execute("DELETE FROM users WHERE tg_id = ANY(%s)", (tg_ids,))
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    dup_rows = {p: n for p, n in active.items() if n != 1}
+    missing = [p for p in pairs if p not in active]
+    split_ids = {p: v for p, v in ids.items() if len(v) != 1}
+
+    latencies.sort()
+    print(f"requests:  {len(tasks) * 2} in {elapsed:.2f}s ({len(tasks) * 2 / elapsed:.0f} req/s)")
+    print(f"latency:   p50={statistics.median(latencies):.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}ms (register + create)")
+    print(f"pairs:     {len(pairs)}")
+    print(f"duplicates in db: {len(dup_rows)}  missing: {len(missing)}  "
+          f"pairs with different ids in responses: {len(split_ids)}")
+
+    if dup_rows or missing or split_ids:
+        raise SystemExit("FAIL")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# scripts/rebuild_transcribe_rollups.py
+"""
+Пересобирает transcribe_rollup_minutely из сырых transcribe_events за период
+(например, для истории до появления агрегатов).
+
+    python -m scripts.rebuild_transcribe_rollups --start 2025-01-01 --end 2025-02-01
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+
+from app.services.stats.transcribe_rollup import rebuild_transcribe_rollups
+
+
+def _parse_ts(value: str) -> dt.datetime:
+    ts = dt.datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=dt.timezone.utc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--start", required=True, type=_parse_ts, help="начало (ISO, UTC по умолчанию)")
+    parser.add_argument("--end", required=True, type=_parse_ts, help="конец, не включительно")
+    args = parser.parse_args()
+
+    processed = rebuild_transcribe_rollups(args.start, args.end)
+    print(f"rebuilt rollups from {processed} events")
+
+
+if __name__ == "__main__":
+    main()
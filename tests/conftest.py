@@ -0,0 +1,33 @@
+# tests/conftest.py
+"""
+Тесты с БД идут против DATABASE_URL (та же база, что у приложения, с накатанными
+миграциями). Нет базы — такие тесты пропускаются, а не падают.
+"""
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.db.db import get_conn
+
+
+@pytest.fixture(scope="session")
+def db():
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('channels') IS NOT NULL AS migrated")
+            migrated = cur.fetchone()["migrated"]
+    except Exception as e:
+        pytest.skip(f"database is not available: {e}")
+    if not migrated:
+        pytest.skip("database is not migrated (alembic upgrade head)")
+    return get_conn
+
+
+@pytest.fixture
+def client(db):
+    # без lifespan: фоновые задачи не нужны, а без пула get_conn
+    # открывает отдельное подключение на запрос — конкуренция настоящая
+    from app.main import app
+
+    return TestClient(app)
@@ -0,0 +1,69 @@
+# tests/test_upserts_concurrency.py
+"""
+Идемпотентность /users/register и /channels/create под конкурентной нагрузкой:
+на каждую (user_id, channel) — ровно один активный канал и один id во всех ответах.
+"""
+from __future__ import annotations
+
+import random
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# tg_id из заведомо пустого диапазона, чтобы не задеть реальных пользователей
+_TG_ID_BASE = 9_100_000_000_000
+
+_USERS = 3
+_CHANNELS = 3
+_ROUNDS = 8
+_WORKERS = 16
+
+
+@pytest.fixture
+def tg_ids(db):
+    run_id = random.randrange(1_000_000)
+    ids = [_TG_ID_BASE + run_id * 1000 + i for i in range(_USERS)]
+    yield ids
+    with db() as conn, conn.cursor() as cur:
+        # channels удалятся каскадом
+        cur.execute("DELETE FROM users WHERE tg_id = ANY(%s)", (ids,))
+
+
+def test_concurrent_register_and_create_channel(client, db, tg_ids):
+    pairs = [(tg_id, f"@pytest_{tg_id}_{j}") for tg_id in tg_ids for j in range(_CHANNELS)]
+    tasks = pairs * _ROUNDS
+    random.shuffle(tasks)
+
+    def hit(pair: tuple[int, str]) -> tuple[tuple[int, str], str]:
+        tg_id, channel = pair
+        r = client.post("/users/register", json={"tg_id": tg_id, "username": f"pytest{tg_id}"})
+        assert r.status_code == 200, r.text
+        r = client.post("/channels/create", json={"user_id": tg_id, "channel": channel})
+        assert r.status_code == 200, r.text
+        return pair, r.json()["id"]
+
+    with ThreadPoolExecutor(max_workers=_WORKERS) as pool:
+        results = list(pool.map(hit, tasks))
+
+    ids: dict[tuple[int, str], set[str]] = defaultdict(set)
+    for pair, channel_id in results:
+        ids[pair].add(channel_id)
+    assert {pair: len(v) for pair, v in ids.items() if len(v) != 1} == {}
+
+    with db() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT user_id, channel, count(*) AS active, min(id::text) AS id
+            FROM channels
+            WHERE user_id = ANY(%s) AND is_active
+            GROUP BY user_id, channel
+            """,
+            (tg_ids,),
+        )
+        active = {(r["user_id"], r["channel"]): r for r in cur.fetchall()}
+
+    assert sorted(active) == sorted(pairs)
+    for pair, row in active.items():
+        assert row["active"] == 1, pair
+        assert ids[pair] == {row["id"]}, pair